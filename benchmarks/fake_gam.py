@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+"""
+An in-memory stand-in for the GAM services a setup uses, for benchmarks.
+
+It answers the *ByStatement queries the dfp package makes (a small subset of
+PQL), creates objects with new IDs, and counts the calls made and the bytes
+of their arguments. Installed with `installed`, it is what get_client's
+clients talk to.
+"""
+
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from threading import Lock
+
+import settings
+from dfp.client import ad_manager
+
+
+# Service methods, and whether they query or create objects of which kind.
+METHODS = {
+  'getUsersByStatement': ('select', 'User'),
+  'getPlacementsByStatement': ('select', 'Placement'),
+  'getAdUnitsByStatement': ('select', 'AdUnit'),
+  'getCompaniesByStatement': ('select', 'Company'),
+  'createCompanies': ('create', 'Company'),
+  'getOrdersByStatement': ('select', 'Order'),
+  'createOrders': ('create', 'Order'),
+  'getCustomTargetingKeysByStatement': ('select', 'CustomTargetingKey'),
+  'createCustomTargetingKeys': ('create', 'CustomTargetingKey'),
+  'getCustomTargetingValuesByStatement': ('select', 'CustomTargetingValue'),
+  'createCustomTargetingValues': ('create', 'CustomTargetingValue'),
+  'getLineItemsByStatement': ('select', 'LineItem'),
+  'createLineItems': ('create', 'LineItem'),
+  'getCreativesByStatement': ('select', 'Creative'),
+  'createCreatives': ('create', 'Creative'),
+  'getLineItemCreativeAssociationsByStatement':
+    ('select', 'LineItemCreativeAssociation'),
+  'createLineItemCreativeAssociations':
+    ('create', 'LineItemCreativeAssociation'),
+}
+
+# Fields set on created objects that the request leaves out.
+DEFAULTS = {
+  'CustomTargetingValue': {'status': 'ACTIVE', 'matchType': 'EXACT'},
+  'CustomTargetingKey': {'status': 'ACTIVE'},
+  'Order': {'status': 'DRAFT', 'isArchived': False},
+}
+
+# Query fields that are nested in the objects.
+NESTED_FIELDS = {
+  ('Creative', 'width'): ('size', 'width'),
+  ('Creative', 'height'): ('size', 'height'),
+}
+
+STATEMENT_RE = re.compile(r'^\s*(?:WHERE\s+(?P<where>.*?))?'
+  r'(?:\s*ORDER BY\s+\w+(?:\s+(?:ASC|DESC))?)?'
+  r'(?:\s*LIMIT\s+(?P<limit>\d+))?(?:\s*OFFSET\s+(?P<offset>\d+))?\s*$',
+  re.IGNORECASE | re.DOTALL)
+CONDITION_RE = re.compile(r'^\s*(\w+)\s*(=|IN)\s*(.+?)\s*$', re.IGNORECASE)
+
+def parse_value(text, bind_values):
+  if text.startswith(':'):
+    return bind_values[text[1:]]
+  if text.startswith("'") and text.endswith("'"):
+    return text[1:-1]
+  if text.startswith('(') and text.endswith(')'):
+    return [parse_value(item.strip(), bind_values)
+      for item in text[1:-1].split(',')]
+  return int(text)
+
+def parse_statement(statement):
+  """
+  Returns the conditions, limit and offset of a statement dict.
+
+  Returns:
+    a tuple: a list of (field, operator, value) tuples, the limit (or None)
+      and the offset
+  """
+  bind_values = {value['key']: value['value']['value']
+    for value in statement.get('values') or []}
+  match = STATEMENT_RE.match(statement['query'])
+  if match is None:
+    raise NotImplementedError(
+      'Unsupported statement: {0}'.format(statement['query']))
+
+  conditions = []
+  if match.group('where'):
+    for condition in re.split(r'\s+AND\s+', match.group('where'),
+        flags=re.IGNORECASE):
+      condition = condition.strip()
+      # A condition added to others in parentheses, e.g. by iter_line_items.
+      if (condition.startswith('(') and condition.endswith(')') and
+          CONDITION_RE.match(condition[1:-1])):
+        condition = condition[1:-1]
+      condition_match = CONDITION_RE.match(condition)
+      if condition_match is None:
+        raise NotImplementedError(
+          'Unsupported condition: {0}'.format(condition))
+      field, operator, value = condition_match.groups()
+      conditions.append((field, operator.upper(),
+        parse_value(value, bind_values)))
+
+  limit = match.group('limit')
+  return (conditions, int(limit) if limit else None,
+    int(match.group('offset') or 0))
+
+def get_field(kind, obj, field):
+  for name in NESTED_FIELDS.get((kind, field), (field,)):
+    obj = obj.get(name) if obj is not None else None
+  return obj
+
+def matches(kind, obj, conditions):
+  for field, operator, value in conditions:
+    actual = str(get_field(kind, obj, field))
+    if operator == 'IN':
+      if actual not in [str(item) for item in value]:
+        return False
+    elif actual != str(value):
+      return False
+  return True
+
+def get_payload_size(args):
+  """
+  Returns the size of a call's arguments, encoded as compact JSON. The SOAP
+  XML sent to GAM is a few times larger, but grows the same way.
+  """
+  return len(json.dumps(args, default=str, separators=(',', ':')))
+
+class FakeGAM(object):
+  """
+  The objects in a fake network, and counts of the calls made to it.
+  """
+
+  def __init__(self, latency=0):
+    """
+    Args:
+      latency (float): seconds each call waits, to stand in for the network
+    """
+    self.latency = latency
+    self.lock = Lock()
+    self.next_id = 1000
+    self.objects = defaultdict(list)
+    self.calls = Counter()
+    self.bytes_sent = Counter()
+    # Time spent in the stand-in itself, which the setup is not charged for.
+    self.seconds = 0
+
+  def add(self, kind, **fields):
+    """
+    Adds an object of `kind`, e.g. 'AdUnit', and returns it.
+    """
+    with self.lock:
+      self.next_id += 1
+      obj = dict(DEFAULTS.get(kind, {}), id=self.next_id, **fields)
+      self.objects[kind].append(obj)
+      return obj
+
+  def select(self, kind, statement):
+    conditions, limit, offset = parse_statement(statement)
+    with self.lock:
+      results = [dict(obj) for obj in self.objects[kind]
+        if matches(kind, obj, conditions)]
+    page = results[offset:offset + limit if limit else None]
+    return {'results': page, 'totalResultSetSize': len(results)}
+
+  def create(self, kind, objs):
+    return [self.add(kind, **dict(obj)) for obj in objs]
+
+  def call(self, service_name, method, args):
+    if method not in METHODS:
+      raise NotImplementedError(
+        '{0}.{1} is not faked.'.format(service_name, method))
+    if self.latency:
+      time.sleep(self.latency)
+
+    start = time.perf_counter()
+    name = '{0}.{1}'.format(service_name, method)
+    payload_size = get_payload_size(args)
+    action, kind = METHODS[method]
+    result = getattr(self, action)(kind, *args)
+    with self.lock:
+      self.calls[name] += 1
+      self.bytes_sent[name] += payload_size
+      self.seconds += time.perf_counter() - start
+    return result
+
+  def GetService(self, service_name, version=None, server=None):
+    return FakeService(self, service_name)
+
+  @property
+  def num_calls(self):
+    return sum(self.calls.values())
+
+  @property
+  def num_bytes_sent(self):
+    return sum(self.bytes_sent.values())
+
+class FakeService(object):
+
+  def __init__(self, gam, service_name):
+    self.gam = gam
+    self.service_name = service_name
+
+  def __getattr__(self, method):
+    return lambda *args: self.gam.call(self.service_name, method, args)
+
+def create_network(gam, user_email, advertiser_name, placements, ad_units,
+    key_names=('hb_bidder', 'hb_pb')):
+  """
+  Adds the user, advertiser, placements, ad units and targeting keys a setup
+  expects to find.
+  """
+  gam.add('User', email=user_email, name='Trafficker')
+  gam.add('Company', name=advertiser_name, type='ADVERTISER')
+  for placement in placements:
+    gam.add('Placement', name=placement)
+  for ad_unit in ad_units:
+    gam.add('AdUnit', name=ad_unit)
+  for key_name in key_names:
+    gam.add('CustomTargetingKey', name=key_name, displayName=key_name,
+      type='PREDEFINED')
+
+@contextmanager
+def installed(gam, **setting_values):
+  """
+  Makes clients from dfp.client.get_client talk to `gam`, with the given
+  settings, until the block ends.
+  """
+  setting_values = dict({
+    'GOOGLEADS_YAML': {'ad_manager': {'application_name': 'Benchmark',
+      'network_code': '1234'}},
+    'DFP_TOKEN_CACHE_FILE': None,
+    'DFP_CASSETTE_FILE': None,
+    'DFP_CALL_HISTORY_FILE': None,
+  }, **setting_values)
+  missing = object()
+  saved_settings = {name: getattr(settings, name, missing)
+    for name in setting_values}
+  client_class = ad_manager.AdManagerClient
+  load_from_string = client_class.__dict__['LoadFromString']
+
+  for name, value in setting_values.items():
+    setattr(settings, name, value)
+  client_class.LoadFromString = classmethod(lambda cls, yaml_doc: gam)
+  try:
+    yield gam
+  finally:
+    client_class.LoadFromString = load_from_string
+    for name, value in saved_settings.items():
+      if value is missing:
+        delattr(settings, name)
+      else:
+        setattr(settings, name, value)
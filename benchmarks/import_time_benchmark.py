@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Measures how long the CLI entry points take to import in a fresh
+interpreter, compared with importing googleads itself.
+
+  python -m benchmarks.import_time_benchmark [--repeat 10]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+MODULES = [
+  'tasks.add_new_prebid_partner',
+  'tasks.verify_order',
+  'tasks.cleanup',
+  'googleads.ad_manager',
+]
+
+def time_import(module, repeat):
+  """
+  Returns the best wall time, in seconds, of starting Python and importing
+  `module`, less the time of starting Python alone.
+  """
+  env = dict(os.environ, DISABLE_LOGGING='true')
+
+  def run(code):
+    return min(timeit.repeat(
+      lambda: subprocess.check_call([sys.executable, '-c', code],
+        cwd=ROOT_DIR, env=env),
+      number=1, repeat=repeat))
+
+  return run('import {0}'.format(module)) - run('pass')
+
+def loads_googleads(module):
+  """
+  Returns whether importing `module` also imports googleads.
+  """
+  code = ('import sys, {0}; '
+    'print("googleads" in sys.modules)').format(module)
+  output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT_DIR,
+    env=dict(os.environ, DISABLE_LOGGING='true'))
+  return output.decode('utf-8').strip() == 'True'
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('--repeat', type=int, default=10)
+  args = parser.parse_args(argv)
+
+  for module in MODULES:
+    print('{module:<32} {ms:>8.1f} ms  googleads loaded: {loaded}'.format(
+      module=module, ms=time_import(module, args.repeat) * 1000,
+      loaded=loads_googleads(module)))
+
+if __name__ == '__main__':
+  main()
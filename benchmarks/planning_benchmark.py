@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+Times the planning steps of a setup, which run on the client before (and
+between) API calls, and measures their peak memory with tracemalloc.
+
+  python -m benchmarks.planning_benchmark [--mode quick|full]
+
+Each benchmark runs at the size given by the mode, and is checked against a
+memory budget of a fixed allowance plus so many bytes per item, and a time
+budget per item. The quick sizes also run with the unit tests
+(tests/test_planning_benchmark.py); set PLANNING_BENCHMARK_MODE=full to run
+the tests at the full sizes.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+import dfp.associate_line_items_and_creatives
+import dfp.create_creatives
+import dfp.create_line_items
+import tasks.add_new_prebid_partner
+from tasks.price_utils import (
+  get_prices_array,
+  get_prices_summary_string,
+  micro_amounts_to_strs,
+)
+
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+QUICK = 'quick'
+FULL = 'full'
+
+# What a benchmark measures: `prepare(size)` returns the function to time,
+# which returns what it built so the peak includes it. The budgets allow
+# `fixed_bytes + bytes_per_item * size` of memory at peak, and
+# `seconds_per_item * size` of wall time, with plenty of headroom for slower
+# machines.
+Benchmark = namedtuple('Benchmark', ['name', 'item', 'prepare', 'sizes',
+  'fixed_bytes', 'bytes_per_item', 'seconds_per_item'])
+
+Result = namedtuple('Result', ['name', 'item', 'size', 'seconds',
+  'peak_bytes', 'max_bytes', 'max_seconds'])
+
+BIDDER_CODE = 'mypartner'
+ORDER_NAME = 'Benchmark Order'
+SIZES = [{'width': '300', 'height': '250'}, {'width': '728', 'height': '90'}]
+SNIPPET = os.path.join(ROOT_DIR, 'dfp', 'creative_snippet.html')
+NUM_CREATIVES = 20
+
+class ValueIdGetter(object):
+  """
+  Stands in for DFPValueIdGetter with the targeting values already known.
+  """
+
+  def __init__(self, value_ids):
+    self.value_ids = value_ids
+
+  def get_value_id(self, name):
+    return self.value_ids[name]
+
+class CountingService(object):
+  """
+  Stands in for the LICA service: it keeps only the number of associations
+  sent, so only the client's allocations are measured.
+  """
+
+  def __init__(self):
+    self.num_sent = 0
+
+  def GetService(self, service_name, version=None):
+    return self
+
+  def createLineItemCreativeAssociations(self, licas):
+    self.num_sent += len(licas)
+    return licas
+
+def get_price_bucket(num_prices):
+  return {'precision': 2, 'min': 0, 'max': (num_prices - 1) / 100.0,
+    'increment': 0.01}
+
+def prepare_get_prices_array(size):
+  price_bucket = get_price_bucket(size)
+  return lambda: get_prices_array(price_bucket)
+
+def prepare_get_prices_summary_string(size):
+  prices = get_prices_array(get_price_bucket(size))
+  return lambda: get_prices_summary_string(prices)
+
+def prepare_create_line_item_configs(size):
+  prices = get_prices_array(get_price_bucket(size))
+  value_getter = ValueIdGetter({name: 5000 + index for index, name in
+    enumerate(micro_amounts_to_strs(prices))})
+  return lambda: tasks.add_new_prebid_partner.create_line_item_configs(
+    prices, 1234, [1], [2, 3], BIDDER_CODE, SIZES, 44, 'USD',
+    {'hb_bidder': 77}, value_getter, None)
+
+def prepare_create_line_item_config(size):
+  prices = get_prices_array(get_price_bucket(size))
+  return lambda: [dfp.create_line_items.create_line_item_config(
+    name=u'{0}: HB ${1}'.format(BIDDER_CODE, price), order_id=1234,
+    placement_ids=[1], ad_unit_ids=[2, 3], cpm_micro_amount=price,
+    sizes=SIZES, hb_criteria={'hb_bidder': 77, 'hb_pb': 88},
+    currency_code='USD', creative_template_id=None) for price in prices]
+
+def prepare_create_duplicate_creative_configs(size):
+  return lambda: dfp.create_creatives.create_duplicate_creative_configs(
+    BIDDER_CODE, ORDER_NAME, 1234, SNIPPET, num_creatives=size)
+
+@contextmanager
+def counting_client(service):
+  get_client = dfp.associate_line_items_and_creatives.get_client
+  dfp.associate_line_items_and_creatives.get_client = lambda: service
+  try:
+    yield
+  finally:
+    dfp.associate_line_items_and_creatives.get_client = get_client
+
+def prepare_make_licas(size):
+  line_item_ids = list(range(100000, 100000 + size // NUM_CREATIVES))
+  creative_ids = list(range(500, 500 + NUM_CREATIVES))
+
+  def make_licas():
+    service = CountingService()
+    with counting_client(service):
+      dfp.associate_line_items_and_creatives.make_licas(line_item_ids,
+        creative_ids, SIZES)
+    return service.num_sent
+  return make_licas
+
+BENCHMARKS = [
+  Benchmark('get_prices_array', 'price', prepare_get_prices_array,
+    {QUICK: 20000, FULL: 2000000}, fixed_bytes=16 * 1024, bytes_per_item=64,
+    seconds_per_item=2e-6),
+  # A preview of any ladder costs the same.
+  Benchmark('get_prices_summary_string', 'price',
+    prepare_get_prices_summary_string, {QUICK: 20000, FULL: 2000000},
+    fixed_bytes=16 * 1024, bytes_per_item=0, seconds_per_item=1e-7),
+  Benchmark('create_line_item_configs', 'line item',
+    prepare_create_line_item_configs, {QUICK: 2000, FULL: 200000},
+    fixed_bytes=64 * 1024, bytes_per_item=600, seconds_per_item=3e-5),
+  Benchmark('create_line_item_config', 'line item',
+    prepare_create_line_item_config, {QUICK: 500, FULL: 20000},
+    fixed_bytes=64 * 1024, bytes_per_item=6 * 1024, seconds_per_item=2e-4),
+  Benchmark('create_duplicate_creative_configs', 'creative',
+    prepare_create_duplicate_creative_configs, {QUICK: 100, FULL: 10000},
+    fixed_bytes=64 * 1024, bytes_per_item=512, seconds_per_item=2e-4),
+  Benchmark('make_licas', 'association', prepare_make_licas,
+    {QUICK: 20000, FULL: 400000}, fixed_bytes=64 * 1024, bytes_per_item=600,
+    seconds_per_item=2e-5),
+]
+
+def get_mode():
+  """
+  Returns the mode from the PLANNING_BENCHMARK_MODE environment variable,
+  quick by default.
+  """
+  return os.environ.get('PLANNING_BENCHMARK_MODE') or QUICK
+
+def measure(func, repeat=3):
+  """
+  Returns the best wall time of `func` over `repeat` runs, and its peak
+  traced memory, in bytes, on one more run. A first, untimed run warms up
+  caches, which are not what is measured.
+  """
+  func()
+  seconds = None
+  for _ in range(repeat):
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+  gc.collect()
+  tracemalloc.start()
+  try:
+    func()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return seconds, peak_bytes
+
+def run_benchmark(benchmark, mode=QUICK, repeat=3):
+  size = benchmark.sizes[mode]
+  seconds, peak_bytes = measure(benchmark.prepare(size), repeat)
+  return Result(benchmark.name, benchmark.item, size, seconds, peak_bytes,
+    max_bytes=benchmark.fixed_bytes + benchmark.bytes_per_item * size,
+    max_seconds=benchmark.seconds_per_item * size)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('--mode', choices=[QUICK, FULL], default=FULL)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--benchmarks', nargs='+',
+    choices=[benchmark.name for benchmark in BENCHMARKS])
+  args = parser.parse_args(argv)
+  logging.disable(logging.CRITICAL)
+
+  for benchmark in BENCHMARKS:
+    if args.benchmarks and benchmark.name not in args.benchmarks:
+      continue
+    result = run_benchmark(benchmark, args.mode, args.repeat)
+    over_budget = (result.peak_bytes > result.max_bytes or
+      result.seconds > result.max_seconds)
+    print('{0:<34} {1:>9,} {2:<12} {3:8.3f} s {4:>8.1f} us/{5:<12} '
+      '{6:>12,} B peak {7:>8.0f} B/{5}{8}'.format(result.name, result.size,
+      result.item + 's', result.seconds, result.seconds * 1e6 / result.size,
+      result.item, result.peak_bytes, result.peak_bytes / float(result.size),
+      '  OVER BUDGET' if over_budget else ''))
+
+if __name__ == '__main__':
+  main()
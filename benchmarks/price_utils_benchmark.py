@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Compares the integer price ladder engine in tasks.price_utils with the float
+implementation it replaced, for speed and for exact hb_pb string equality.
+
+  python -m benchmarks.price_utils_benchmark [--points 1000000]
+"""
+
+import argparse
+import timeit
+
+from tasks.price_utils import (
+  get_prices_array,
+  micro_amount_to_num,
+  micro_amounts_to_strs,
+  num_to_str,
+)
+
+
+def legacy_num_to_micro_amount(num, precision=2):
+  rounding = -6 + precision
+  return int(round(num * (10 ** 6), rounding))
+
+def legacy_get_prices_array(price_bucket):
+  start_cpm = price_bucket['min'] if price_bucket['min'] >=0 else 0.00
+  increment = price_bucket['increment']
+  precision = price_bucket['precision']
+
+  current_cpm_micro_amount = legacy_num_to_micro_amount(start_cpm, precision)
+  end_cpm_micro_amount = legacy_num_to_micro_amount(price_bucket['max'],
+    precision)
+  increment_micro_amount = legacy_num_to_micro_amount(increment, precision)
+
+  prices = []
+  while current_cpm_micro_amount <= end_cpm_micro_amount:
+    prices.append(current_cpm_micro_amount)
+    current_cpm_micro_amount += increment_micro_amount
+  return prices
+
+def legacy_price_strings(prices, precision=2):
+  return [num_to_str(micro_amount_to_num(price), precision)
+    for price in prices]
+
+def best_of(func, repeat):
+  return min(timeit.repeat(func, number=1, repeat=repeat))
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('--points', type=int, default=1000000,
+    help='the number of prices in the ladder')
+  parser.add_argument('--precision', type=int, default=2)
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args(argv)
+
+  increment = 10 ** -args.precision
+  price_bucket = {
+    'precision': args.precision,
+    'min': 0,
+    'max': round((args.points - 1) * increment, args.precision),
+    'increment': increment,
+  }
+
+  prices = get_prices_array(price_bucket)
+  legacy_prices = legacy_get_prices_array(price_bucket)
+  strings = micro_amounts_to_strs(prices, args.precision)
+  legacy_strings = legacy_price_strings(legacy_prices, args.precision)
+  mismatches = sum(1 for new, old in zip(strings, legacy_strings) if new != old)
+
+  print('Ladder of {0} prices ({1} in the legacy ladder).'.format(
+    len(prices), len(legacy_prices)))
+  print('Differing hb_pb strings: {0}'.format(
+    mismatches + abs(len(strings) - len(legacy_strings))))
+
+  results = [
+    ('get_prices_array', lambda: get_prices_array(price_bucket),
+      lambda: legacy_get_prices_array(price_bucket)),
+    ('hb_pb strings', lambda: micro_amounts_to_strs(prices, args.precision),
+      lambda: legacy_price_strings(prices, args.precision)),
+  ]
+  for name, new, old in results:
+    new_time = best_of(new, args.repeat)
+    old_time = best_of(old, args.repeat)
+    print('{0:<18} new {1:8.3f}s  legacy {2:8.3f}s  ({3:.2f}x)'.format(
+      name, new_time, old_time, old_time / new_time))
+
+if __name__ == '__main__':
+  main()
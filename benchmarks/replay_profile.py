@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Profiles a setup offline by replaying a cassette recorded from a real run.
+
+  python -m benchmarks.replay_profile cassette.json.gz [--latency-scale 0]
+
+Record a cassette by running the setup with DFP_CASSETTE_FILE set (and
+DFP_CASSETTE_MODE = 'record', the default). The replay uses the settings
+saved in the cassette and answers the confirmation prompt itself. It reports
+the process CPU time of each run, across all threads, and a cProfile of the
+main thread.
+"""
+
+import argparse
+import cProfile
+import logging
+import pstats
+import time
+
+import settings
+import dfp.cassette
+import dfp.transport
+import tasks.add_new_prebid_partner
+from dfp.cassette import REPLAY, Cassette
+
+
+def use_recorded_settings(path, latency_scale):
+  cassette = Cassette(path, REPLAY)
+  for name, value in cassette.settings.items():
+    setattr(settings, name, value)
+  settings.DFP_CASSETTE_FILE = path
+  settings.DFP_CASSETTE_MODE = REPLAY
+  settings.DFP_CASSETTE_LATENCY_SCALE = latency_scale
+  settings.DFP_CALL_HISTORY_FILE = None
+  settings.DFP_TOKEN_CACHE_FILE = None
+
+def replay(profile):
+  """
+  Runs the setup once against a fresh copy of the cassette, and returns its
+  wall and CPU seconds.
+  """
+  dfp.cassette._cassette = None
+  dfp.transport.close_session()
+
+  start, start_cpu = time.perf_counter(), time.process_time()
+  profile.runcall(tasks.add_new_prebid_partner.main)
+  return time.perf_counter() - start, time.process_time() - start_cpu
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('cassette')
+  parser.add_argument('--latency-scale', type=float, default=0,
+    help='how much of the recorded API latency to wait for')
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--sort', default='cumulative')
+  parser.add_argument('--limit', type=int, default=30)
+  args = parser.parse_args(argv)
+
+  use_recorded_settings(args.cassette, args.latency_scale)
+  tasks.add_new_prebid_partner.input = lambda *args: 'y'
+  logging.disable(logging.CRITICAL)
+
+  profile = cProfile.Profile()
+  for run in range(args.repeat):
+    seconds, cpu_seconds = replay(profile)
+    print('run {0}: {1:.2f} s, {2:.2f} s CPU'.format(run + 1, seconds,
+      cpu_seconds))
+
+  pstats.Stats(profile).sort_stats(args.sort).print_stats(args.limit)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""
+Runs setup_partner end to end against an in-memory stand-in for GAM at
+several scales, and records wall time, CPU time, peak RSS, API calls and
+bytes sent.
+
+  python -m benchmarks.setup_benchmark [--cases small medium large]
+    [--history setup_benchmark_history.json] [--compare] [--threshold 0.1]
+
+Each case runs in a fresh interpreter, so peak RSS is its own. Wall and CPU
+time include the stand-in's own work, which is reported separately. Results
+are appended to the history file; with --compare, each case is checked
+against its latest earlier run with the same options (or the one labelled
+--baseline), and the command exits with status 1 if any metric grew by more
+than --threshold.
+"""
+
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+Case = namedtuple('Case', ['num_prices', 'num_ad_units', 'num_creatives'])
+
+CASES = {
+  'small': Case(num_prices=200, num_ad_units=1, num_creatives=1),
+  'medium': Case(num_prices=2000, num_ad_units=30, num_creatives=5),
+  'large': Case(num_prices=20000, num_ad_units=300, num_creatives=20),
+}
+
+# Metrics where a larger value is a regression, and how to print them.
+METRICS = [
+  ('wall_seconds', '{0:.2f} s'),
+  ('cpu_seconds', '{0:.2f} s'),
+  ('peak_rss_mb', '{0:.0f} MB'),
+  ('api_calls', '{0:,}'),
+  ('bytes_sent', '{0:,}'),
+]
+
+USER_EMAIL = 'trafficker@example.com'
+ADVERTISER_NAME = 'Benchmark Advertiser'
+BIDDER_CODE = 'mypartner'
+SIZES = [{'width': '300', 'height': '250'}, {'width': '728', 'height': '90'}]
+
+def get_peak_rss_mb():
+  if resource is None:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux reports kilobytes, macOS bytes.
+  if sys.platform == 'darwin':
+    return peak / (1024.0 * 1024)
+  return peak / 1024.0
+
+def run_case(case, latency=0, max_concurrent_requests=1):
+  """
+  Runs one setup against a fresh fake network and returns its metrics.
+  """
+  import dfp.aio
+  import tasks.add_new_prebid_partner
+  from benchmarks.fake_gam import FakeGAM, create_network, installed
+
+  placements = ['Benchmark Placement']
+  ad_units = ['Benchmark Ad Unit {0}'.format(i)
+    for i in range(case.num_ad_units)]
+  prices = [(i + 1) * 10000 for i in range(case.num_prices)]
+
+  gam = FakeGAM(latency=latency)
+  create_network(gam, USER_EMAIL, ADVERTISER_NAME, placements, ad_units)
+  setup_args = (USER_EMAIL, ADVERTISER_NAME, 'Benchmark Order', placements,
+    ad_units, SIZES, BIDDER_CODE, prices, case.num_creatives, 'USD', {})
+
+  with installed(gam, DFP_MAX_CONCURRENT_REQUESTS=max_concurrent_requests):
+    start, start_cpu = time.perf_counter(), time.process_time()
+    if max_concurrent_requests > 1:
+      dfp.aio.set_max_concurrent_requests(max_concurrent_requests)
+      dfp.aio.run_until_complete(
+        tasks.add_new_prebid_partner.setup_partner_async(*setup_args))
+    else:
+      tasks.add_new_prebid_partner.setup_partner(*setup_args)
+    wall_seconds = time.perf_counter() - start
+    cpu_seconds = time.process_time() - start_cpu
+
+  return {
+    'wall_seconds': wall_seconds,
+    'cpu_seconds': cpu_seconds,
+    'peak_rss_mb': get_peak_rss_mb(),
+    'api_calls': gam.num_calls,
+    'bytes_sent': gam.num_bytes_sent,
+    'fake_gam_seconds': gam.seconds,
+    'line_items': len(gam.objects['LineItem']),
+    'licas': len(gam.objects['LineItemCreativeAssociation']),
+  }
+
+def run_case_in_subprocess(name, latency, max_concurrent_requests):
+  output = subprocess.check_output([sys.executable, '-m',
+    'benchmarks.setup_benchmark', '--run-case', name, '--latency',
+    str(latency), '--max-concurrent-requests', str(max_concurrent_requests)],
+    cwd=ROOT_DIR)
+  return json.loads(output.decode('utf-8'))
+
+def get_label():
+  """
+  Returns the current git commit, to label a run with.
+  """
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+      cwd=ROOT_DIR, stderr=subprocess.DEVNULL).decode('utf-8').strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def load_history(path):
+  if not os.path.exists(path):
+    return []
+  with io.open(path, encoding='utf-8') as history_file:
+    return json.load(history_file)['runs']
+
+def save_history(path, runs):
+  with io.open(path, 'w', encoding='utf-8') as history_file:
+    history_file.write(json.dumps({'runs': runs}, indent=2))
+
+def find_baseline(runs, options, label=None):
+  """
+  Returns, for each case, the results of the latest run with the same
+  options (and `label`, if given).
+  """
+  baseline = {}
+  for run in runs:
+    if any(run.get(option) != value for option, value in options.items()):
+      continue
+    if label is not None and run['label'] != label:
+      continue
+    baseline.update(run['results'])
+  return baseline
+
+def find_regressions(results, baseline, threshold):
+  """
+  Returns (case, metric, baseline value, value) tuples for every metric that
+  grew by more than `threshold` (a fraction) over the baseline results.
+  """
+  regressions = []
+  for name, metrics in sorted(results.items()):
+    baseline_metrics = baseline.get(name)
+    if not baseline_metrics:
+      continue
+    for metric, _ in METRICS:
+      old, new = baseline_metrics.get(metric), metrics.get(metric)
+      if old and new is not None and new > old * (1 + threshold):
+        regressions.append((name, metric, old, new))
+  return regressions
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('--cases', nargs='+', choices=sorted(CASES),
+    default=['small', 'medium', 'large'])
+  parser.add_argument('--latency', type=float, default=0,
+    help='seconds each fake API call takes')
+  parser.add_argument('--max-concurrent-requests', type=int, default=1,
+    help='above 1, run the concurrent setup')
+  parser.add_argument('--history', default='setup_benchmark_history.json')
+  parser.add_argument('--label', default=None,
+    help='a name for this run; the git commit by default')
+  parser.add_argument('--compare', action='store_true')
+  parser.add_argument('--baseline', default=None,
+    help='the label of the run to compare with; the last run by default')
+  parser.add_argument('--threshold', type=float, default=0.1)
+  parser.add_argument('--run-case', choices=sorted(CASES),
+    help=argparse.SUPPRESS)
+  args = parser.parse_args(argv)
+
+  if args.run_case:
+    logging.disable(logging.CRITICAL)
+    print(json.dumps(run_case(CASES[args.run_case], args.latency,
+      args.max_concurrent_requests)))
+    return
+
+  results = {}
+  for name in args.cases:
+    results[name] = run_case_in_subprocess(name, args.latency,
+      args.max_concurrent_requests)
+    print('{0:<8} {1}  (stand-in: {2:.2f} s)'.format(name, '  '.join(
+      '{0}: {1}'.format(metric, 'n/a' if results[name][metric] is None
+        else template.format(results[name][metric]))
+      for metric, template in METRICS), results[name]['fake_gam_seconds']))
+
+  runs = load_history(args.history)
+  options = {'latency': args.latency,
+    'max_concurrent_requests': args.max_concurrent_requests}
+  baseline = find_baseline(runs, options, args.baseline)
+
+  runs.append(dict(options, label=args.label or get_label(),
+    time=datetime.datetime.utcnow().isoformat() + 'Z',
+    python=platform.python_version(), results=results))
+  save_history(args.history, runs)
+
+  if args.compare:
+    if not baseline:
+      print('No earlier run to compare with.')
+      return
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, metric, old, new in regressions:
+      print('REGRESSION {0} {1}: {2:.4g} -> {3:.4g} (+{4:.0%})'.format(name,
+        metric, old, new, new / old - 1))
+    if regressions:
+      sys.exit(1)
+    print('No regressions over {0:.0%}.'.format(args.threshold))
+
+if __name__ == '__main__':
+  main()
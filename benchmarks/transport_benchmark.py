@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Compares a requests session per service, as googleads makes them, with the
+shared pooled session from dfp.transport, against a local stand-in for the
+API that serves pages of line items.
+
+  python -m benchmarks.transport_benchmark [--requests 200] [--workers 4]
+
+Every connection opened would be a TLS handshake against the real API, and
+like the API, the server only compresses responses for clients that ask for
+gzip and say so in their user agent.
+"""
+
+import argparse
+import gzip
+import socketserver
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Lock, Thread
+
+import requests
+
+from dfp.transport import create_session
+
+
+LINE_ITEM = (
+  '<results><orderId>1357913</orderId><id>{0}</id>'
+  '<name>mypartner: HB $0{1:.2f}</name><startDateTime><date><year>2019</year>'
+  '<month>10</month><day>1</day></date></startDateTime>'
+  '<costPerUnit><currencyCode>USD</currencyCode>'
+  '<microAmount>{2}</microAmount></costPerUnit><status>INACTIVE</status>'
+  '</results>')
+
+def make_page(page_size):
+  """
+  Returns a getLineItemsByStatement response body with `page_size` results.
+  """
+  results = ''.join(LINE_ITEM.format(i, i / 100, i * 10000)
+    for i in range(page_size))
+  return ('<soap:Envelope><soap:Body><getLineItemsByStatementResponse><rval>'
+    '<totalResultSetSize>{0}</totalResultSetSize>{1}</rval>'
+    '</getLineItemsByStatementResponse></soap:Body></soap:Envelope>').format(
+    page_size, results).encode('utf-8')
+
+class Counters(object):
+
+  def __init__(self):
+    self.lock = Lock()
+    self.connections = 0
+    self.bytes_sent = 0
+
+  def add(self, connections=0, bytes_sent=0):
+    with self.lock:
+      self.connections += connections
+      self.bytes_sent += bytes_sent
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+def start_server(page):
+  """
+  Starts a keep-alive server on a free local port that answers every POST
+  with `page`, and returns it with its Counters.
+  """
+  counters = Counters()
+  compressed_page = gzip.compress(page)
+
+  class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send small responses without waiting on delayed ACKs, like a real
+    # server would.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+      BaseHTTPRequestHandler.setup(self)
+      counters.add(connections=1)
+
+    def do_POST(self):
+      self.rfile.read(int(self.headers.get('Content-Length') or 0))
+      body = page
+      if ('gzip' in self.headers.get('Accept-Encoding', '') and
+          'gzip' in self.headers.get('User-Agent', '')):
+        body = compressed_page
+      self.send_response(200)
+      self.send_header('Content-Type', 'text/xml; charset=utf-8')
+      self.send_header('Content-Length', str(len(body)))
+      if body is compressed_page:
+        self.send_header('Content-Encoding', 'gzip')
+      self.end_headers()
+      self.wfile.write(body)
+      counters.add(bytes_sent=len(body))
+
+    def log_message(self, *args):
+      pass
+
+  server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+  Thread(target=server.serve_forever, daemon=True).start()
+  return server, counters
+
+def run(url, num_requests, workers, session, user_agent):
+  """
+  Makes `num_requests` SOAP-sized POSTs from `workers` threads, through
+  `session` or, if it is None, a new session each, and returns the seconds
+  taken.
+  """
+  headers = {'User-Agent': user_agent, 'Accept-Encoding': 'gzip',
+    'Content-Type': 'text/xml; charset=utf-8'}
+
+  def post(_):
+    if session is not None:
+      session.post(url, data=b'<soap:Envelope/>', headers=headers).content
+      return
+    with requests.Session() as own_session:
+      own_session.post(url, data=b'<soap:Envelope/>', headers=headers).content
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    list(executor.map(post, range(num_requests)))
+  return time.perf_counter() - start
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+  parser.add_argument('--requests', type=int, default=200)
+  parser.add_argument('--workers', type=int, default=4)
+  parser.add_argument('--page-size', type=int, default=500,
+    help='the line items per response page')
+  args = parser.parse_args(argv)
+
+  server, counters = start_server(make_page(args.page_size))
+  url = 'http://127.0.0.1:{0}/apis/ads/publisher/v201908/LineItemService'.format(
+    server.server_address[1])
+
+  configurations = [
+    ('session per service', False, 'My App (googleads)'),
+    ('shared pooled session', True, 'My App (googleads)'),
+    ('shared pooled session, gzip', True, 'My App (gzip) (googleads)'),
+  ]
+  for name, shared, user_agent in configurations:
+    counters.connections = counters.bytes_sent = 0
+    session = create_session(args.workers) if shared else None
+    seconds = run(url, args.requests, args.workers, session, user_agent)
+    if session is not None:
+      session.close()
+    print('{name:<28} {seconds:>7.2f} s  connections: {connections:>5}  '
+      'response bytes: {bytes:>11,}'.format(name=name, seconds=seconds,
+      connections=counters.connections, bytes=counters.bytes_sent))
+
+  server.shutdown()
+
+if __name__ == '__main__':
+  main()
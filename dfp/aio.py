@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""
+Coroutine versions of the dfp functions, for overlapping many API calls.
+
+googleads only has a blocking SOAP transport, so each call runs on a bounded
+thread pool and is awaited from the event loop. The pool's size is the
+overall limit on requests in flight.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+import dfp.associate_line_items_and_creatives
+import dfp.batch
+import dfp.create_creatives
+import dfp.create_custom_targeting
+import dfp.create_line_items
+import dfp.create_orders
+import dfp.get_ad_units
+import dfp.get_advertisers
+import dfp.get_custom_targeting
+import dfp.get_placements
+import dfp.get_users
+from dfp.exceptions import BadSettingException
+
+
+logger = logging.getLogger(__name__)
+
+# How many requests may be in flight at once unless settings say otherwise.
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+
+def get_max_concurrent_requests(max_requests=None):
+  """
+  Returns the most API requests to have in flight at once.
+
+  Args:
+    max_requests (int): an explicit limit, or None to use
+      settings.DFP_MAX_CONCURRENT_REQUESTS
+  Returns:
+    an integer
+  """
+  if max_requests is None:
+    max_requests = (getattr(settings, 'DFP_MAX_CONCURRENT_REQUESTS', None) or
+      DEFAULT_MAX_CONCURRENT_REQUESTS)
+
+  if max_requests < 1:
+    raise BadSettingException(
+      'The number of concurrent requests must be at least 1.')
+
+  return max_requests
+
+class RequestLimiter(object):
+  """
+  Runs blocking API calls on a thread pool whose size caps the number of
+  requests in flight.
+  """
+
+  def __init__(self, max_requests=None):
+    self.max_requests = get_max_concurrent_requests(max_requests)
+    self.executor = ThreadPoolExecutor(max_workers=self.max_requests,
+      thread_name_prefix='dfp-aio')
+
+  async def run(self, function, *args, **kwargs):
+    """
+    Awaits `function(*args, **kwargs)` run on the pool.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(self.executor,
+      functools.partial(function, *args, **kwargs))
+
+  def close(self):
+    self.executor.shutdown(wait=True)
+
+_limiter = None
+
+def get_limiter():
+  """
+  Returns the shared RequestLimiter, creating it from settings if needed.
+  """
+  global _limiter
+  if _limiter is None:
+    _limiter = RequestLimiter()
+  return _limiter
+
+def set_max_concurrent_requests(max_requests):
+  """
+  Replaces the shared RequestLimiter with one allowing `max_requests`
+  requests in flight.
+  """
+  global _limiter
+  if _limiter is not None:
+    _limiter.close()
+  _limiter = RequestLimiter(max_requests)
+
+def run_until_complete(coroutine):
+  """
+  Runs a coroutine to completion from synchronous code.
+  """
+  if hasattr(asyncio, 'run'):
+    return asyncio.run(coroutine)
+  return asyncio.get_event_loop().run_until_complete(coroutine)
+
+async def run(function, *args, **kwargs):
+  """
+  Awaits a blocking call on the shared RequestLimiter.
+  """
+  return await get_limiter().run(function, *args, **kwargs)
+
+async def run_batches(function, items, kind, batch_size=None,
+    objects_per_item=1):
+  """
+  Awaits `function(batch)` for consecutive batches of `items`, with as many
+  calls in flight as the limiter allows. Unless `batch_size` is given, each
+  batch is sized when it is sent by the kind's dfp.batch.BatchSizer, which
+  the create calls inside `function` keep adjusting.
+
+  Args:
+    function (function): a blocking function of a batch of items
+    items (arr): the items to split into batches
+    kind (str): the kind of object created, e.g. 'LineItem'
+    batch_size (int): a fixed number of objects per batch, or None
+    objects_per_item (int): how many objects each item creates, e.g. one
+      association per creative for each line item
+  Returns:
+    an array: the result of each batch, in the order of `items`
+  """
+  sizer = dfp.batch.get_batch_sizer(kind)
+  max_in_flight = get_limiter().max_requests
+  starts = {}
+  results = {}
+  pending = set()
+  start = 0
+  try:
+    while start < len(items) or pending:
+      while start < len(items) and len(pending) < max_in_flight:
+        num_objects = batch_size or sizer.size
+        end = start + max(num_objects // objects_per_item, 1)
+        task = asyncio.ensure_future(run(function, items[start:end]))
+        starts[task] = start
+        pending.add(task)
+        start = end
+      done, pending = await asyncio.wait(pending,
+        return_when=asyncio.FIRST_COMPLETED)
+      for task in done:
+        results[starts.pop(task)] = task.result()
+  finally:
+    for task in pending:
+      task.cancel()
+  return [results[batch_start] for batch_start in sorted(results)]
+
+async def get_user_id_by_email(email_address):
+  return await run(dfp.get_users.get_user_id_by_email, email_address)
+
+async def get_placement_ids_by_name(placement_names):
+  """
+  Looks up every placement concurrently; see
+  dfp.get_placements.get_placement_ids_by_name.
+  """
+  placements = await asyncio.gather(*[
+    run(dfp.get_placements.get_placement_by_name, placement_name)
+    for placement_name in placement_names])
+  return [placement['id'] for placement in placements]
+
+async def get_ad_unit_ids_by_name(ad_unit_names):
+  """
+  Looks up every ad unit concurrently; see
+  dfp.get_ad_units.get_ad_unit_ids_by_name.
+  """
+  ad_units = await asyncio.gather(*[
+    run(dfp.get_ad_units.get_ad_unit_by_name, ad_unit_name)
+    for ad_unit_name in ad_unit_names])
+  return [ad_unit['id'] for ad_unit in ad_units]
+
+async def get_advertiser_id_by_name(name):
+  return await run(dfp.get_advertisers.get_advertiser_id_by_name, name)
+
+async def create_order(order_name, advertiser_id, trafficker_id):
+  return await run(dfp.create_orders.create_order, order_name, advertiser_id,
+    trafficker_id)
+
+async def get_key_id_by_name(name):
+  return await run(dfp.get_custom_targeting.get_key_id_by_name, name)
+
+async def get_targeting_by_key_name(name):
+  return await run(dfp.get_custom_targeting.get_targeting_by_key_name, name)
+
+async def create_targeting_key(name):
+  return await run(dfp.create_custom_targeting.create_targeting_key, name)
+
+async def create_targeting_value(name, key_id):
+  return await run(dfp.create_custom_targeting.create_targeting_value, name,
+    key_id)
+
+async def create_line_items(line_items, batch_size=None):
+  """
+  Creates line items in concurrent batches; see
+  dfp.create_line_items.create_line_items.
+
+  Returns:
+    an array: the created line item IDs, in the order of `line_items`
+  """
+  batches = await run_batches(dfp.create_line_items.create_line_items,
+    list(line_items), 'LineItem', batch_size)
+  return [line_item_id for batch in batches for line_item_id in batch]
+
+async def get_or_create_creatives(creatives):
+  return await run(dfp.create_creatives.get_or_create_creatives, creatives)
+
+async def make_licas(line_item_ids, creative_ids, sizes, batch_size=None):
+  """
+  Attaches creatives to line items, with concurrent calls for batches of line
+  items; see dfp.associate_line_items_and_creatives.make_licas.
+  """
+  def make_licas(batch):
+    return dfp.associate_line_items_and_creatives.make_licas(batch,
+      creative_ids, sizes)
+
+  await run_batches(make_licas, list(line_item_ids),
+    'LineItemCreativeAssociation', batch_size,
+    objects_per_item=max(len(creative_ids), 1))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+import logging
+
+from dfp.client import ad_manager, get_client
+
+
+logger = logging.getLogger(__name__)
+
+# How many orders we archive with a single action.
+ORDERS_PER_ACTION = 200
+
+def archive_orders(order_ids):
+  """
+  Archives orders in DFP, with one action per batch of orders.
+
+  Args:
+    order_ids (arr): an array of order IDs
+  Returns:
+    an integer: the number of orders DFP archived
+  """
+  dfp_client = get_client()
+  order_service = dfp_client.GetService('OrderService', version='v201908')
+
+  order_ids = list(order_ids)
+  num_changes = 0
+  for start in range(0, len(order_ids), ORDERS_PER_ACTION):
+    ids = order_ids[start:start + ORDERS_PER_ACTION]
+    statement = ad_manager.FilterStatement('WHERE id IN ({0})'.format(
+      ', '.join(str(int(order_id)) for order_id in ids)))
+    response = order_service.performOrderAction(
+      {'xsi_type': 'ArchiveOrders'}, statement.ToStatement())
+    if response and 'numChanges' in response:
+      num_changes += response['numChanges']
+
+  logger.info(u'Archived {0} orders.'.format(num_changes))
+  return num_changes
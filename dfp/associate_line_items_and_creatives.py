@@ -1,10 +1,37 @@
 import logging
 
+import dfp.get_licas
+from dfp.batch import submit_in_batches
 from dfp.client import get_client
+from dfp.specs import LicaSpec
 
 logger = logging.getLogger(__name__)
 
 
+def get_lica_key(lica):
+    """
+    Returns what identifies a line item creative association.
+    """
+    return lica['lineItemId'], lica['creativeId']
+
+
+def find_licas(licas):
+    """
+    Finds which of the given associations exist in DFP, e.g. after a create
+    call timed out.
+
+    Args:
+      licas (arr): an array of association configs
+    Returns:
+      an array of associations with their line item and creative IDs
+    """
+    keys = set(get_lica_key(lica) for lica in licas)
+    line_item_ids = sorted(set(line_item_id for line_item_id, _ in keys))
+    return [lica for lica in dfp.get_licas.iter_licas(
+                line_item_ids, fields=['lineItemId', 'creativeId'])
+            if get_lica_key(lica) in keys]
+
+
 def make_licas(line_item_ids, creative_ids, sizes):
     """
     Attaches creatives to line items in DFP.
@@ -20,22 +47,16 @@ def make_licas(line_item_ids, creative_ids, sizes):
     lica_service = dfp_client.GetService(
         'LineItemCreativeAssociationService', version='v201908')
 
-    licas = []
-    for line_item_id in line_item_ids:
-        for creative_id in creative_ids:
-            licas.append({
-                'creativeId': creative_id,
-                'lineItemId': line_item_id,
-                # "Overrides the value set for Creative.size, which allows the
-                #   creative to be served to ad units that would otherwise not be
-                #   compatible for its actual size."
-                #    https://developers.google.com/doubleclick-publishers/docs/reference/v201908/LineItemCreativeAssociationService.LineItemCreativeAssociation
-                #
-                # This is equivalent to selecting "Size overrides" in the DFP creative
-                # settings, as recommended: http://prebid.org/adops/step-by-step.html
-                'sizes': sizes
-            })
-    licas = lica_service.createLineItemCreativeAssociations(licas)
+    # Sizes are shared by every association, so store them once.
+    if sizes is not None:
+        sizes = tuple(sizes)
+
+    licas = [LicaSpec(line_item_id, creative_id, sizes)
+             for line_item_id in line_item_ids
+             for creative_id in creative_ids]
+    licas = submit_in_batches(lica_service.createLineItemCreativeAssociations,
+        licas, 'LineItemCreativeAssociation',
+        find_existing=find_licas, get_key=get_lica_key)
 
     if licas:
         logger.info(
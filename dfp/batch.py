@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+
+"""
+Submits create calls in batches sized to what GAM handles well, so that a few
+invalid objects do not sink a batch.
+
+GAM rejects a whole create call when any object in it is invalid, e.g. a line
+item whose name is already taken in its order. Its errors say which objects
+are invalid, so submit records those and sends the others again. When the
+errors do not account for the failure, it retries the call as two halves,
+recursively, so every valid object is still created and each invalid one is
+isolated with O(log n) extra calls. Invalid objects are appended, with GAM's
+reasons, to a rejects file of JSON lines.
+
+How many objects fit in a call depends on how large they are (e.g. how many
+ad units line items target) and on how busy GAM is, so submit_in_batches
+sizes batches with a BatchSizer per kind of object: batches grow additively
+while the latency per object improves, and are halved when a call is too
+large or GAM too busy for it.
+
+Objects may be passed as specs (see dfp.specs), which are turned into SOAP
+dicts one batch at a time, just before the batch is sent.
+
+Create calls are not idempotent, so a batch is only sent again as is when
+the error shows nothing in it was created. After a timeout or a gateway
+error GAM may have created the batch anyway, so submit_in_batches first
+looks up which of its objects exist and sends only the others again.
+"""
+
+import datetime
+import io
+import json
+import logging
+import re
+import time
+from threading import Lock
+
+import settings
+from dfp.client import LazyModule, errors
+from dfp.exceptions import BadSettingException
+from dfp.specs import to_soap
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REJECTS_FILE = 'dfp_rejects.jsonl'
+
+# Batch size bounds unless settings say otherwise, and how many objects to
+# add to a batch at a time.
+DEFAULT_MIN_BATCH_SIZE = 1
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_INITIAL_BATCH_SIZE = 50
+BATCH_SIZE_STEP = 10
+
+# Errors that mean a call was too large or GAM too busy for it, rather than
+# anything being wrong with the objects in it. Nothing in the call was
+# created.
+OVERLOAD_API_ERRORS = ('CollectionSizeError.TOO_LARGE',
+  'ServerError.SERVER_BUSY')
+OVERLOAD_HTTP_STATUSES = (413,)
+
+# HTTP statuses, besides client timeouts, after which GAM may or may not have
+# created the objects in a call.
+INTERRUPTED_HTTP_STATUSES = (408, 502, 503, 504)
+
+requests_exceptions = LazyModule('requests.exceptions')
+zeep_exceptions = LazyModule('zeep.exceptions')
+
+# The start of an ApiError's fieldPath when it is about one object in the
+# request, e.g. 'lineItem[3].name'.
+ITEM_FIELD_PATH_RE = re.compile(r'^\w+\[(\d+)\]')
+
+def get_item_errors(fault):
+  """
+  Returns the errors of a GoogleAdsServerFault that are about objects in the
+  request, rather than the request as a whole.
+
+  Args:
+    fault (GoogleAdsServerFault): the error raised by the call
+  Returns:
+    an array of (index, reason) tuples: the index of the object in the
+      request, and a description of what is wrong with it
+  """
+  item_errors = []
+  for error in getattr(fault, 'errors', None) or ():
+    field_path = getattr(error, 'fieldPath', None) or ''
+    match = ITEM_FIELD_PATH_RE.match(field_path)
+    if match is None:
+      continue
+    reason = u'{0} at {1}'.format(getattr(error, 'errorString', None) or
+      'ApiError', field_path)
+    trigger = getattr(error, 'trigger', None)
+    if trigger:
+      reason = u'{0} (trigger: {1})'.format(reason, trigger)
+    item_errors.append((int(match.group(1)), reason))
+  return item_errors
+
+class Rejects(object):
+  """
+  A JSON lines file of the objects GAM would not create, and why.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.count = 0
+    self.lock = Lock()
+
+  def add(self, kind, item, reasons):
+    """
+    Appends a rejected object.
+
+    Args:
+      kind (str): the kind of object, e.g. 'LineItem'
+      item (dict): the object as it was sent
+      reasons (arr): why GAM rejected it
+    """
+    line = json.dumps({
+      'time': datetime.datetime.utcnow().isoformat() + 'Z',
+      'kind': kind,
+      'reasons': reasons,
+      'item': item,
+    }, default=str)
+    with self.lock:
+      with io.open(self.path, 'a', encoding='utf-8') as rejects_file:
+        rejects_file.write(line + u'\n')
+      self.count += 1
+    logger.warning(u'GAM rejected a {0} ({1}); it was written to {2}.'.format(
+      kind, '; '.join(reasons), self.path))
+
+_rejects = None
+_rejects_lock = Lock()
+
+def get_rejects():
+  """
+  Returns the Rejects for settings.DFP_REJECTS_FILE, or the default file.
+  """
+  global _rejects
+  path = getattr(settings, 'DFP_REJECTS_FILE', None) or DEFAULT_REJECTS_FILE
+  with _rejects_lock:
+    if _rejects is None or _rejects.path != path:
+      _rejects = Rejects(path)
+    return _rejects
+
+def get_reasons_by_index(item_errors, num_items):
+  """
+  Groups item errors by the index of the object they are about.
+
+  Returns:
+    a dict of index to an array of reasons, or None if an index is not in a
+      request of `num_items` objects
+  """
+  reasons_by_index = {}
+  for index, reason in item_errors:
+    if index >= num_items:
+      return None
+    reasons_by_index.setdefault(index, []).append(reason)
+  return reasons_by_index
+
+def submit(create, items, kind):
+  """
+  Calls `create(items)`, and if GAM rejects some of the items, creates the
+  others and records the rejected ones.
+
+  Args:
+    create (function): a create* service method, e.g.
+      line_item_service.createLineItems
+    items (arr): the objects to create, as sent to the API
+    kind (str): the kind of object, e.g. 'LineItem', for the rejects file
+  Returns:
+    an array: the created objects, in the order of `items`, without the
+      rejected ones
+  """
+  try:
+    return create(items) or []
+  except errors.GoogleAdsServerFault as fault:
+    item_errors = get_item_errors(fault)
+    if not item_errors:
+      raise
+  return submit_valid(create, items, kind, item_errors)
+
+def submit_valid(create, items, kind, item_errors):
+  """
+  Creates the items of a call GAM rejected, except the invalid ones, which
+  are recorded instead.
+
+  The objects GAM's errors point at are rejected right away and the others
+  sent again once. Only if that fails too, or the errors do not point at
+  objects in the request, are the objects retried in halves.
+
+  Args:
+    create (function): a create* service method
+    items (arr): the objects of the rejected call
+    kind (str): the kind of object, e.g. 'LineItem'
+    item_errors (arr): the call's errors, as returned by get_item_errors
+  Returns:
+    an array: the created objects, in the order of `items`, without the
+      rejected ones
+  """
+  if len(items) == 1:
+    get_rejects().add(kind, items[0], [reason for _, reason in item_errors])
+    return []
+
+  reasons_by_index = get_reasons_by_index(item_errors, len(items))
+  if reasons_by_index is not None:
+    for index in sorted(reasons_by_index):
+      get_rejects().add(kind, items[index], reasons_by_index[index])
+    items = [item for index, item in enumerate(items)
+      if index not in reasons_by_index]
+    if not items:
+      return []
+
+    logger.info(u'GAM rejected {0} {1}s of a batch; sending the other {2} '
+      'again.'.format(len(reasons_by_index), kind, len(items)))
+    try:
+      return create(items) or []
+    except errors.GoogleAdsServerFault as fault:
+      if not get_item_errors(fault):
+        raise
+
+  logger.info(u'GAM\'s errors did not account for a failed batch of {0} '
+    '{1}s; retrying it in halves.'.format(len(items), kind))
+  half = len(items) // 2
+  return (submit(create, items[:half], kind) +
+    submit(create, items[half:], kind))
+
+def is_overload_error(error):
+  """
+  Returns whether an error from a create call means it should be sent again
+  in smaller batches, as nothing in it was created: an HTTP status for an
+  oversized request, or an API error in OVERLOAD_API_ERRORS.
+  """
+  if isinstance(error, zeep_exceptions.TransportError):
+    return error.status_code in OVERLOAD_HTTP_STATUSES
+  if isinstance(error, errors.GoogleAdsServerFault):
+    return any(getattr(api_error, 'errorString', None) in OVERLOAD_API_ERRORS
+      for api_error in error.errors or ())
+  return False
+
+def is_interrupted_error(error):
+  """
+  Returns whether an error from a create call leaves it unknown what the call
+  created: a timeout, or an HTTP status in INTERRUPTED_HTTP_STATUSES.
+  """
+  if isinstance(error, requests_exceptions.Timeout):
+    return True
+  if isinstance(error, zeep_exceptions.TransportError):
+    return error.status_code in INTERRUPTED_HTTP_STATUSES
+  return False
+
+def build_in_query(field, values, value_type='TextValue'):
+  """
+  Returns a PQL condition matching objects whose `field` is any of `values`,
+  and its bind variables, e.g. to look up which objects of a batch exist.
+
+  Returns:
+    a tuple: the condition, e.g. 'name IN (:name0, :name1)', and an array of
+      bind variables
+  """
+  keys = ['{0}{1}'.format(field, index) for index in range(len(values))]
+  query = '{0} IN ({1})'.format(field,
+    ', '.join(':' + key for key in keys))
+  bind_values = [{
+    'key': key,
+    'value': {
+      'xsi_type': value_type,
+      'value': value,
+    },
+  } for key, value in zip(keys, values)]
+  return query, bind_values
+
+def get_batch_size_bounds():
+  """
+  Returns the smallest, largest and initial batch sizes from
+  settings.DFP_MIN_BATCH_SIZE, DFP_MAX_BATCH_SIZE and DFP_INITIAL_BATCH_SIZE.
+  """
+  min_size = (getattr(settings, 'DFP_MIN_BATCH_SIZE', None) or
+    DEFAULT_MIN_BATCH_SIZE)
+  max_size = (getattr(settings, 'DFP_MAX_BATCH_SIZE', None) or
+    DEFAULT_MAX_BATCH_SIZE)
+  initial_size = (getattr(settings, 'DFP_INITIAL_BATCH_SIZE', None) or
+    DEFAULT_INITIAL_BATCH_SIZE)
+
+  if min_size < 1 or max_size < min_size:
+    raise BadSettingException('The batch sizes must satisfy '
+      '1 <= DFP_MIN_BATCH_SIZE <= DFP_MAX_BATCH_SIZE.')
+
+  return min_size, max_size, min(max(initial_size, min_size), max_size)
+
+class BatchSizer(object):
+  """
+  Chooses how many objects of a kind to send per create call, by additive
+  increase and multiplicative decrease.
+  """
+
+  def __init__(self, kind, min_size, max_size, initial_size,
+      step=BATCH_SIZE_STEP):
+    """
+    Args:
+      kind (str): the kind of object, e.g. 'LineItem', for logging
+      min_size (int): the smallest batch to send
+      max_size (int): the largest batch to send
+      initial_size (int): the first batch size
+      step (int): how much to grow the batch size by
+    """
+    self.kind = kind
+    self.min_size = min_size
+    self.max_size = max_size
+    self.size = initial_size
+    self.step = step
+    self.seconds_per_item = None
+    self.lock = Lock()
+
+  def record(self, num_items, seconds):
+    """
+    Records a successful call, and grows the batch size if the latency per
+    object improved on the previous full batch.
+    """
+    per_item = seconds / max(num_items, 1)
+    with self.lock:
+      # A short last batch says nothing about larger ones.
+      if num_items < self.size:
+        return
+      improved = (self.seconds_per_item is None or
+        per_item < self.seconds_per_item)
+      self.seconds_per_item = per_item
+      if improved and self.size < self.max_size:
+        self.size = min(self.size + self.step, self.max_size)
+        logger.info(u'{0} batches took {1:.0f} ms per object; sending {2} '
+          'per call.'.format(self.kind, per_item * 1000, self.size))
+
+  def shrink(self, num_items, error):
+    """
+    Halves the batch size after a call of `num_items` objects was too large,
+    GAM too busy for it, or it was interrupted.
+
+    Returns:
+      a boolean: False if the batch size was already the smallest allowed
+    """
+    with self.lock:
+      if num_items <= self.min_size:
+        return False
+      self.size = max(min(self.size, num_items // 2), self.min_size)
+      # Latencies of larger batches are no guide to smaller ones.
+      self.seconds_per_item = None
+      logger.warning(u'A batch of {0} {1}s failed ({2}); sending {3} per '
+        'call.'.format(num_items, self.kind, error, self.size))
+      return True
+
+_batch_sizers = {}
+_batch_sizers_lock = Lock()
+
+def get_batch_sizer(kind):
+  """
+  Returns the shared BatchSizer for a kind of object, creating it from
+  settings if needed.
+  """
+  with _batch_sizers_lock:
+    if kind not in _batch_sizers:
+      _batch_sizers[kind] = BatchSizer(kind, *get_batch_size_bounds())
+    return _batch_sizers[kind]
+
+def submit_in_batches(create, items, kind, find_existing=None,
+    get_key=None):
+  """
+  Submits `items` in consecutive batches sized by the kind's BatchSizer,
+  sending a batch again in smaller ones if it is too large. Each batch is
+  turned into SOAP dicts only when it is sent.
+
+  If a call times out or fails at a gateway, GAM may have created some or
+  all of its objects. With `find_existing` and `get_key`, those objects are
+  looked up and only the others are sent again; without them, the error is
+  raised.
+
+  Args:
+    create (function): a create* service method
+    items (arr): the objects to create, as specs or as sent to the API
+    kind (str): the kind of object, e.g. 'LineItem'
+    find_existing (function): takes a batch as sent to the API, and returns
+      the objects of it that exist in GAM
+    get_key (function): returns what identifies an object, e.g. its name,
+      both for the objects sent and those returned
+  Returns:
+    an array: the created objects, in the order of `items`, without the
+      rejected ones
+  """
+  sizer = get_batch_sizer(kind)
+  created = []
+  start = 0
+  while start < len(items):
+    batch = [to_soap(item) for item in items[start:start + sizer.size]]
+    call_start = time.time()
+    try:
+      created.extend(create(batch) or [])
+    except Exception as error:
+      if is_overload_error(error):
+        if not sizer.shrink(len(batch), error):
+          raise
+        continue
+      item_errors = (get_item_errors(error)
+        if isinstance(error, errors.GoogleAdsServerFault) else None)
+      if item_errors:
+        created.extend(submit_valid(create, batch, kind, item_errors))
+      elif (is_interrupted_error(error) and find_existing is not None and
+          sizer.shrink(len(batch), error)):
+        created.extend(submit_missing(create, batch, kind, find_existing,
+          get_key))
+      else:
+        raise
+    else:
+      # Retried calls say little about how long a batch takes.
+      sizer.record(len(batch), time.time() - call_start)
+    start += len(batch)
+  return created
+
+def submit_missing(create, batch, kind, find_existing, get_key):
+  """
+  Creates the objects of an interrupted call that GAM did not create.
+
+  Returns:
+    an array: the objects of `batch` that exist or were created, in its order
+  """
+  existing = {get_key(obj): obj for obj in find_existing(batch)}
+  missing = [item for item in batch if get_key(item) not in existing]
+  logger.warning(u'{0} of {1} {2}s exist after an interrupted call; sending '
+    'the other {3} again.'.format(len(existing), len(batch), kind,
+      len(missing)))
+
+  created = {}
+  if missing:
+    created = {get_key(obj): obj for obj in submit_in_batches(create, missing,
+      kind, find_existing, get_key)}
+
+  results = []
+  for item in batch:
+    key = get_key(item)
+    if key in existing:
+      results.append(existing[key])
+    elif key in created:
+      results.append(created[key])
+  return results
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+import io
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from threading import Lock
+
+
+logger = logging.getLogger(__name__)
+
+# How many recent calls to remember per API method.
+MAX_SAMPLES = 50
+
+# Rough latencies for methods we have no recorded calls for yet: a fixed cost
+# per call plus a cost per object sent in it.
+DEFAULT_SECONDS_PER_CALL = 1.0
+DEFAULT_SECONDS_PER_ITEM = 0.1
+
+def count_items(args):
+  """
+  Returns the number of objects sent in an API call: the length of its first
+  argument if that is a list (as for create* methods), otherwise 1.
+  """
+  if args and isinstance(args[0], (list, tuple)):
+    return len(args[0])
+  return 1
+
+class CallHistory(object):
+  """
+  Latencies of recent DFP API calls, and the targeting value names last seen
+  per key, kept in a JSON file between runs so setups can be estimated before
+  they start.
+  """
+
+  def __init__(self, path=None):
+    """
+    Args:
+      path (str): the JSON file to load from and save to, or None to keep the
+        history in memory only
+    """
+    self.path = path
+    self.samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+    self.values = {}
+    self.lock = Lock()
+
+    if path is not None and os.path.exists(path):
+      with io.open(path, 'r', encoding='utf-8') as history_file:
+        data = json.load(history_file)
+      for method, samples in data.get('calls', {}).items():
+        self.samples[method].extend(tuple(sample) for sample in samples)
+      for key_name, value_names in data.get('values', {}).items():
+        self.values[key_name] = set(value_names)
+
+  def record(self, method, seconds, num_items=1):
+    """
+    Records one API call.
+
+    Args:
+      method (str): e.g. 'LineItemService.createLineItems'
+      seconds (float): how long the call took
+      num_items (int): how many objects were sent in the call
+    """
+    with self.lock:
+      self.samples[method].append((seconds, num_items))
+
+  def record_values(self, key_name, value_names):
+    """
+    Remembers that values with these names exist for a targeting key.
+    """
+    with self.lock:
+      self.values.setdefault(key_name, set()).update(value_names)
+
+  def get_values(self, key_name):
+    """
+    Returns the set of value names last seen for a key, or None if we have
+    never looked the key up.
+    """
+    with self.lock:
+      value_names = self.values.get(key_name)
+      return set(value_names) if value_names is not None else None
+
+  def estimate(self, method, num_items=1):
+    """
+    Estimates the seconds one call will take, by fitting a line through the
+    recorded (items, seconds) pairs for the method.
+
+    Args:
+      method (str)
+      num_items (int): how many objects the call will send
+    Returns:
+      a float
+    """
+    with self.lock:
+      samples = list(self.samples.get(method, ()))
+
+    if not samples:
+      return DEFAULT_SECONDS_PER_CALL + DEFAULT_SECONDS_PER_ITEM * num_items
+
+    mean_seconds = sum(seconds for seconds, _ in samples) / len(samples)
+    mean_items = float(sum(items for _, items in samples)) / len(samples)
+    variance = sum((items - mean_items) ** 2 for _, items in samples)
+
+    # Every call had the same size, so scale the mean by size.
+    if not variance:
+      return mean_seconds * num_items / mean_items
+
+    slope = sum((items - mean_items) * (seconds - mean_seconds)
+      for seconds, items in samples) / variance
+    return max(mean_seconds + slope * (num_items - mean_items), 0.0)
+
+  def save(self):
+    """
+    Writes the history to its file, replacing the old one atomically.
+    """
+    if self.path is None:
+      return
+
+    with self.lock:
+      data = {
+        'calls': {method: [list(sample) for sample in samples]
+          for method, samples in self.samples.items() if samples},
+        'values': {key_name: sorted(value_names)
+          for key_name, value_names in self.values.items()},
+      }
+
+    temp_path = '{0}.tmp'.format(self.path)
+    with io.open(temp_path, 'w', encoding='utf-8') as history_file:
+      history_file.write(json.dumps(data, indent=2, sort_keys=True))
+    os.replace(temp_path, self.path)
+    logger.debug(u'Saved the call history to {0}.'.format(self.path))
+
+class TimedService(object):
+  """
+  Wraps a googleads service so every method call is timed into a
+  CallHistory.
+  """
+
+  def __init__(self, service, service_name, history):
+    self._service = service
+    self._service_name = service_name
+    self._history = history
+
+  def __getattr__(self, name):
+    attr = getattr(self._service, name)
+    if not callable(attr):
+      return attr
+
+    method = '{0}.{1}'.format(self._service_name, name)
+    history = self._history
+
+    def timed(*args, **kwargs):
+      start = time.time()
+      result = attr(*args, **kwargs)
+      history.record(method, time.time() - start, count_items(args))
+      return result
+    return timed
+
+class TimedClient(object):
+  """
+  Wraps an AdManagerClient so the services it returns are timed.
+  """
+
+  def __init__(self, client, history):
+    self._client = client
+    self._history = history
+
+  def GetService(self, service_name, *args, **kwargs):
+    return TimedService(self._client.GetService(service_name, *args, **kwargs),
+      service_name, self._history)
+
+  def __getattr__(self, name):
+    return getattr(self._client, name)
+
+_recording = None
+
+def start_recording(history):
+  """
+  Times every API call made through dfp.client.get_client into `history`
+  until stop_recording is called.
+  """
+  global _recording
+  _recording = history
+
+def stop_recording():
+  """
+  Stops timing API calls and saves the history being recorded, if any.
+  """
+  global _recording
+  history, _recording = _recording, None
+  if history is not None:
+    history.save()
+
+def get_recording():
+  """
+  Returns the CallHistory being recorded into, or None.
+  """
+  return _recording
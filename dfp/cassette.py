@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+
+"""
+Records the API's HTTP traffic to a cassette file, and replays it offline.
+
+In record mode, every SOAP request and response sent through the shared
+session in dfp.transport, and every WSDL document zeep loads, is kept and
+written to a gzip-compressed JSON cassette when the process exits. In replay
+mode, responses are served from the cassette instead of the network,
+optionally after their recorded latency, so a real setup can be profiled
+again and again without credentials.
+
+Only request bodies are recorded, never request headers, so cassettes do not
+contain access tokens. They do contain the network's objects, so keep them
+private.
+"""
+
+import atexit
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from threading import Lock
+
+import requests
+import zeep.cache
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import settings
+from dfp.exceptions import BadSettingException
+
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# Response headers that describe the bytes on the wire rather than the
+# decoded content we keep.
+WIRE_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding',
+  'connection')
+
+# Settings that are saved with a recording, so it can be replayed with the
+# same setup.
+RECORDED_SETTINGS_PREFIXES = ('DFP_', 'PREBID_')
+UNRECORDED_SETTINGS = ('DFP_CASSETTE_FILE', 'DFP_CASSETTE_MODE',
+  'DFP_CASSETTE_LATENCY_SCALE', 'DFP_TOKEN_CACHE_FILE',
+  'DFP_CALL_HISTORY_FILE')
+RECORDED_YAML_KEYS = ('application_name', 'network_code', 'enable_compression')
+
+class CassetteException(Exception):
+  """
+  When a replayed request was not recorded.
+  """
+  pass
+
+def to_text(content):
+  """
+  Returns bytes as a string that survives JSON unchanged.
+  """
+  if isinstance(content, str):
+    content = content.encode('utf-8')
+  return (content or b'').decode('latin-1')
+
+def to_bytes(text):
+  return text.encode('latin-1')
+
+def get_body_hash(body):
+  if isinstance(body, str):
+    body = body.encode('utf-8')
+  return hashlib.sha1(body or b'').hexdigest()
+
+def get_recorded_settings():
+  """
+  Returns the settings a setup depends on, without credentials.
+  """
+  recorded = {}
+  for name in dir(settings):
+    if (not name.startswith(RECORDED_SETTINGS_PREFIXES) or
+        name in UNRECORDED_SETTINGS):
+      continue
+    value = getattr(settings, name)
+    try:
+      json.dumps(value)
+    except (TypeError, ValueError):
+      continue
+    recorded[name] = value
+
+  ad_manager_yaml = getattr(settings, 'GOOGLEADS_YAML', {}).get('ad_manager', {})
+  recorded['GOOGLEADS_YAML'] = {'ad_manager': {key: ad_manager_yaml[key]
+    for key in RECORDED_YAML_KEYS if key in ad_manager_yaml}}
+  return recorded
+
+class Cassette(object):
+  """
+  The HTTP interactions and WSDL documents of a run.
+  """
+
+  def __init__(self, path, mode, latency_scale=None):
+    """
+    Args:
+      path (str): the cassette file
+      mode (str): RECORD or REPLAY
+      latency_scale (float): in replay mode, how much of each response's
+        recorded latency to wait for; None or 0 not to wait
+    """
+    if mode not in (RECORD, REPLAY):
+      raise BadSettingException(
+        'The cassette mode must be "{0}" or "{1}".'.format(RECORD, REPLAY))
+
+    self.path = path
+    self.mode = mode
+    self.latency_scale = latency_scale
+    self.lock = Lock()
+    self.documents = {}
+    self.interactions = []
+    self.settings = {}
+    self.used = set()
+    self.by_body = defaultdict(deque)
+    self.by_url = defaultdict(deque)
+
+    if mode == REPLAY:
+      self.load()
+
+  def load(self):
+    """
+    Reads the cassette file and indexes its interactions for replay.
+    """
+    with gzip.open(self.path, 'rt', encoding='utf-8') as cassette_file:
+      data = json.load(cassette_file)
+    if data.get('version') != CASSETTE_VERSION:
+      raise CassetteException(
+        'Unsupported cassette version in {0}.'.format(self.path))
+
+    self.documents = data['documents']
+    self.interactions = data['interactions']
+    self.settings = data['settings']
+    for index, interaction in enumerate(self.interactions):
+      self.by_body[(interaction['method'], interaction['url'],
+        interaction['body_hash'])].append(index)
+      self.by_url[(interaction['method'], interaction['url'])].append(index)
+
+  def save(self):
+    """
+    Writes the recording to the cassette file.
+    """
+    with self.lock:
+      data = {
+        'version': CASSETTE_VERSION,
+        'settings': get_recorded_settings(),
+        'documents': self.documents,
+        'interactions': self.interactions,
+      }
+      temp_path = '{0}.{1}.tmp'.format(self.path, os.getpid())
+      with gzip.open(temp_path, 'wt', encoding='utf-8') as cassette_file:
+        json.dump(data, cassette_file)
+      os.replace(temp_path, self.path)
+    logger.info('Recorded %d API requests to %s.', len(self.interactions),
+      self.path)
+
+  def record(self, request, response, seconds):
+    """
+    Keeps a request and its response.
+    """
+    headers = {name: value for name, value in response.headers.items()
+      if name.lower() not in WIRE_HEADERS}
+    with self.lock:
+      self.interactions.append({
+        'method': request.method,
+        'url': request.url,
+        'body_hash': get_body_hash(request.body),
+        'status': response.status_code,
+        'reason': response.reason,
+        'headers': headers,
+        'content': to_text(response.content),
+        'seconds': seconds,
+      })
+
+  def play(self, request):
+    """
+    Returns the recorded response to a request with the same body, or else
+    the next unused one recorded for the same URL.
+    """
+    keys = [(self.by_body, (request.method, request.url,
+      get_body_hash(request.body))), (self.by_url, (request.method,
+      request.url))]
+    with self.lock:
+      for index_by_key, key in keys:
+        indexes = index_by_key.get(key, ())
+        while indexes and indexes[0] in self.used:
+          indexes.popleft()
+        if indexes:
+          index = indexes.popleft()
+          self.used.add(index)
+          break
+      else:
+        raise CassetteException('No recorded response for {0} {1}.'.format(
+          request.method, request.url))
+
+    interaction = self.interactions[index]
+    if self.latency_scale:
+      time.sleep(interaction['seconds'] * self.latency_scale)
+
+    response = requests.Response()
+    response.status_code = interaction['status']
+    response.reason = interaction['reason']
+    response.headers = CaseInsensitiveDict(interaction['headers'])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = to_bytes(interaction['content'])
+    response.raw = io.BytesIO(response._content)
+    response.url = request.url
+    response.request = request
+    return response
+
+class RecordingAdapter(object):
+  """
+  A requests transport adapter that records what another one sends and
+  receives.
+  """
+
+  def __init__(self, adapter, cassette):
+    self.adapter = adapter
+    self.cassette = cassette
+
+  def send(self, request, **kwargs):
+    start = time.time()
+    response = self.adapter.send(request, **kwargs)
+    # Read the body so the latency includes it.
+    response.content
+    self.cassette.record(request, response, time.time() - start)
+    return response
+
+  def close(self):
+    self.adapter.close()
+
+class ReplayAdapter(object):
+  """
+  A requests transport adapter that answers from a cassette.
+  """
+
+  def __init__(self, cassette):
+    self.cassette = cassette
+
+  def send(self, request, **kwargs):
+    response = self.cassette.play(request)
+    response.connection = self
+    return response
+
+  def close(self):
+    pass
+
+class CassetteDocumentCache(zeep.cache.Base):
+  """
+  A zeep cache that records the WSDL documents loaded, or serves them from
+  the cassette.
+  """
+
+  def __init__(self, cassette):
+    self.cassette = cassette
+
+  def add(self, url, content):
+    if self.cassette.mode == RECORD:
+      with self.cassette.lock:
+        self.cassette.documents[url] = to_text(content)
+
+  def get(self, url):
+    if self.cassette.mode == RECORD:
+      # Load every document, so it is recorded.
+      return None
+    if url not in self.cassette.documents:
+      raise CassetteException('No recorded document for {0}.'.format(url))
+    return to_bytes(self.cassette.documents[url])
+
+class ReplayOAuth2Client(object):
+  """
+  Stands in for the OAuth2 client in replay mode, where nothing is sent.
+  """
+
+  def CreateHttpHeader(self):
+    return {'authorization': 'Bearer replay'}
+
+  def Refresh(self):
+    pass
+
+def use_cassette(session, cassette):
+  """
+  Sends a session's requests through the cassette.
+  """
+  for prefix, adapter in list(session.adapters.items()):
+    if cassette.mode == RECORD:
+      session.mount(prefix, RecordingAdapter(adapter, cassette))
+    else:
+      session.mount(prefix, ReplayAdapter(cassette))
+
+_cassette = None
+_cassette_lock = Lock()
+
+def get_cassette():
+  """
+  Returns the cassette for settings.DFP_CASSETTE_FILE, or None if requests
+  are neither recorded nor replayed. A recording is saved when the process
+  exits.
+  """
+  global _cassette
+  path = getattr(settings, 'DFP_CASSETTE_FILE', None)
+  if not path:
+    return None
+
+  with _cassette_lock:
+    if _cassette is None or _cassette.path != path:
+      _cassette = Cassette(path,
+        getattr(settings, 'DFP_CASSETTE_MODE', None) or RECORD,
+        getattr(settings, 'DFP_CASSETTE_LATENCY_SCALE', None))
+      if _cassette.mode == RECORD:
+        atexit.register(_cassette.save)
+    return _cassette
@@ -1,9 +1,88 @@
-from googleads import ad_manager
-import yaml
+import importlib
 
 import settings
+from dfp.call_history import TimedClient, get_recording
+from dfp.token_cache import get_cached_oauth2_client
+from dfp.transport import PooledClient, get_session
+
+
+class LazyModule(object):
+    """
+    A module that is only imported when one of its attributes is first used.
+
+    googleads pulls in zeep, lxml, requests and the OAuth libraries, so
+    commands that never reach the API (validating settings, previewing the
+    price ladder) should not pay for importing it.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# Use these rather than importing googleads.ad_manager or googleads.errors
+# directly.
+ad_manager = LazyModule('googleads.ad_manager')
+errors = LazyModule('googleads.errors')
 
 
 def get_client():
-    # Build the Yaml file from scratch so we can move the settings into the application level
-    return ad_manager.AdManagerClient.LoadFromString(yaml.dump(settings.GOOGLEADS_YAML))
+    import yaml
+
+    googleads_yaml = get_googleads_yaml()
+
+    cassette = None
+    if getattr(settings, 'DFP_CASSETTE_FILE', None):
+        from dfp.cassette import REPLAY, ReplayOAuth2Client, get_cassette
+        cassette = get_cassette()
+
+    if cassette is not None and cassette.mode == REPLAY:
+        # Nothing is sent, so there is no need for a token.
+        oauth2_client = ReplayOAuth2Client()
+    else:
+        # Reuse access tokens from earlier clients and runs if they are cached.
+        from googleads.oauth2 import GetAPIScope
+        oauth2_client = get_cached_oauth2_client(googleads_yaml, GetAPIScope('ad_manager'))
+
+    if oauth2_client is not None:
+        ad_manager_yaml = googleads_yaml['ad_manager']
+        client = ad_manager.AdManagerClient(
+            oauth2_client,
+            ad_manager_yaml['application_name'],
+            network_code=ad_manager_yaml.get('network_code'),
+            enable_compression=ad_manager_yaml['enable_compression'])
+    else:
+        # Build the Yaml file from scratch so we can move the settings into the application level
+        client = ad_manager.AdManagerClient.LoadFromString(yaml.dump(googleads_yaml))
+
+    if cassette is not None:
+        from dfp.cassette import CassetteDocumentCache
+        client.cache = CassetteDocumentCache(cassette)
+
+    # Reuse connections across clients rather than opening one per service.
+    client = PooledClient(client, get_session())
+
+    # Time the calls while a setup is being recorded, for later estimates.
+    history = get_recording()
+    if history is not None:
+        return TimedClient(client, history)
+    return client
+
+
+def get_googleads_yaml():
+    """
+    Returns settings.GOOGLEADS_YAML, asking for gzip-compressed responses
+    unless it or settings.DFP_ENABLE_COMPRESSION says otherwise.
+    """
+    googleads_yaml = dict(settings.GOOGLEADS_YAML)
+    ad_manager_yaml = dict(googleads_yaml.get('ad_manager') or {})
+    ad_manager_yaml.setdefault(
+        'enable_compression',
+        getattr(settings, 'DFP_ENABLE_COMPRESSION', True) is not False)
+    googleads_yaml['ad_manager'] = ad_manager_yaml
+    return googleads_yaml
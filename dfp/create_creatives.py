@@ -1,7 +1,13 @@
+import hashlib
 import logging
 import os, sys
+from collections import defaultdict
 
-from dfp.client import get_client
+from dfp.batch import build_in_query, submit_in_batches
+from dfp.client import ad_manager, get_client
+from dfp.pagination import iter_results
+from dfp.snippets import get_snippet_template
+from dfp.specs import CreativeSpec, to_soap
 
 logger = logging.getLogger(__name__)
 
@@ -11,21 +17,198 @@ def create_creatives(creatives):
     Creates creatives in DFP.
 
     Args:
-        creatives (arr): an array of objects, each a creative configuration
+        creatives (arr): an array of objects, each a CreativeSpec or a creative
+          configuration
     Returns:
         an array: an array of created creative IDs
     """
+    return [creative['id'] for creative in submit_creatives(creatives)]
+
+
+def submit_creatives(creatives):
+    """
+    Creates creatives in DFP and returns them as DFP created them.
+
+    Args:
+        creatives (arr): an array of objects, each a CreativeSpec or a creative
+          configuration
+    Returns:
+        an array: an array of created creatives with their ID, advertiser ID
+          and name
+    """
     dfp_client = get_client()
     creative_service = dfp_client.GetService('CreativeService',
                                              version='v201908')
-    creatives = creative_service.createCreatives(creatives)
+    creatives = submit_in_batches(creative_service.createCreatives,
+        creatives, 'Creative',
+        find_existing=find_creatives, get_key=get_creative_key)
 
-    # Return IDs of created line items.
-    created_creative_ids = []
     for creative in creatives:
-        created_creative_ids.append(creative['id'])
         logger.info(u'Created creative with name "{name}".'.format(name=creative['name']))
-    return created_creative_ids
+    return creatives
+
+
+def get_creative_key(creative):
+    """
+    Returns what identifies a creative: its advertiser and name.
+    """
+    return creative['advertiserId'], creative['name']
+
+
+def find_creatives(creatives):
+    """
+    Finds which of the given creative configs exist in DFP, e.g. after a
+    create call timed out, by advertiser and name.
+
+    Args:
+      creatives (arr): an array of creative configs
+    Returns:
+      an array of creatives with their ID, advertiser ID and name
+    """
+    names_by_advertiser_id = defaultdict(list)
+    for creative in creatives:
+        names_by_advertiser_id[creative['advertiserId']].append(
+            creative['name'])
+
+    dfp_client = get_client()
+    creative_service = dfp_client.GetService('CreativeService',
+                                             version='v201908')
+
+    existing_creatives = []
+    for advertiser_id, names in names_by_advertiser_id.items():
+        query, values = build_in_query('name', names)
+        statement = ad_manager.FilterStatement(
+            'WHERE advertiserId = :advertiserId AND ' + query,
+            [{
+                'key': 'advertiserId',
+                'value': {'xsi_type': 'NumberValue', 'value': advertiser_id}
+            }] + values)
+        existing_creatives.extend(iter_results(
+            creative_service.getCreativesByStatement, statement,
+            fields=['id', 'advertiserId', 'name']))
+    return existing_creatives
+
+
+def is_snippet_creative(creative):
+    """
+    Returns whether a creative (a config or one returned by DFP) is a
+    third-party snippet creative.
+    """
+    return 'snippet' in creative and creative['snippet'] is not None
+
+
+def get_creative_hash(creative):
+    """
+    Returns a hash of what a snippet creative renders: its snippet, size and
+    SafeFrame flag. The name is left out, so a creative made for another bidder
+    or order matches when it serves the same thing.
+
+    Args:
+      creative (object): a snippet creative config or DFP creative
+    Returns:
+      a string
+    """
+    size = creative['size']
+    content = u'\n'.join([
+        creative['snippet'],
+        u'{0}x{1}'.format(size['width'], size['height']),
+        u'{0}'.format(bool(creative['isSafeFrameCompatible'])),
+    ])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def find_reusable_creative_ids(creatives):
+    """
+    Finds existing DFP creatives with the same content as the given snippet
+    creative configs. Each advertiser and size is looked up with a single
+    paged query.
+
+    Args:
+      creatives (arr): an array of CreativeSpecs or creative configs
+    Returns:
+      a dict: creative hashes mapped to arrays of existing creative IDs
+    """
+    lookups = set()
+    for creative in creatives:
+        creative = to_soap(creative)
+        if is_snippet_creative(creative):
+            lookups.add((creative['advertiserId'], int(creative['size']['width']),
+                         int(creative['size']['height'])))
+    if not lookups:
+        return {}
+
+    dfp_client = get_client()
+    creative_service = dfp_client.GetService('CreativeService',
+                                             version='v201908')
+
+    reusable_ids = defaultdict(list)
+    for advertiser_id, width, height in lookups:
+        statement = ad_manager.FilterStatement(
+            'WHERE advertiserId = :advertiserId AND width = :width '
+            'AND height = :height ORDER BY id ASC',
+            [
+                {
+                    'key': 'advertiserId',
+                    'value': {'xsi_type': 'NumberValue', 'value': advertiser_id}
+                },
+                {
+                    'key': 'width',
+                    'value': {'xsi_type': 'NumberValue', 'value': width}
+                },
+                {
+                    'key': 'height',
+                    'value': {'xsi_type': 'NumberValue', 'value': height}
+                },
+            ])
+        for creative in iter_results(creative_service.getCreativesByStatement,
+                                     statement):
+            if is_snippet_creative(creative):
+                reusable_ids[get_creative_hash(creative)].append(creative['id'])
+    return reusable_ids
+
+
+def get_or_create_creatives(creatives):
+    """
+    Returns creative IDs for the given configs, reusing the advertiser's
+    existing snippet creatives with identical content and creating only the
+    shortfall. No existing creative is used twice, so duplicates stay distinct.
+    IDs are in config order; configs DFP rejected are left out.
+
+    Args:
+        creatives (arr): an array of objects, each a CreativeSpec or a creative
+          configuration
+    Returns:
+        an array: an array of creative IDs, one per config
+    """
+    reusable_ids = find_reusable_creative_ids(creatives)
+
+    # One slot per config, so the IDs come back in config order. Specs stay
+    # specs until their batch is sent.
+    creative_ids = [None] * len(creatives)
+    creatives_to_create = []
+    indexes_by_key = {}
+    for index, creative in enumerate(creatives):
+        config = to_soap(creative)
+        if is_snippet_creative(config):
+            matching_ids = reusable_ids.get(get_creative_hash(config))
+            if matching_ids:
+                creative_ids[index] = matching_ids.pop(0)
+                continue
+        creatives_to_create.append(creative)
+        indexes_by_key[get_creative_key(config)] = index
+
+    num_reused = len(creatives) - len(creatives_to_create)
+    if num_reused:
+        logger.info(u'Reusing {0} existing creative(s).'.format(num_reused))
+    if creatives_to_create:
+        created = submit_creatives(creatives_to_create)
+        for creative in created:
+            creative_ids[indexes_by_key[get_creative_key(creative)]] = \
+                creative['id']
+
+    # Configs DFP rejected have no ID.
+    return [creative_id for creative_id in creative_ids
+            if creative_id is not None]
 
 
 def create_creative_config(name, advertiser_id, prebid_creative_snippet):
@@ -37,27 +220,20 @@ def create_creative_config(name, advertiser_id, prebid_creative_snippet):
       advertiser_id (int): the ID of the advertiser in DFP
       prebid_creative_snippet (str): file path for creative
     Returns:
-      an object: the line item config
-    """
-
-    snippet_file_path = os.path.join(os.path.dirname(__file__), '../', prebid_creative_snippet)
-    with open(snippet_file_path, 'r') as snippet_file:
-        snippet = snippet_file.read()
-
-    # https://developers.google.com/doubleclick-publishers/docs/reference/v201908/CreativeService.Creative
-    config = {
-        'xsi_type': 'ThirdPartyCreative',
-        'name': name,
-        'advertiserId': advertiser_id,
-        'size': {
-            'width': '1',
-            'height': '1'
-        },
-        'snippet': snippet,
-        'isSafeFrameCompatible': True,
-    }
-
-    return config
+      a CreativeSpec
+    """
+
+    # The snippet file is read once per run, not once per creative.
+    snippet = get_snippet_template(prebid_creative_snippet).render()
+
+    return CreativeSpec(
+        name=name,
+        advertiser_id=advertiser_id,
+        snippet=snippet,
+        width='1',
+        height='1',
+        is_safe_frame_compatible=True,
+    )
 
 
 def build_creative_name(bidder_code, order_name, creative_num):
@@ -2,9 +2,9 @@
 
 import logging
 
-from googleads import ad_manager
-
-from dfp.client import get_client
+from dfp.batch import build_in_query, submit_in_batches
+from dfp.client import ad_manager, get_client
+from dfp.pagination import iter_results
 
 
 logger = logging.getLogger(__name__)
@@ -85,3 +85,51 @@ def create_targeting_value(name, key_id):
       display_name=created_value['displayName']))
 
   return created_value['id']
+
+def create_targeting_values(names, key_id):
+  """
+  Creates custom targeting values for a specific key in DFP, in batches.
+
+  Args:
+    names (arr): the names of the values
+    key_id (int): the ID of the associated DFP key
+  Returns:
+    a dict: the IDs of the created values by name, without any GAM rejected
+  """
+
+  dfp_client = get_client()
+  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
+    version='v201908')
+
+  values_config = [
+    {
+      'customTargetingKeyId': key_id,
+      'displayName': str(name),
+      'name': str(name),
+      'matchType': 'EXACT'
+    }
+    for name in names
+  ]
+  def find_values(values_config):
+    query, values = build_in_query('name',
+      [value['name'] for value in values_config])
+    statement = ad_manager.FilterStatement(
+      "WHERE customTargetingKeyId = :keyId AND status = 'ACTIVE' AND " +
+        query,
+      [{
+        'key': 'keyId',
+        'value': {'xsi_type': 'NumberValue', 'value': key_id}
+      }] + values)
+    return iter_results(
+      custom_targeting_service.getCustomTargetingValuesByStatement, statement,
+      fields=['id', 'name'])
+
+  # Names are unique within a key.
+  values = submit_in_batches(
+    custom_targeting_service.createCustomTargetingValues, values_config,
+    'CustomTargetingValue', find_existing=find_values,
+    get_key=lambda value: value['name'])
+
+  logger.info(u'Created {0} custom targeting values.'.format(len(values)))
+
+  return {value['name']: value['id'] for value in values}
@@ -1,5 +1,7 @@
-from googleads import ad_manager
+from collections import defaultdict
 
+import dfp.get_line_items
+from dfp.batch import build_in_query, submit_in_batches
 from dfp.client import get_client
 
 
@@ -8,13 +10,19 @@ def create_line_items(line_items):
     Creates line items in DFP.
 
     Args:
-    line_items (arr): an array of objects, each a line item configuration
+    line_items (arr): an array of objects, each a LineItemSpec or a line item
+      configuration
     Returns:
-    an array: an array of created line item IDs
+    an array: an array of created line item IDs, without those GAM rejected
     """
     dfp_client = get_client()
     line_item_service = dfp_client.GetService('LineItemService', version='v201908')
-    line_items = line_item_service.createLineItems(line_items)
+    # Sent in adaptively sized batches. Invalid line items (e.g. duplicate
+    # names) are split out and recorded in the rejects file, rather than
+    # failing the others.
+    line_items = submit_in_batches(line_item_service.createLineItems,
+        line_items, 'LineItem',
+        find_existing=find_line_items, get_key=get_line_item_key)
 
     # Return IDs of created line items.
     created_line_item_ids = []
@@ -23,6 +31,155 @@ def create_line_items(line_items):
     return created_line_item_ids
 
 
+def get_line_item_key(line_item):
+    """
+    Returns what identifies a line item: its order and name.
+    """
+    return line_item['orderId'], line_item['name']
+
+
+def find_line_items(line_items):
+    """
+    Finds which of the given line item configs exist in DFP, e.g. after a
+    create call timed out, by order and name.
+
+    Args:
+      line_items (arr): an array of line item configs
+    Returns:
+      an array of line items with their ID, order ID and name
+    """
+    names_by_order_id = defaultdict(list)
+    for line_item in line_items:
+        names_by_order_id[line_item['orderId']].append(line_item['name'])
+
+    existing_line_items = []
+    for order_id, names in names_by_order_id.items():
+        query, values = build_in_query('name', names)
+        existing_line_items.extend(dfp.get_line_items.iter_line_items(
+            order_id=order_id, query=query, values=values,
+            fields=['id', 'orderId', 'name']))
+    return existing_line_items
+
+
+def create_custom_criteria(key_id, value_id):
+    """
+    Creates a CustomCriteria targeting a single value of a key.
+    """
+    # https://github.com/googleads/googleads-python-lib/blob/master/examples/dfp/v201908/line_item_service/target_custom_criteria.py
+    return {
+        'xsi_type': 'CustomCriteria',
+        'keyId': key_id,
+        'valueIds': [value_id],
+        'operator': 'IS'
+    }
+
+
+class LineItemTemplate(object):
+    """
+    The parts of a line item config that every price bucket shares, built once.
+
+    Configs made from one template share the nested objects that do not vary by
+    price (e.g. the inventory targeting and creative placeholders), so they
+    must not be modified in place.
+    """
+
+    def __init__(self, order_id, placement_ids, ad_unit_ids, sizes, hb_criteria,
+                 currency_code, creative_template_id):
+        """
+        Args:
+          order_id (int): the ID of the order in DFP
+          placement_ids (arr): an array of DFP placement IDs to target
+          ad_unit_ids (arr): an array of DFP ad unit IDs to target
+          sizes (arr): an array of objects, each containing 'width' and 'height'
+            keys, to set the creative sizes this line item will serve
+          hb_criteria (dict): An dict of key: value pairs for criteria shared by
+            every line item
+          currency_code (str): the currency code (e.g. 'USD' or 'EUR')
+          creative_template_id (int): if not None then we are doing native ads
+        """
+        self.currency_code = currency_code
+
+        # Native ad unit
+        if creative_template_id is not None:
+            creative_placeholders = {
+                'size': {
+                    'width': '1',
+                    'height': '1'
+                },
+                'creativeTemplateId': creative_template_id,
+                'creativeSizeType': 'NATIVE'
+            }
+        else:
+
+            # Set up sizes.
+            creative_placeholders = []
+
+            for size in sizes:
+                creative_placeholders.append({
+                    'size': size
+                })
+
+        # Create key/value targeting for Prebid.
+        self.criteria = [create_custom_criteria(criteria_key, criteria_value)
+                         for criteria_key, criteria_value in hb_criteria.items()]
+
+        # https://developers.google.com/doubleclick-publishers/docs/reference/v201908/LineItemService.Targeting
+        self.inventory_targeting = {
+            'targetedPlacementIds': placement_ids
+        }
+        if ad_unit_ids is not None:
+            self.inventory_targeting['targetedAdUnits'] = [{'adUnitId': id} for id in ad_unit_ids]
+
+        # https://developers.google.com/doubleclick-publishers/docs/reference/v201908/LineItemService.LineItem
+        self.base_config = {
+            'orderId': order_id,
+            'startDateTimeType': 'IMMEDIATELY',
+            'unlimitedEndDateTime': True,
+            'lineItemType': 'PRICE_PRIORITY',
+            'costType': 'CPM',
+            'creativeRotationType': 'EVEN',
+            'primaryGoal': {
+                'goalType': 'NONE'
+            },
+            'creativePlaceholders': creative_placeholders,
+        }
+
+    def create_config(self, name, cpm_micro_amount, price_criteria=None):
+        """
+        Creates the line item config for one price bucket.
+
+        Args:
+          name (str): the name of the line item
+          cpm_micro_amount (int): the currency value (in micro amounts) of the
+            line item
+          price_criteria (dict): key: value pairs for criteria specific to this
+            line item, e.g. its hb_pb value
+        Returns:
+          an object: the line item config
+        """
+        children = self.criteria
+        if price_criteria:
+            children = children + [
+                create_custom_criteria(criteria_key, criteria_value)
+                for criteria_key, criteria_value in price_criteria.items()]
+
+        line_item_config = dict(self.base_config)
+        line_item_config['name'] = name
+        line_item_config['targeting'] = {
+            'inventoryTargeting': self.inventory_targeting,
+            'customTargeting': {
+                'xsi_type': 'CustomCriteriaSet',
+                'logicalOperator': 'AND',
+                'children': children
+            },
+        }
+        line_item_config['costPerUnit'] = {
+            'currencyCode': self.currency_code,
+            'microAmount': cpm_micro_amount
+        }
+        return line_item_config
+
+
 def create_line_item_config(name, order_id, placement_ids, ad_unit_ids, cpm_micro_amount,
                             sizes, hb_criteria,
                             currency_code, creative_template_id):
@@ -44,72 +201,6 @@ def create_line_item_config(name, order_id, placement_ids, ad_unit_ids, cpm_micr
     Returns:
       an object: the line item config
     """
-
-    # Native ad unit
-    if creative_template_id is not None:
-        creative_placeholders = {
-            'size': {
-                'width': '1',
-                'height': '1'
-            },
-            'creativeTemplateId': creative_template_id,
-            'creativeSizeType': 'NATIVE'
-        }
-    else:
-
-        # Set up sizes.
-        creative_placeholders = []
-
-        for size in sizes:
-            creative_placeholders.append({
-                'size': size
-            })
-
-    # Setup bidder criteria
-    bidder_criteria = []
-
-    # Create key/value targeting for Prebid.
-    # https://github.com/googleads/googleads-python-lib/blob/master/examples/dfp/v201908/line_item_service/target_custom_criteria.py
-    # create custom criterias
-    for criteria_key, criteria_value in hb_criteria.items():
-        bidder_criteria.append({
-            'xsi_type': 'CustomCriteria',
-            'keyId': criteria_key,
-            'valueIds': [criteria_value],
-            'operator': 'IS'
-        })
-
-    # https://developers.google.com/doubleclick-publishers/docs/reference/v201908/LineItemService.LineItem
-    line_item_config = {
-        'name': name,
-        'orderId': order_id,
-        # https://developers.google.com/doubleclick-publishers/docs/reference/v201908/LineItemService.Targeting
-        'targeting': {
-            'inventoryTargeting': {
-                'targetedPlacementIds': placement_ids
-            },
-            'customTargeting': {
-                'xsi_type': 'CustomCriteriaSet',
-                'logicalOperator': 'AND',
-                'children': bidder_criteria
-            },
-        },
-        'startDateTimeType': 'IMMEDIATELY',
-        'unlimitedEndDateTime': True,
-        'lineItemType': 'PRICE_PRIORITY',
-        'costType': 'CPM',
-        'costPerUnit': {
-            'currencyCode': currency_code,
-            'microAmount': cpm_micro_amount
-        },
-        'creativeRotationType': 'EVEN',
-        'primaryGoal': {
-            'goalType': 'NONE'
-        },
-        'creativePlaceholders': creative_placeholders,
-    }
-
-    if ad_unit_ids is not None:
-        line_item_config['targeting']['inventoryTargeting']['targetedAdUnits'] = [{'adUnitId': id} for id in ad_unit_ids]
-
-    return line_item_config
+    template = LineItemTemplate(order_id, placement_ids, ad_unit_ids, sizes,
+                                hb_criteria, currency_code, creative_template_id)
+    return template.create_config(name, cpm_micro_amount)
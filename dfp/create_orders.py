@@ -2,8 +2,6 @@
 
 import logging
 
-from googleads import ad_manager
-
 import settings
 import dfp.get_orders
 from dfp.client import get_client
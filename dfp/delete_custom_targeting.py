@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+import logging
+
+from dfp.client import ad_manager, get_client
+
+
+logger = logging.getLogger(__name__)
+
+# How many custom targeting values we delete with a single action.
+VALUES_PER_ACTION = 200
+
+def delete_targeting_values(key_id, value_ids):
+  """
+  Deletes custom targeting values of a key in DFP, with one action per
+  batch of values.
+
+  Args:
+    key_id (int): the ID of the DFP key the values belong to
+    value_ids (arr): an array of value IDs
+  Returns:
+    an integer: the number of values DFP deleted
+  """
+  dfp_client = get_client()
+  custom_targeting_service = dfp_client.GetService('CustomTargetingService',
+    version='v201908')
+
+  value_ids = list(value_ids)
+  num_changes = 0
+  for start in range(0, len(value_ids), VALUES_PER_ACTION):
+    ids = value_ids[start:start + VALUES_PER_ACTION]
+    query = ('WHERE customTargetingKeyId = :keyId AND id IN ({0})'.format(
+      ', '.join(str(int(value_id)) for value_id in ids)))
+    values = [{
+      'key': 'keyId',
+      'value': {
+        'xsi_type': 'NumberValue',
+        'value': key_id
+      }
+    }]
+    statement = ad_manager.FilterStatement(query, values)
+    response = custom_targeting_service.performCustomTargetingValueAction(
+      {'xsi_type': 'DeleteCustomTargetingValues'}, statement.ToStatement())
+    if response and 'numChanges' in response:
+      num_changes += response['numChanges']
+
+  logger.info(u'Deleted {0} custom targeting values.'.format(num_changes))
+  return num_changes
@@ -2,10 +2,8 @@
 
 import logging
 
-from googleads import ad_manager
-
 import settings
-from dfp.client import get_client
+from dfp.client import ad_manager, get_client
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
@@ -43,14 +41,14 @@ def create_advertiser(name):
 
   return advertiser
 
-def get_advertiser_id_by_name(name):
+def get_advertisers_by_name(name):
   """
-  Returns a DFP company ID from company name.
+  Returns the DFP companies with a given name, without creating any.
 
   Args:
     name (str): the name of the DFP advertiser
   Returns:
-    an integer: the advertiser's DFP ID
+    an array: the matching companies, possibly empty
   """
   dfp_client = get_client()
   company_service = dfp_client.GetService('CompanyService', version='v201908')
@@ -68,23 +66,33 @@ def get_advertiser_id_by_name(name):
 
   response = company_service.getCompaniesByStatement(statement.ToStatement())
 
-  # A company is required.
-  no_company_found = False
   try:
-    no_company_found = True if len(response['results']) < 1 else False 
-  except (AttributeError, KeyError):
-    no_company_found = True
+    return list(response['results'] or [])
+  except (AttributeError, KeyError, TypeError):
+    return []
+
+def get_advertiser_id_by_name(name):
+  """
+  Returns a DFP company ID from company name.
+
+  Args:
+    name (str): the name of the DFP advertiser
+  Returns:
+    an integer: the advertiser's DFP ID
+  """
+  advertisers = get_advertisers_by_name(name)
 
-  if no_company_found:
+  # A company is required.
+  if len(advertisers) < 1:
     if getattr(settings, 'DFP_CREATE_ADVERTISER_IF_DOES_NOT_EXIST', False):
       advertiser = create_advertiser(name)
     else:
       raise DFPObjectNotFound('No advertiser found with name {0}'.format(name))
-  elif len(response['results']) > 1:
+  elif len(advertisers) > 1:
     raise BadSettingException(
       'Multiple advertisers found with name {0}'.format(name))
   else:
-    advertiser = response['results'][0]
+    advertiser = advertisers[0]
 
   logger.info(u'Using existing advertiser with name "{name}" and '
     'type "{type}".'.format(name=advertiser['name'], type=advertiser['type']))
@@ -2,9 +2,8 @@
 
 import logging
 
-from googleads import ad_manager
-
-from dfp.client import get_client
+from dfp.client import ad_manager, get_client
+from dfp.pagination import iter_results
 
 
 logger = logging.getLogger(__name__)
@@ -82,19 +81,15 @@ def get_targeting_by_key_name(name):
     query = "WHERE status = 'ACTIVE' AND customTargetingKeyId IN (%s)" % str(key['id'])
     statement = ad_manager.FilterStatement(query)
 
-    response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-    while 'results' in response and len(response['results']) > 0:
-      for custom_val in response['results']:
-        key_values.append({
-          'id': custom_val['id'],
-          'name': custom_val['name'],
-          'displayName': custom_val['displayName'],
-          'customTargetingKeyId': custom_val['customTargetingKeyId']
-        })
-      statement.offset += ad_manager.SUGGESTED_PAGE_LIMIT
-      response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
+    for custom_val in iter_results(
+        custom_targeting_service.getCustomTargetingValuesByStatement,
+        statement):
+      key_values.append({
+        'id': custom_val['id'],
+        'name': custom_val['name'],
+        'displayName': custom_val['displayName'],
+        'customTargetingKeyId': custom_val['customTargetingKeyId']
+      })
 
   if key_values is None:
     logger.info(u'Key "{key_name}"" does not exist in DFP.'. format(
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+import logging
+
+from dfp.client import ad_manager, get_client
+from dfp.pagination import iter_results
+
+
+logger = logging.getLogger(__name__)
+
+# How many line item IDs we put in a single "IN (...)" filter. This keeps
+# each statement reasonably small.
+LINE_ITEM_IDS_PER_QUERY = 200
+
+def iter_licas(line_item_ids, fields=None):
+  """
+  Lazily yields the line item <> creative associations of line items.
+
+  Args:
+    line_item_ids (arr): an array of line item IDs
+    fields (arr): if set, yield dicts with only these association fields
+  Returns:
+    a generator of DFP line item creative associations
+  """
+  dfp_client = get_client()
+  lica_service = dfp_client.GetService(
+    'LineItemCreativeAssociationService', version='v201908')
+
+  line_item_ids = list(line_item_ids)
+  for start in range(0, len(line_item_ids), LINE_ITEM_IDS_PER_QUERY):
+    ids = line_item_ids[start:start + LINE_ITEM_IDS_PER_QUERY]
+    query = 'WHERE lineItemId IN ({0})'.format(
+      ', '.join(str(int(line_item_id)) for line_item_id in ids))
+    statement = ad_manager.FilterStatement(query)
+    for lica in iter_results(
+        lica_service.getLineItemCreativeAssociationsByStatement, statement,
+        fields=fields):
+      yield lica
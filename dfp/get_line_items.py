@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+import logging
+from collections import namedtuple
+
+from dfp.client import ad_manager, get_client
+from dfp.pagination import iter_results
+
+
+logger = logging.getLogger(__name__)
+
+def iter_custom_criteria(criteria_set):
+  """
+  Yields every CustomCriteria node in a (possibly nested) custom targeting
+  criteria set.
+
+  Args:
+    criteria_set (object): a line item's `targeting.customTargeting`
+  Returns:
+    a generator of custom criteria objects
+  """
+  if not criteria_set:
+    return
+  if 'children' in criteria_set and criteria_set['children'] is not None:
+    for child in criteria_set['children']:
+      for criteria in iter_custom_criteria(child):
+        yield criteria
+  elif 'keyId' in criteria_set:
+    yield criteria_set
+
+def get_criteria_value_ids(line_item):
+  """
+  Returns a dict of targeting key ID to the array of value IDs a line item
+  targets.
+
+  Args:
+    line_item (object): a line item, or a projection including `targeting`
+  Returns:
+    a dict
+  """
+  value_ids = {}
+  custom_targeting = line_item['targeting']['customTargeting']
+  for criteria in iter_custom_criteria(custom_targeting):
+    value_ids[criteria['keyId']] = list(criteria['valueIds'] or [])
+  return value_ids
+
+def iter_line_items(order_id=None, query='', values=None, fields=None):
+  """
+  Lazily yields line items from DFP, optionally only those in one order.
+
+  Args:
+    order_id (int): if set, only yield line items in this order
+    query (str): an additional PQL condition, e.g. "status = 'DRAFT'"
+    values (arr): bind variables for the query
+    fields (arr): if set, yield dicts with only these line item fields
+  Returns:
+    a generator of DFP line items
+  """
+  dfp_client = get_client()
+  line_item_service = dfp_client.GetService('LineItemService',
+    version='v201908')
+
+  conditions = []
+  values = list(values or [])
+  if order_id is not None:
+    conditions.append('orderId = :orderId')
+    values.append({
+      'key': 'orderId',
+      'value': {
+        'xsi_type': 'NumberValue',
+        'value': order_id
+      }
+    })
+  if query:
+    conditions.append('({0})'.format(query))
+
+  where_clause = ''
+  if conditions:
+    where_clause = 'WHERE ' + ' AND '.join(conditions)
+
+  statement = ad_manager.FilterStatement(where_clause, values or None)
+  return iter_results(line_item_service.getLineItemsByStatement, statement,
+    fields=fields)
+
+class LineItemIndex(namedtuple('LineItemIndex', ['names', 'value_ids'])):
+  """
+  The names of an order's line items, and the IDs of the values of one
+  targeting key (e.g. hb_pb) they target.
+  """
+  __slots__ = ()
+
+  def contains(self, name, value_id):
+    """
+    Returns whether the order has a line item with this name, or one that
+    targets this value.
+    """
+    return name in self.names or value_id in self.value_ids
+
+def get_line_item_index(order_id, key_id, criteria=None):
+  """
+  Reads an order's line items in one streamed scan, keeping only their names
+  and the values of `key_id` they target.
+
+  Args:
+    order_id (int): the ID of the order
+    key_id (int): the ID of the targeting key whose values to index
+    criteria (dict): if set, only index the `key_id` values of line items
+      that also target exactly these values, as a dict of key ID to value ID
+      (e.g. the hb_bidder value of one bidder)
+  Returns:
+    a LineItemIndex
+  """
+  criteria = criteria or {}
+  names = set()
+  value_ids = set()
+  for line_item in iter_line_items(order_id=order_id,
+      fields=['name', 'targeting']):
+    names.add(line_item['name'])
+    criteria_value_ids = get_criteria_value_ids(line_item)
+    if all(criteria_value_ids.get(criteria_key_id) == [criteria_value_id]
+        for criteria_key_id, criteria_value_id in criteria.items()):
+      value_ids.update(criteria_value_ids.get(key_id, ()))
+
+  logger.info(u'Found {0} existing line items in the order.'.format(
+    len(names)))
+  return LineItemIndex(frozenset(names), frozenset(value_ids))
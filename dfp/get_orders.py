@@ -3,9 +3,8 @@
 
 import logging
 
-from googleads import ad_manager
-
-from dfp.client import get_client
+from dfp.client import ad_manager, get_client
+from dfp.pagination import iter_results
 
 
 logger = logging.getLogger(__name__)
@@ -49,6 +48,26 @@ def get_order_by_name(order_name):
     logger.info(u'Found an order with name "{name}".'.format(name=order['name']))
     return order
 
+def iter_orders(query='', values=None, fields=None):
+  """
+  Lazily yields every order in DFP matching a filter.
+
+  Args:
+    query (str): a PQL condition, e.g. "status = 'DRAFT'", or an empty
+      string for all orders
+    values (arr): bind variables for the query
+    fields (arr): if set, yield dicts with only these order fields
+  Returns:
+    a generator of DFP orders
+  """
+  dfp_client = get_client()
+  order_service = dfp_client.GetService('OrderService', version='v201908')
+
+  where_clause = 'WHERE {0}'.format(query) if query else ''
+  statement = ad_manager.FilterStatement(where_clause, values)
+  return iter_results(order_service.getOrdersByStatement, statement,
+    fields=fields)
+
 def get_all_orders(print_orders=False):
   """
   Logs all orders in DFP.
@@ -57,28 +76,14 @@ def get_all_orders(print_orders=False):
       None
   """
 
-  dfp_client = get_client()
-
-  # Initialize appropriate service.
-  order_service = dfp_client.GetService('OrderService', version='v201908')
-
-  # Create a statement to select orders.
-  statement = ad_manager.FilterStatement()
   print('Getting all orders...')
 
-  # Retrieve a small amount of orders at a time, paging
-  # through until all orders have been retrieved.
-  while True:
-    response = order_service.getOrdersByStatement(statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      for order in response['results']:
-        msg = u'Found an order with name "{name}".'.format(name=order['name'])
-        if print_orders:
-          print(msg)
-      statement.offset += ad_manager.SUGGESTED_PAGE_LIMIT
-    else:
-      print('No additional orders found.')
-      break
+  # Stream through all orders, keeping only their names in memory.
+  for order in iter_orders(fields=['name']):
+    msg = u'Found an order with name "{name}".'.format(name=order['name'])
+    if print_orders:
+      print(msg)
+  print('No additional orders found.')
 
 def main():
   get_all_orders(print_orders=True)
@@ -2,10 +2,8 @@
 
 import logging
 
-from googleads import ad_manager
-
 import settings
-from dfp.client import get_client
+from dfp.client import ad_manager, get_client
 from dfp.exceptions import (
   BadSettingException,
   DFPObjectNotFound,
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import settings
+from dfp.exceptions import BadSettingException
+
+
+logger = logging.getLogger(__name__)
+
+# The largest LIMIT the API accepts for a single page of results.
+MAX_PAGE_SIZE = 500
+
+# googleads' ad_manager.SUGGESTED_PAGE_LIMIT, kept here so reading the page
+# size does not import googleads.
+DEFAULT_PAGE_SIZE = 500
+
+# How many pages we fetch concurrently unless settings say otherwise.
+DEFAULT_PAGE_WORKERS = 4
+
+def get_page_size(page_size=None):
+  """
+  Returns the number of results to request per page.
+
+  Args:
+    page_size (int): an explicit page size, or None to use
+      settings.DFP_PAGE_SIZE
+  Returns:
+    an integer
+  """
+  if page_size is None:
+    page_size = (getattr(settings, 'DFP_PAGE_SIZE', None) or
+      DEFAULT_PAGE_SIZE)
+
+  if page_size < 1 or page_size > MAX_PAGE_SIZE:
+    raise BadSettingException(
+      'The page size must be between 1 and {0}.'.format(MAX_PAGE_SIZE))
+
+  return page_size
+
+def get_page_workers(max_workers=None):
+  """
+  Returns the maximum number of pages to fetch concurrently.
+
+  Args:
+    max_workers (int): an explicit worker count, or None to use
+      settings.DFP_PAGE_WORKERS
+  Returns:
+    an integer
+  """
+  if max_workers is None:
+    max_workers = (getattr(settings, 'DFP_PAGE_WORKERS', None) or
+      DEFAULT_PAGE_WORKERS)
+
+  if max_workers < 1:
+    raise BadSettingException('The number of page workers must be at least 1.')
+
+  return max_workers
+
+def get_results(response):
+  """
+  Returns the results of a page, or an empty list if there are none.
+  """
+  if 'results' in response and response['results']:
+    return response['results']
+  return []
+
+def get_total_result_set_size(response):
+  """
+  Returns the total number of results the query matches, or None if the
+  response does not say.
+  """
+  if 'totalResultSetSize' in response:
+    return response['totalResultSetSize']
+  return None
+
+def project(result, fields):
+  """
+  Copies only the requested top-level fields of a result into a dict, so the
+  rest of the (possibly large) object can be garbage collected.
+
+  Args:
+    result (object): a result returned by DFP
+    fields (arr): an array of field names to keep
+  Returns:
+    a dict
+  """
+  return {field: result[field] for field in fields}
+
+def iter_results(fetch_page, statement, page_size=None, max_workers=None,
+    fields=None):
+  """
+  Yields every result of a *ByStatement query, in order.
+
+  The first page is fetched directly. If it reports `totalResultSetSize`, the
+  remaining offsets are known up front and are fetched on a bounded thread
+  pool while earlier pages are consumed. Otherwise, pages are fetched one
+  after another, each requested in the background while the previous one is
+  being consumed, until a page comes back short.
+
+  Args:
+    fetch_page (function): called with a statement dict and returning a page,
+      e.g. a service's `getOrdersByStatement` method
+    statement (FilterStatement or StatementBuilder): the query to page
+      through; its limit and offset are updated as we go
+    page_size (int): the number of results per page
+    max_workers (int): the maximum number of pages in flight
+    fields (arr): if set, yield dicts with only these fields rather than
+      full result objects
+  Returns:
+    a generator of results
+  """
+  if fields is not None:
+    for result in iter_results(fetch_page, statement, page_size=page_size,
+        max_workers=max_workers):
+      yield project(result, fields)
+    return
+
+  statement.limit = get_page_size(page_size)
+  max_workers = get_page_workers(max_workers)
+  limit = statement.limit
+
+  response = fetch_page(statement.ToStatement())
+  results = get_results(response)
+  total = get_total_result_set_size(response)
+
+  if total is not None:
+    offsets = range(statement.offset + limit, total, limit)
+  elif len(results) == limit:
+    offsets = None
+  else:
+    offsets = range(0)
+
+  # Nothing left to fetch, so skip the thread pool entirely.
+  if offsets is not None and len(offsets) == 0:
+    for result in results:
+      yield result
+    return
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    pending = deque()
+
+    def fetch_at(offset):
+      statement.offset = offset
+      pending.append(executor.submit(fetch_page, statement.ToStatement()))
+
+    try:
+      if offsets is not None:
+        offsets = iter(offsets)
+        for offset in islice(offsets, max_workers):
+          fetch_at(offset)
+        for result in results:
+          yield result
+        while pending:
+          results = get_results(pending.popleft().result())
+          offset = next(offsets, None)
+          if offset is not None:
+            fetch_at(offset)
+          for result in results:
+            yield result
+      else:
+        offset = statement.offset
+        while len(results) == limit:
+          offset += limit
+          fetch_at(offset)
+          for result in results:
+            yield result
+          results = get_results(pending.popleft().result())
+        for result in results:
+          yield result
+    finally:
+      # The caller may stop iterating early; don't fetch pages nobody wants.
+      for future in pending:
+        future.cancel()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import logging
+
+from dfp.client import ad_manager, get_client
+from dfp.pagination import iter_results
+
+
+logger = logging.getLogger(__name__)
+
+# PQL tables used for audits. See:
+# https://developers.google.com/ad-manager/api/pqlreference
+LINE_ITEM_TABLE = 'Line_Item'
+ORDER_TABLE = 'Order'
+CUSTOM_TARGETING_VALUE_TABLE = 'Custom_Targeting_Value'
+AD_UNIT_TABLE = 'Ad_Unit'
+
+def get_value_type(pql_value):
+  """
+  Returns the type name (e.g. 'TextValue') of a PQL value.
+  """
+  if isinstance(pql_value, dict):
+    return pql_value.get('xsi_type')
+  return pql_value.__class__.__name__
+
+def convert_value(pql_value):
+  """
+  Converts a PQL value into a plain Python value.
+
+  Args:
+    pql_value (object): a Value from a PQL result set row
+  Returns:
+    an int, float, bool, str, tuple (for set values), None, or the raw value
+      for types we do not convert (e.g. dates)
+  """
+  if pql_value is None:
+    return None
+
+  value_type = get_value_type(pql_value)
+  if value_type == 'SetValue':
+    return tuple(convert_value(value) for value in pql_value['values'])
+
+  value = pql_value['value'] if 'value' in pql_value else None
+  if value is None:
+    return None
+
+  if value_type == 'NumberValue':
+    value = str(value)
+    return float(value) if '.' in value else int(value)
+  elif value_type == 'BooleanValue':
+    if isinstance(value, bool):
+      return value
+    return str(value).lower() == 'true'
+  elif value_type == 'TextValue':
+    return str(value)
+  return value
+
+def row_to_tuple(row):
+  """
+  Converts a PQL result set row into a tuple of plain values.
+  """
+  return tuple(convert_value(value) for value in row['values'])
+
+def iter_rows(table, columns, query='', values=None, page_size=None):
+  """
+  Lazily yields rows from a PQL table via PublisherQueryLanguageService.
+
+  Only the requested columns are transferred, which is much lighter than
+  fetching whole objects (e.g. line items with their targeting) through the
+  *ByStatement methods.
+
+  Args:
+    table (str): the PQL table, e.g. LINE_ITEM_TABLE
+    columns (arr): an array of column names, e.g. ['Id', 'Name', 'Status']
+    query (str): a PQL condition, e.g. 'OrderId = :orderId'
+    values (arr): bind variables for the query
+    page_size (int): the number of rows per page
+  Returns:
+    a generator of tuples, one value per column in the requested order
+  """
+  dfp_client = get_client()
+  pql_service = dfp_client.GetService('PublisherQueryLanguageService',
+    version='v201908')
+
+  def select_page(statement):
+    result_set = pql_service.select(statement)
+    rows = []
+    if 'rows' in result_set and result_set['rows']:
+      rows = [row_to_tuple(row) for row in result_set['rows']]
+    return {'results': rows}
+
+  select_clause = 'SELECT {columns} FROM {table}'.format(
+    columns=', '.join(columns), table=table)
+  if query:
+    select_clause += ' WHERE {0}'.format(query)
+
+  # Result sets do not report their total size, so we page until a short
+  # page comes back.
+  statement = ad_manager.FilterStatement(select_clause, values)
+  return iter_results(select_page, statement, page_size=page_size)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import logging
+import os
+import re
+from threading import Lock
+
+from dfp.exceptions import BadSettingException
+
+
+logger = logging.getLogger(__name__)
+
+# A GAM macro that expands to the value of a targeting key, e.g.
+# %%PATTERN:hb_adid%%.
+PATTERN_MACRO = re.compile(r'%%PATTERN:([^%\s]+)%%')
+
+# The repository root, which snippet paths in settings are relative to.
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+class SnippetTemplate(object):
+  """
+  A creative snippet read from disk, with its %%PATTERN:...%% macros checked
+  once.
+  """
+
+  def __init__(self, path, mtime, text):
+    self.path = path
+    self.mtime = mtime
+    self.text = text
+
+    # Unterminated macros would be served verbatim by GAM, so catch them here
+    # rather than in a live creative.
+    self.macros = tuple(PATTERN_MACRO.findall(text))
+    if text.count('%%PATTERN:') != len(self.macros):
+      raise BadSettingException(
+        'The creative snippet {0} has a malformed %%PATTERN:...%% macro.'
+          .format(path))
+
+  def render(self):
+    """
+    Returns the snippet text.
+    """
+    return self.text
+
+_templates = {}
+_templates_lock = Lock()
+
+def get_snippet_template(snippet_path):
+  """
+  Returns the template for a snippet file, reading the file only the
+  first time and again whenever its modification time changes.
+
+  Args:
+    snippet_path (str): the path of the snippet, relative to the repository
+      root, e.g. settings.PREBID_CREATIVE_SNIPPET
+  Returns:
+    a SnippetTemplate
+  """
+  path = os.path.normpath(os.path.join(ROOT_DIR, snippet_path))
+  mtime = os.stat(path).st_mtime
+
+  with _templates_lock:
+    template = _templates.get(path)
+    if template is None or template.mtime != mtime:
+      with open(path, 'r') as snippet_file:
+        template = SnippetTemplate(path, mtime, snippet_file.read())
+      _templates[path] = template
+      logger.debug(u'Loaded creative snippet {0}.'.format(path))
+    return template
+
+def clear_snippet_templates():
+  """
+  Forgets every loaded snippet template.
+  """
+  with _templates_lock:
+    _templates.clear()
@@ -0,0 +1,73 @@
+from collections import namedtuple
+
+
+def to_soap(spec):
+    """
+    Returns the SOAP dict for a spec, or the object itself if it is already a
+    plain config dict.
+    """
+    if hasattr(spec, 'to_soap'):
+        return spec.to_soap()
+    return spec
+
+
+class LineItemSpec(namedtuple('LineItemSpec',
+                              ['template', 'name', 'cpm_micro_amount',
+                               'price_criteria'])):
+    """
+    A line item to create: what varies by price, plus a reference to the
+    LineItemTemplate holding everything the order's line items share.
+
+    `price_criteria` is a tuple of (key ID, value ID) pairs.
+    """
+    __slots__ = ()
+
+    def to_soap(self):
+        return self.template.create_config(self.name, self.cpm_micro_amount,
+                                           dict(self.price_criteria))
+
+
+class CreativeSpec(namedtuple('CreativeSpec',
+                              ['name', 'advertiser_id', 'snippet', 'width',
+                               'height', 'is_safe_frame_compatible'])):
+    """
+    A third-party snippet creative to create. Duplicates share one snippet
+    string.
+    """
+    __slots__ = ()
+
+    def to_soap(self):
+        # https://developers.google.com/doubleclick-publishers/docs/reference/v201908/CreativeService.Creative
+        return {
+            'xsi_type': 'ThirdPartyCreative',
+            'name': self.name,
+            'advertiserId': self.advertiser_id,
+            'size': {
+                'width': self.width,
+                'height': self.height
+            },
+            'snippet': self.snippet,
+            'isSafeFrameCompatible': self.is_safe_frame_compatible,
+        }
+
+
+class LicaSpec(namedtuple('LicaSpec', ['line_item_id', 'creative_id', 'sizes'])):
+    """
+    A line item <> creative association to create. `sizes` is a tuple (or
+    None for native), shared by every association of a run.
+    """
+    __slots__ = ()
+
+    def to_soap(self):
+        return {
+            'creativeId': self.creative_id,
+            'lineItemId': self.line_item_id,
+            # "Overrides the value set for Creative.size, which allows the
+            #   creative to be served to ad units that would otherwise not be
+            #   compatible for its actual size."
+            #    https://developers.google.com/doubleclick-publishers/docs/reference/v201908/LineItemCreativeAssociationService.LineItemCreativeAssociation
+            #
+            # This is equivalent to selecting "Size overrides" in the DFP creative
+            # settings, as recommended: http://prebid.org/adops/step-by-step.html
+            'sizes': list(self.sizes) if self.sizes is not None else None
+        }
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+
+"""
+An OAuth2 access token cache shared by every client and process.
+
+googleads' service account client exchanges a signed JWT for a new access
+token whenever a client is built, and get_client builds one per call. With a
+cache file set, tokens are instead kept until shortly before they expire, in
+a file that concurrent runs lock while refreshing.
+"""
+
+import calendar
+import io
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+try:
+  import fcntl
+except ImportError:
+  # Windows; runs there can refresh the same token at once, which is only
+  # wasteful.
+  fcntl = None
+
+import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Refresh tokens this long before they expire, so requests never carry one
+# that expires in flight.
+REFRESH_MARGIN_SECONDS = 300
+
+# The keys of GOOGLEADS_YAML, and of its 'ad_manager' section, that a client
+# with a cached token can be built from. Anything else (e.g. a proxy) is left
+# to googleads.
+SUPPORTED_YAML_KEYS = ('ad_manager', 'enable_compression')
+SUPPORTED_AD_MANAGER_YAML_KEYS = ('application_name', 'network_code',
+  'enable_compression', 'path_to_private_key_file', 'delegated_account')
+
+class TokenCache(object):
+  """
+  Access tokens and their expiry times, by service account and scope, in a
+  JSON file.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.tokens = {}
+    self.lock = Lock()
+
+  def get_token(self, key, fetch_token):
+    """
+    Returns a cached access token for `key`, or a new one if there is none
+    that is far enough from expiry.
+
+    Args:
+      key (str): identifies the account and scope of the token
+      fetch_token (function): returns a new (token, expiry timestamp) tuple
+    Returns:
+      a string
+    """
+    with self.lock:
+      entry = self.tokens.get(key)
+      if is_fresh(entry):
+        return entry['token']
+
+      with self.locked_file():
+        # Another process may have refreshed the token meanwhile.
+        entry = self.load().get(key)
+        if not is_fresh(entry):
+          logger.debug('Fetching a new access token.')
+          token, expiry = fetch_token()
+          entry = {'token': token, 'expiry': expiry}
+          tokens = self.load()
+          tokens[key] = entry
+          self.save(tokens)
+
+      self.tokens[key] = entry
+      return entry['token']
+
+  def invalidate(self, key):
+    """
+    Forgets the token for `key`, so the next get_token fetches a new one.
+    """
+    with self.lock:
+      self.tokens.pop(key, None)
+      with self.locked_file():
+        tokens = self.load()
+        if tokens.pop(key, None) is not None:
+          self.save(tokens)
+
+  @contextmanager
+  def locked_file(self):
+    """
+    Holds an exclusive lock on the cache across processes.
+    """
+    if fcntl is None:
+      yield
+      return
+
+    with open(self.path + '.lock', 'a') as lock_file:
+      fcntl.flock(lock_file, fcntl.LOCK_EX)
+      try:
+        yield
+      finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+  def load(self):
+    """
+    Returns the tokens in the cache file, or none if it is missing or
+    unreadable.
+    """
+    try:
+      with io.open(self.path, encoding='utf-8') as cache_file:
+        tokens = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+      return {}
+    return tokens if isinstance(tokens, dict) else {}
+
+  def save(self, tokens):
+    """
+    Writes `tokens` to the cache file, readable only by the current user.
+    """
+    temp_path = '{0}.{1}.tmp'.format(self.path, os.getpid())
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with io.open(fd, 'w', encoding='utf-8') as cache_file:
+      cache_file.write(json.dumps(tokens))
+    os.replace(temp_path, self.path)
+
+def is_fresh(entry, now=None):
+  """
+  Returns whether a cache entry holds a token that is not about to expire.
+  """
+  if not entry:
+    return False
+  if now is None:
+    now = time.time()
+  return entry['expiry'] - REFRESH_MARGIN_SECONDS > now
+
+class CachedServiceAccountClient(object):
+  """
+  A googleads OAuth2 client for a service account key file, taking its
+  access tokens from a TokenCache. It is used in place of
+  googleads.oauth2.GoogleServiceAccountClient.
+  """
+
+  def __init__(self, key_file, scope, cache, sub=None):
+    self.key_file = key_file
+    self.scope = scope
+    self.cache = cache
+    self.sub = sub
+    self._creds = None
+
+  @property
+  def creds(self):
+    if self._creds is None:
+      from google.oauth2 import service_account
+      self._creds = service_account.Credentials.from_service_account_file(
+        self.key_file, scopes=[self.scope], subject=self.sub)
+    return self._creds
+
+  @property
+  def cache_key(self):
+    return '{0} {1} {2}'.format(os.path.abspath(self.key_file), self.scope,
+      self.sub or '')
+
+  def CreateHttpHeader(self):
+    token = self.cache.get_token(self.cache_key, self.fetch_token)
+    return {'authorization': 'Bearer {0}'.format(token)}
+
+  def Refresh(self):
+    self.cache.invalidate(self.cache_key)
+    self.cache.get_token(self.cache_key, self.fetch_token)
+
+  def fetch_token(self):
+    """
+    Exchanges a signed JWT for a new access token.
+
+    Returns:
+      a (token, expiry timestamp) tuple
+    """
+    import google.auth.transport.requests
+    import requests
+
+    with requests.Session() as session:
+      self.creds.refresh(
+        google.auth.transport.requests.Request(session=session))
+    return self.creds.token, calendar.timegm(self.creds.expiry.utctimetuple())
+
+_caches = {}
+
+def get_token_cache():
+  """
+  Returns the TokenCache for settings.DFP_TOKEN_CACHE_FILE, or None if
+  tokens are not cached.
+  """
+  path = getattr(settings, 'DFP_TOKEN_CACHE_FILE', None)
+  if not path:
+    return None
+  if path not in _caches:
+    _caches[path] = TokenCache(path)
+  return _caches[path]
+
+def get_cached_oauth2_client(googleads_yaml, scope):
+  """
+  Returns an OAuth2 client using the token cache for the service account in
+  `googleads_yaml`, or None if tokens are not cached or the configuration
+  is one we leave to googleads.
+
+  Args:
+    googleads_yaml (dict): the googleads configuration, as in
+      settings.GOOGLEADS_YAML
+    scope (str): the OAuth2 scope of the API
+  Returns:
+    a CachedServiceAccountClient, or None
+  """
+  cache = get_token_cache()
+  ad_manager_yaml = googleads_yaml.get('ad_manager') or {}
+  if cache is None or 'path_to_private_key_file' not in ad_manager_yaml:
+    return None
+
+  unsupported = sorted(
+    set(googleads_yaml) - set(SUPPORTED_YAML_KEYS) |
+    set(ad_manager_yaml) - set(SUPPORTED_AD_MANAGER_YAML_KEYS))
+  if unsupported:
+    logger.warning('Not caching access tokens, since GOOGLEADS_YAML sets %s.',
+      ', '.join(unsupported))
+    return None
+
+  return CachedServiceAccountClient(
+    ad_manager_yaml['path_to_private_key_file'], scope, cache,
+    sub=ad_manager_yaml.get('delegated_account'))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""
+A shared, pooled HTTP session for the SOAP services.
+
+googleads gives every service its own requests session, and get_client builds
+a new client for each call, so without this every request would open (and
+TLS-handshake) a fresh connection to the API.
+"""
+
+import logging
+from threading import Lock
+
+import settings
+from dfp.exceptions import BadSettingException
+from dfp.pagination import get_page_workers
+
+
+logger = logging.getLogger(__name__)
+
+# The fewest connections to keep open, enough for the default number of
+# lookups prefetched at once.
+DEFAULT_POOL_SIZE = 4
+
+def get_pool_size(pool_size=None):
+  """
+  Returns the number of connections to keep open to the API.
+
+  Args:
+    pool_size (int): an explicit pool size, or None to use
+      settings.DFP_HTTP_POOL_SIZE, or if that is not set, enough for the
+      most requests we make at once
+  Returns:
+    an integer
+  """
+  if pool_size is None:
+    pool_size = getattr(settings, 'DFP_HTTP_POOL_SIZE', None)
+  if pool_size is None:
+    pool_size = max(DEFAULT_POOL_SIZE, get_page_workers(),
+      getattr(settings, 'DFP_MAX_CONCURRENT_REQUESTS', None) or 1)
+
+  if pool_size < 1:
+    raise BadSettingException('The HTTP pool size must be at least 1.')
+
+  return pool_size
+
+def create_session(pool_size=None):
+  """
+  Returns a requests session that keeps up to `pool_size` connections per
+  host alive between requests.
+  """
+  import requests
+
+  pool_size = get_pool_size(pool_size)
+  session = requests.Session()
+  adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+    pool_maxsize=pool_size)
+  session.mount('https://', adapter)
+  session.mount('http://', adapter)
+
+  if getattr(settings, 'DFP_CASSETTE_FILE', None):
+    from dfp.cassette import get_cassette, use_cassette
+    use_cassette(session, get_cassette())
+  return session
+
+_session = None
+_session_lock = Lock()
+
+def get_session():
+  """
+  Returns the session shared by every service, creating it if needed.
+  """
+  global _session
+  with _session_lock:
+    if _session is None:
+      _session = create_session()
+    return _session
+
+def close_session():
+  """
+  Closes the shared session's connections.
+  """
+  global _session
+  with _session_lock:
+    if _session is not None:
+      _session.close()
+    _session = None
+
+def use_session(service, session):
+  """
+  Makes a googleads SOAP service send its requests through `session`, keeping
+  the proxies and SSL settings (CA bundle or disabled validation, client
+  certificate) it was configured with from googleads.yaml.
+  """
+  transport = getattr(getattr(service, 'zeep_client', None), 'transport', None)
+  if transport is None or transport.session is session:
+    return
+  session.proxies.update(transport.session.proxies or {})
+  session.verify = transport.session.verify
+  session.cert = transport.session.cert
+  transport.session.close()
+  transport.session = session
+
+class PooledClient(object):
+  """
+  Wraps an AdManagerClient so the services it returns share one HTTP session.
+  """
+
+  def __init__(self, client, session):
+    self._client = client
+    self._session = session
+
+  def GetService(self, *args, **kwargs):
+    service = self._client.GetService(*args, **kwargs)
+    use_session(service, self._session)
+    return service
+
+  def __getattr__(self, name):
+    return getattr(self._client, name)
@@ -68,6 +68,51 @@ DFP_USE_EXISTING_ORDER_IF_EXISTS = False
 # The currency to use in DFP when setting line item CPMs.
 DFP_CURRENCY_CODE = 'USD'
 
+# Optional
+# How many results to request per page when reading from DFP (at most 500),
+# and how many pages to fetch concurrently.
+# DFP_PAGE_SIZE = 500
+# DFP_PAGE_WORKERS = 4
+
+# Optional
+# A JSON file to record API call latencies and known targeting values in, so
+# later runs can estimate their API calls and duration before starting.
+# DFP_CALL_HISTORY_FILE = '.dfp_call_history.json'
+
+# Optional
+# When GAM rejects some objects in a batch (e.g. line items whose names are
+# taken), the others are still created and the rejected ones are appended to
+# this JSON lines file with GAM's reasons.
+# DFP_REJECTS_FILE = 'dfp_rejects.jsonl'
+
+# Optional
+# Objects are created in batches that grow while the time per object
+# improves and are halved when a call is too large or GAM too busy for it,
+# within these bounds.
+# DFP_MIN_BATCH_SIZE = 1
+# DFP_MAX_BATCH_SIZE = 500
+# DFP_INITIAL_BATCH_SIZE = 50
+
+# How many API requests to have in flight at once. Above 1, the setup makes
+# independent calls concurrently.
+# DFP_MAX_CONCURRENT_REQUESTS = 8
+
+# How many connections to GAM to keep open for reuse, and whether to ask for
+# gzip-compressed responses.
+# DFP_HTTP_POOL_SIZE = 8
+# DFP_ENABLE_COMPRESSION = True
+
+# A file in which to share OAuth2 access tokens between clients and runs, so
+# they are only fetched shortly before they expire. Keep it private.
+# DFP_TOKEN_CACHE_FILE = '.dfp_token_cache.json'
+
+# Record API traffic to a cassette file ('record'), or answer requests from
+# it offline ('replay'), optionally waiting for the recorded latency scaled by
+# DFP_CASSETTE_LATENCY_SCALE.
+# DFP_CASSETTE_FILE = 'cassette.json.gz'
+# DFP_CASSETTE_MODE = 'record'
+# DFP_CASSETTE_LATENCY_SCALE = None
+
 #########################################################################
 # PREBID SETTINGS
 #########################################################################
@@ -86,7 +131,15 @@ PREBID_NATIVE_FORMAT_ID = 0
 
 # Price buckets. This should match your Prebid settings for the partner. See:
 # http://prebid.org/dev-docs/publisher-api-reference.html#module_pbjs.setPriceGranularity
-# FIXME: this should be an array of buckets. See:
+# This may also be a custom price granularity, as passed to Prebid, e.g. the
+# output of `python -m tasks.price_optimizer`:
+# PREBID_PRICE_BUCKETS = {
+#     'buckets': [
+#         {'precision': 2, 'min': 0, 'max': 5, 'increment': 0.05},
+#         {'precision': 2, 'min': 5, 'max': 20, 'increment': 0.50},
+#     ]
+# }
+# See:
 # https://github.com/prebid/Prebid.js/blob/8fed3d7aaa814e67ca3efc103d7d306cab8c692c/src/cpmBucketManager.js
 PREBID_PRICE_BUCKETS = {
     'precision': 2,
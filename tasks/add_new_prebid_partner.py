@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import sys
@@ -7,7 +8,9 @@ from pprint import pprint
 from colorama import init
 
 import settings
+import dfp.aio
 import dfp.associate_line_items_and_creatives
+import dfp.call_history
 import dfp.create_custom_targeting
 import dfp.create_creatives
 import dfp.create_line_items
@@ -15,17 +18,23 @@ import dfp.create_orders
 import dfp.get_ad_units
 import dfp.get_advertisers
 import dfp.get_custom_targeting
+import dfp.get_line_items
 import dfp.get_placements
 import dfp.get_users
 from dfp.exceptions import (
     BadSettingException,
     MissingSettingException
 )
+from dfp.specs import LineItemSpec
+from tasks.preflight import estimate_setup, log_estimate
+from tasks.prefetch import Prefetch
 from tasks.price_utils import (
+    DEFAULT_PRECISION,
+    PriceBucket,
+    get_price_precision,
     get_prices_array,
     get_prices_summary_string,
-    micro_amount_to_num,
-    num_to_str,
+    micro_amounts_to_strs,
 )
 
 # Colorama for cross-platform support for colored logging.
@@ -48,22 +57,32 @@ logger = logging.getLogger(__name__)
 
 def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
                   sizes, bidder_code, prices, num_creatives, currency_code, hb_criteria_custom, hb_bidder=True,
-                  creative_template_id=None):
+                  creative_template_id=None, prefetch=None):
     """
     Call all necessary DFP tasks for a new Prebid partner setup.
+
+    Lookups already started by `prefetch` (see start_prefetch) are used rather
+    than made again.
     """
+    if prefetch is None:
+        prefetch = Prefetch()
 
     # Get the user.
-    user_id = dfp.get_users.get_user_id_by_email(user_email)
+    user_id = prefetch.get('user_id', dfp.get_users.get_user_id_by_email,
+                           user_email)
 
     # Get the placement IDs.
-    placement_ids = dfp.get_placements.get_placement_ids_by_name(placements)
+    placement_ids = prefetch.get(
+        'placement_ids', dfp.get_placements.get_placement_ids_by_name,
+        placements)
 
     # Get the ad unit IDs.
-    ad_unit_ids = dfp.get_ad_units.get_ad_unit_ids_by_name(ad_units)
+    ad_unit_ids = prefetch.get(
+        'ad_unit_ids', dfp.get_ad_units.get_ad_unit_ids_by_name, ad_units)
 
     # Get (or potentially create) the advertiser.
-    advertiser_id = dfp.get_advertisers.get_advertiser_id_by_name(
+    advertiser_id = prefetch.get(
+        'advertiser_id', dfp.get_advertisers.get_advertiser_id_by_name,
         advertiser_name)
 
     # Create the order.
@@ -74,18 +93,22 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
 
     # Do custom hb_criteria
     for criteria_key, criteria_value in hb_criteria_custom.items():
-        key_id = get_or_create_dfp_targeting_key(criteria_key)
-        hb_criteria[key_id] = DFPValueIdGetter(criteria_key).get_value_id(criteria_value)
+        key_id = get_or_create_dfp_targeting_key(criteria_key, prefetch)
+        hb_criteria[key_id] = DFPValueIdGetter(
+            criteria_key, key_id, prefetch).get_value_id(criteria_value)
 
     # We have a specific bidder criteria, create and add it
     if hb_bidder:
-        hb_bidder_key_id = get_or_create_dfp_targeting_key('hb_bidder')
-        HBBidderValueGetter = DFPValueIdGetter('hb_bidder')
+        hb_bidder_key_id = get_or_create_dfp_targeting_key('hb_bidder', prefetch)
+        HBBidderValueGetter = DFPValueIdGetter('hb_bidder', hb_bidder_key_id,
+                                               prefetch)
         hb_criteria[hb_bidder_key_id] = HBBidderValueGetter.get_value_id(bidder_code)
 
     # Get DFP key IDs for line item targeting.
-    hb_pb_key_id = get_or_create_dfp_targeting_key('hb_pb')
-    HBPBValueGetter = DFPValueIdGetter('hb_pb')
+    hb_pb_key_id = get_or_create_dfp_targeting_key('hb_pb', prefetch)
+    HBPBValueGetter = DFPValueIdGetter('hb_pb', hb_pb_key_id, prefetch)
+    # Create the missing hb_pb values in batches, not one call per price.
+    HBPBValueGetter.create_missing_values(micro_amounts_to_strs(prices))
 
     # Create line item config(s).
 
@@ -95,34 +118,26 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
                                                  currency_code, hb_criteria, HBPBValueGetter,
                                                  creative_template_id=creative_template_id)
 
+    # When adding to an existing order, only create the line items it lacks.
+    existing_line_items = get_existing_line_items(order_id, hb_pb_key_id,
+                                                  hb_criteria)
+    line_items_config = skip_existing_line_items(line_items_config,
+                                                 existing_line_items,
+                                                 hb_pb_key_id)
+
     logger.info("Creating line items...")
     line_item_ids = dfp.create_line_items.create_line_items(line_items_config)
 
     # Create creative(s).
+    creative_config = create_creative_configs(bidder_code, order_name,
+                                              advertiser_id, num_creatives,
+                                              creative_template_id)
     if creative_template_id is not None:
-        logger.info("Building Native ad creative config...")
-        creative_config = dfp.create_creatives.create_native_creative_config(
-            bidder_code=bidder_code,
-            order_name=order_name,
-            advertiser_id=advertiser_id,
-            creative_template_id=creative_template_id,
-            num_creatives=num_creatives
-        )
-
         # No sizes since we are Native
         sizes = None
 
-    else:
-        logger.info("Building creative config(s)...")
-        creative_config = dfp.create_creatives.create_duplicate_creative_configs(
-            bidder_code=bidder_code,
-            order_name=order_name,
-            advertiser_id=advertiser_id,
-            prebid_creative_snippet=settings.PREBID_CREATIVE_SNIPPET,
-            num_creatives=num_creatives)
-
     logger.info("Creating creatives...")
-    creative_ids = dfp.create_creatives.create_creatives(creative_config)
+    creative_ids = dfp.create_creatives.get_or_create_creatives(creative_config)
 
     # Associate creatives with line items.
     logger.info("Associating creative(s) and line item(s)...")
@@ -141,33 +156,220 @@ def setup_partner(user_email, advertiser_name, order_name, placements, ad_units,
   """)
 
 
+async def setup_partner_async(user_email, advertiser_name, order_name,
+                              placements, ad_units, sizes, bidder_code, prices,
+                              num_creatives, currency_code, hb_criteria_custom,
+                              hb_bidder=True, creative_template_id=None,
+                              prefetch=None):
+    """
+    Does what setup_partner does, but overlaps independent API calls: the
+    lookups run together, missing targeting values are created concurrently,
+    creatives are created while the line items are, and line items and
+    associations are created in concurrent batches. dfp.aio limits how many
+    requests are in flight.
+    """
+    if prefetch is None:
+        prefetch = Prefetch()
+
+    async def get(name, coroutine_function, *args):
+        # Use a prefetched result if there is one.
+        if name in prefetch:
+            return await dfp.aio.run(prefetch.get, name, None)
+        return await coroutine_function(*args)
+
+    user_id, placement_ids, ad_unit_ids, advertiser_id = await asyncio.gather(
+        get('user_id', dfp.aio.get_user_id_by_email, user_email),
+        get('placement_ids', dfp.aio.get_placement_ids_by_name, placements),
+        get('ad_unit_ids', dfp.aio.get_ad_unit_ids_by_name, ad_units),
+        get('advertiser_id', dfp.aio.get_advertiser_id_by_name,
+            advertiser_name),
+    )
+
+    # Create the order, and meanwhile get the targeting keys and values.
+    criteria_values = dict(hb_criteria_custom)
+    if hb_bidder:
+        criteria_values['hb_bidder'] = bidder_code
+    key_names = list(criteria_values) + ['hb_pb']
+    key_ids = await asyncio.gather(*[
+        dfp.aio.run(get_or_create_dfp_targeting_key, key_name, prefetch)
+        for key_name in key_names])
+    order_id, getters = await asyncio.gather(
+        dfp.aio.create_order(order_name, advertiser_id, user_id),
+        asyncio.gather(*[
+            dfp.aio.run(DFPValueIdGetter, key_name, key_id, prefetch)
+            for key_name, key_id in zip(key_names, key_ids)]),
+    )
+    getters = dict(zip(key_names, getters))
+
+    # Create every missing value at once, so get_value_id finds them all.
+    hb_pb_values = asyncio.ensure_future(create_missing_values_async(
+        getters['hb_pb'], micro_amounts_to_strs(prices)))
+    await asyncio.gather(*[
+        create_missing_values_async(getters[key_name], [value_name])
+        for key_name, value_name in criteria_values.items()
+    ])
+
+    hb_criteria = {}
+    for key_name, key_id in zip(key_names, key_ids):
+        if key_name in criteria_values:
+            hb_criteria[key_id] = getters[key_name].get_value_id(
+                criteria_values[key_name])
+    hb_pb_key_id = key_ids[-1]
+
+    # Meanwhile, index the line items an existing order already has.
+    existing_line_items = await dfp.aio.run(get_existing_line_items, order_id,
+                                            hb_pb_key_id, hb_criteria)
+    await hb_pb_values
+
+    logger.info("Creating line item config(s)...")
+    line_items_config = create_line_item_configs(prices, order_id,
+                                                 placement_ids, ad_unit_ids, bidder_code, sizes, hb_pb_key_id,
+                                                 currency_code, hb_criteria, getters['hb_pb'],
+                                                 creative_template_id=creative_template_id)
+    creative_config = create_creative_configs(bidder_code, order_name,
+                                              advertiser_id, num_creatives,
+                                              creative_template_id)
+    if creative_template_id is not None:
+        # No sizes since we are Native
+        sizes = None
+
+    line_items_config = skip_existing_line_items(line_items_config,
+                                                 existing_line_items,
+                                                 hb_pb_key_id)
+
+    logger.info("Creating line items and creatives...")
+    line_item_ids, creative_ids = await asyncio.gather(
+        dfp.aio.create_line_items(line_items_config),
+        dfp.aio.get_or_create_creatives(creative_config),
+    )
+
+    logger.info("Associating creative(s) and line item(s)...")
+    await dfp.aio.make_licas(line_item_ids, creative_ids, sizes)
+
+    logger.info("""
+
+    Done! Please review your order, line items, and creatives to
+    make sure they are correct. Then, approve the order in DFP.
+
+    Happy bidding!
+
+  """)
+
+
+async def create_missing_values_async(getter, value_names):
+    """
+    Creates the values a DFPValueIdGetter does not have yet, in concurrent
+    batches.
+    """
+    batches = await dfp.aio.run_batches(getter._create_values_and_return_ids,
+                                        getter.get_missing_values(value_names),
+                                        'CustomTargetingValue')
+    for value_ids in batches:
+        getter._add_values(value_ids)
+
+
+def create_creative_configs(bidder_code, order_name, advertiser_id,
+                            num_creatives, creative_template_id=None):
+    """
+    Builds the native creative config if there is a template, otherwise the
+    duplicate snippet creative configs.
+    """
+    if creative_template_id is not None:
+        logger.info("Building Native ad creative config...")
+        return dfp.create_creatives.create_native_creative_config(
+            bidder_code=bidder_code,
+            order_name=order_name,
+            advertiser_id=advertiser_id,
+            creative_template_id=creative_template_id,
+            num_creatives=num_creatives
+        )
+
+    logger.info("Building creative config(s)...")
+    return dfp.create_creatives.create_duplicate_creative_configs(
+        bidder_code=bidder_code,
+        order_name=order_name,
+        advertiser_id=advertiser_id,
+        prebid_creative_snippet=settings.PREBID_CREATIVE_SNIPPET,
+        num_creatives=num_creatives)
+
+
 class DFPValueIdGetter(object):
     """
     A class to bulk fetch DFP values by key and then create new values as needed.
     """
 
-    def __init__(self, key_name, *args, **kwargs):
+    def __init__(self, key_name, key_id=None, prefetch=None, *args, **kwargs):
         """
         Args:
           key_name (str): the name of the DFP key
+          key_id (int): the ID of the key, if already known
+          prefetch (Prefetch): may hold the key's existing values
         """
+        if prefetch is None:
+            prefetch = Prefetch()
         self.key_name = key_name
-        self.key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
-        self.existing_values = dfp.get_custom_targeting.get_targeting_by_key_name(
-            key_name)
+        self.key_id = key_id
+        if self.key_id is None:
+            self.key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
+        # A key created since the prefetch has no values yet.
+        self.existing_values = prefetch.get(
+            ('values', key_name),
+            dfp.get_custom_targeting.get_targeting_by_key_name,
+            key_name) or []
+        # Look values up by name in constant time; the first value wins, as
+        # in a scan of the list.
+        self.value_ids = {}
+        for value_obj in self.existing_values:
+            self.value_ids.setdefault(value_obj['name'], value_obj['id'])
+
+        # Remember the values for the next run's pre-flight estimate.
+        self.history = dfp.call_history.get_recording()
+        if self.history is not None:
+            self.history.record_values(key_name, [
+                value_obj['name'] for value_obj in self.existing_values or []])
         super(DFPValueIdGetter, self).__init__(*args, **kwargs)
 
     def _get_value_id_from_cache(self, value_name):
-        val_id = None
-        for value_obj in self.existing_values:
-            if value_obj['name'] == value_name:
-                val_id = value_obj['id']
-                break
-        return val_id
+        return self.value_ids.get(value_name)
+
+    def _add_values(self, value_ids):
+        for value_name, value_id in value_ids.items():
+            self.existing_values.append({'name': value_name, 'id': value_id})
+            self.value_ids.setdefault(value_name, value_id)
+
+    def _create_values_and_return_ids(self, value_names):
+        value_ids = dfp.create_custom_targeting.create_targeting_values(
+            value_names, self.key_id)
+        if self.history is not None:
+            self.history.record_values(self.key_name, list(value_ids))
+        return value_ids
+
+    def get_missing_values(self, value_names):
+        """
+        Returns the names, sorted and without duplicates, of the values that
+        do not exist yet.
+        """
+        return sorted(set(value_name for value_name in value_names
+                          if not self._get_value_id_from_cache(value_name)))
+
+    def create_missing_values(self, value_names):
+        """
+        Creates the values that do not exist yet, in batches, so that
+        get_value_id finds them all.
+
+        Args:
+          value_names (arr): the names of the DFP values
+        """
+        missing = self.get_missing_values(value_names)
+        if missing:
+            self._add_values(self._create_values_and_return_ids(missing))
 
     def _create_value_and_return_id(self, value_name):
-        return dfp.create_custom_targeting.create_targeting_value(value_name,
-                                                                  self.key_id)
+        val_id = dfp.create_custom_targeting.create_targeting_value(value_name,
+                                                                    self.key_id)
+        if self.history is not None:
+            self.history.record_values(self.key_name, [value_name])
+        return val_id
 
     def get_value_id(self, value_name):
         """
@@ -184,21 +386,73 @@ class DFPValueIdGetter(object):
         return val_id
 
 
-def get_or_create_dfp_targeting_key(name):
+def get_or_create_dfp_targeting_key(name, prefetch=None):
     """
     Get or create a custom targeting key by name.
 
     Args:
       name (str)
+      prefetch (Prefetch): may hold the key's ID
     Returns:
       an integer: the ID of the targeting key
     """
-    key_id = dfp.get_custom_targeting.get_key_id_by_name(name)
+    if prefetch is None:
+        prefetch = Prefetch()
+    key_id = prefetch.get(('key_id', name),
+                          dfp.get_custom_targeting.get_key_id_by_name, name)
     if key_id is None:
         key_id = dfp.create_custom_targeting.create_targeting_key(name)
     return key_id
 
 
+def get_existing_line_items(order_id, hb_pb_key_id, hb_criteria):
+    """
+    Indexes the names and hb_pb values of the line items already in the order,
+    if settings.DFP_USE_EXISTING_ORDER_IF_EXISTS allows adding to one.
+
+    Args:
+      order_id (int)
+      hb_pb_key_id (int)
+      hb_criteria (dict): the other criteria of the setup's line items; only
+        line items with the same ones count as covering an hb_pb value
+    Returns:
+      a dfp.get_line_items.LineItemIndex, or None for a new order
+    """
+    if not getattr(settings, 'DFP_USE_EXISTING_ORDER_IF_EXISTS', None):
+        return None
+    return dfp.get_line_items.get_line_item_index(order_id, hb_pb_key_id,
+                                                  criteria=hb_criteria)
+
+
+def skip_existing_line_items(line_items_config, existing_line_items,
+                             hb_pb_key_id):
+    """
+    Drops the line items that an existing order already has: those with the
+    same name, or targeting an hb_pb value it already covers. GAM would reject
+    them as duplicates.
+
+    Args:
+      line_items_config (arr): LineItemSpecs
+      existing_line_items (LineItemIndex): from get_existing_line_items, or
+        None to keep every line item
+      hb_pb_key_id (int)
+    Returns:
+      an array of LineItemSpecs
+    """
+    if existing_line_items is None:
+        return line_items_config
+
+    new_line_items = [
+        config for config in line_items_config
+        if not existing_line_items.contains(
+            config.name, dict(config.price_criteria)[hb_pb_key_id])]
+    num_skipped = len(line_items_config) - len(new_line_items)
+    if num_skipped:
+        logger.info(u'Skipping {0} line item(s) the order already has; '
+                    'creating {1}.'.format(num_skipped, len(new_line_items)))
+    return new_line_items
+
+
 def create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidder_code,
                              sizes, hb_pb_key_id, currency_code, hb_criteria,
                              HBPBValueGetter, creative_template_id):
@@ -218,36 +472,40 @@ def create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidde
       HBPBValueGetter (DFPValueIdGetter)
       creative_template_id
     Returns:
-      an array of objects: the array of DFP line item configurations
+      an array of LineItemSpecs, one per price
     """
 
+    # Everything but the name, CPM and hb_pb value is the same for every
+    # price, so build it once.
+    template = dfp.create_line_items.LineItemTemplate(
+        order_id=order_id,
+        placement_ids=placement_ids,
+        ad_unit_ids=ad_unit_ids,
+        sizes=sizes,
+        hb_criteria=hb_criteria,
+        currency_code=currency_code,
+        creative_template_id=creative_template_id,
+    )
+
     line_items_config = []
-    for price in prices:
-        price_str = num_to_str(micro_amount_to_num(price))
+    for bucket in map(PriceBucket, prices, micro_amounts_to_strs(prices)):
 
         # Autogenerate the line item name.
         line_item_name = u'{bidder_code}: HB ${price}'.format(
             bidder_code=bidder_code,
-            price=price_str
+            price=bucket.value_name
         )
 
         # The DFP targeting value ID for this `hb_pb` price value.
-        hb_pb_value_id = HBPBValueGetter.get_value_id(price_str)
-
-        # Add the prebid key and price to the criteria
-        hb_criteria[hb_pb_key_id] = hb_pb_value_id
+        hb_pb_value_id = HBPBValueGetter.get_value_id(bucket.value_name)
 
-        # Create the line item config
-        config = dfp.create_line_items.create_line_item_config(
+        # Keep only what varies by price; the SOAP config is built from the
+        # template when the line items are created.
+        config = LineItemSpec(
+            template=template,
             name=line_item_name,
-            order_id=order_id,
-            placement_ids=placement_ids,
-            ad_unit_ids=ad_unit_ids,
-            cpm_micro_amount=price,
-            sizes=sizes,
-            hb_criteria=hb_criteria,
-            currency_code=currency_code,
-            creative_template_id=creative_template_id,
+            cpm_micro_amount=bucket.micro_amount,
+            price_criteria=((hb_pb_key_id, hb_pb_value_id),),
         )
 
         line_items_config.append(config)
@@ -255,17 +513,77 @@ def create_line_item_configs(prices, order_id, placement_ids, ad_unit_ids, bidde
     return line_items_config
 
 
+def start_prefetch(user_email, advertiser_name, placements, ad_units,
+                   key_names):
+    """
+    Starts the read-only lookups of a setup in the background, so they can run
+    while the user reads the confirmation prompt.
+
+    Args:
+      user_email (str)
+      advertiser_name (str)
+      placements (arr): placement names
+      ad_units (arr): ad unit names, or None
+      key_names (arr): the names of the targeting keys the line items use
+    Returns:
+      a Prefetch, to pass to setup_partner and close afterwards
+    """
+    prefetch = Prefetch()
+    prefetch.submit('user_id', dfp.get_users.get_user_id_by_email, user_email)
+    prefetch.submit('placement_ids',
+                    dfp.get_placements.get_placement_ids_by_name, placements)
+    if ad_units:
+        prefetch.submit('ad_unit_ids',
+                        dfp.get_ad_units.get_ad_unit_ids_by_name, ad_units)
+
+    # Finding the advertiser may create it, which must wait for confirmation.
+    if not getattr(settings, 'DFP_CREATE_ADVERTISER_IF_DOES_NOT_EXIST', False):
+        prefetch.submit('advertiser_id',
+                        dfp.get_advertisers.get_advertiser_id_by_name,
+                        advertiser_name)
+
+    for key_name in key_names:
+        prefetch.submit(('key_id', key_name),
+                        dfp.get_custom_targeting.get_key_id_by_name, key_name)
+        prefetch.submit(('values', key_name),
+                        dfp.get_custom_targeting.get_targeting_by_key_name,
+                        key_name)
+    return prefetch
+
+
 def check_price_buckets_validity(price_buckets):
     """
     Validate that the price_buckets object contains all required keys and the
     values are the expected types.
 
     Args:
-      price_buckets (object)
+      price_buckets (object): a price bucket, or a Prebid custom price
+        granularity: {'buckets': [price_bucket, ...]}
     Returns:
       None
     """
 
+    if 'buckets' in price_buckets:
+        buckets = price_buckets['buckets']
+        if not isinstance(buckets, list) or len(buckets) < 1:
+            raise BadSettingException('The "buckets" key in "PREBID_PRICE_BUCKETS" '
+                                      'must be an array of at least one bucket.')
+        # Prebid starts each bucket where the previous one ends (the first
+        # at 0), so a different min would not be what Prebid does.
+        bucket_min = 0
+        for bucket in buckets:
+            check_price_buckets_validity(
+                dict({'precision': DEFAULT_PRECISION, 'min': bucket_min},
+                     **bucket))
+            if 'min' in bucket and bucket['min'] != bucket_min:
+                raise BadSettingException(
+                    'Each bucket in "PREBID_PRICE_BUCKETS" must start at the '
+                    'previous bucket\'s max (the first at 0), as in Prebid; '
+                    'found min {0} instead of {1}.'.format(
+                        bucket['min'], bucket_min))
+            bucket_min = bucket['max']
+        return
+
     try:
         pb_precision = price_buckets['precision']
         pb_min = price_buckets['min']
@@ -291,6 +609,10 @@ def check_price_buckets_validity(price_buckets):
         raise BadSettingException('The "increment" key in "PREBID_PRICE_BUCKETS" '
                                   'must be a number.')
 
+    if pb_increment <= 0:
+        raise BadSettingException('The "increment" key in "PREBID_PRICE_BUCKETS" '
+                                  'must be greater than 0.')
+
 
 class color:
     PURPLE = '\033[95m'
@@ -367,9 +689,23 @@ def main():
 
     check_price_buckets_validity(price_buckets)
 
+    # With more than one request in flight, use the concurrent setup.
+    max_concurrent_requests = getattr(settings, 'DFP_MAX_CONCURRENT_REQUESTS',
+                                      None)
+    if max_concurrent_requests is None:
+        max_concurrent_requests = 1
+    elif max_concurrent_requests < 1:
+        raise BadSettingException('The setting "DFP_MAX_CONCURRENT_REQUESTS" '
+                                  'must be at least 1.')
+
     prices = get_prices_array(price_buckets)
-    prices_summary = get_prices_summary_string(prices,
-                                               price_buckets['precision'])
+    prices_summary = get_prices_summary_string(
+        prices, get_price_precision(price_buckets))
+
+    # The line items an existing order already has are only known once the
+    # setup looks the order up, so the summary counts every price.
+    use_existing_order = getattr(settings, 'DFP_USE_EXISTING_ORDER_IF_EXISTS',
+                                 None)
 
     # Are we native?
     creative_template_id = settings.PREBID_NATIVE_FORMAT_ID if settings.PREBID_NATIVE else None
@@ -377,7 +713,7 @@ def main():
     logger.info(
         u"""
     
-        Going to create {name_start_format}{num_line_items}{format_end} new line items.
+        Going to create {up_to}{name_start_format}{num_line_items}{format_end} new line items.{skip_note}
           {name_start_format}Order{format_end}: {value_start_format}{order_name}{format_end}
           {name_start_format}Advertiser{format_end}: {value_start_format}{advertiser}{format_end}
           {name_start_format}Native Ad Units?{format_end}: {value_start_format}{native}{format_end}
@@ -391,6 +727,9 @@ def main():
     
         """.format(
             num_line_items=len(prices),
+            up_to='up to ' if use_existing_order else '',
+            skip_note=(u' If the order exists, line items it already has '
+                       u'will be skipped.' if use_existing_order else u''),
             order_name=order_name,
             advertiser=advertiser_name,
             user_email=user_email,
@@ -406,28 +745,70 @@ def main():
             value_start_format=color.BLUE,
         ))
 
-    ok = input('Is this correct? (y/n)\n')
-
-    if ok != 'y':
-        logger.info('Exiting.')
-        return
-
-    setup_partner(
-        user_email,
-        advertiser_name,
-        order_name,
-        placements,
-        ad_units,
-        sizes,
-        bidder_code,
-        prices,
-        num_creatives,
-        currency_code,
-        hb_criteria,
-        hb_bidder,
-        creative_template_id=creative_template_id
-    )
+    criteria_values = {key: [value] for key, value in hb_criteria.items()}
+    if hb_bidder:
+        criteria_values['hb_bidder'] = [bidder_code]
+    criteria_values['hb_pb'] = micro_amounts_to_strs(prices)
 
+    # Start the lookups now, so they run while the user reads the summary.
+    prefetch = start_prefetch(user_email, advertiser_name, placements,
+                              ad_units, list(criteria_values))
+    try:
+        # Estimate the API calls and time the setup needs, from earlier runs.
+        history = dfp.call_history.CallHistory(
+            getattr(settings, 'DFP_CALL_HISTORY_FILE', None))
+        log_estimate(estimate_setup(
+            history,
+            num_placements=len(placements),
+            num_ad_units=len(ad_units or []),
+            criteria_values=criteria_values,
+            num_line_items=len(prices),
+            num_creatives=num_creatives,
+            is_native=creative_template_id is not None,
+        ))
+        if use_existing_order:
+            logger.info(u'The estimate counts every line item, including '
+                        u'any an existing order already has.')
+
+        ok = input('Is this correct? (y/n)\n')
+
+        if ok != 'y':
+            logger.info('Exiting.')
+            return
+
+        setup_args = (
+            user_email,
+            advertiser_name,
+            order_name,
+            placements,
+            ad_units,
+            sizes,
+            bidder_code,
+            prices,
+            num_creatives,
+            currency_code,
+            hb_criteria,
+            hb_bidder,
+        )
+        dfp.call_history.start_recording(history)
+        try:
+            if max_concurrent_requests > 1:
+                dfp.aio.set_max_concurrent_requests(max_concurrent_requests)
+                dfp.aio.run_until_complete(setup_partner_async(
+                    *setup_args,
+                    creative_template_id=creative_template_id,
+                    prefetch=prefetch
+                ))
+            else:
+                setup_partner(
+                    *setup_args,
+                    creative_template_id=creative_template_id,
+                    prefetch=prefetch
+                )
+        finally:
+            dfp.call_history.stop_recording()
+    finally:
+        prefetch.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,281 @@
+import argparse
+import bisect
+import csv
+import io
+import logging
+import os
+import sys
+
+from dfp.exceptions import BadSettingException
+from tasks.price_utils import (
+    get_prices_array,
+    micro_amount_to_str,
+    micro_amounts_to_strs,
+    num_to_micro_amount,
+)
+
+# numpy and pyarrow are optional: without numpy, bids are mapped with bisect;
+# without pyarrow, CSV logs are parsed with the csv module and Parquet logs
+# cannot be read.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.csv
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Configure logging.
+if 'DISABLE_LOGGING' in os.environ and os.environ['DISABLE_LOGGING'] == 'true':
+    logging.disable(logging.CRITICAL)
+else:
+    FORMAT = '%(message)s'
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format=FORMAT)
+
+logger = logging.getLogger(__name__)
+
+# The columns a bid log must have.
+BIDDER_COLUMN = 'bidder'
+CPM_COLUMN = 'cpm'
+
+# How many bids to hold in memory at once.
+DEFAULT_CHUNK_SIZE = 1000000
+
+
+def to_micro_amounts(cpms):
+    """
+    Converts CPMs in currency units into integer micro-amounts.
+
+    Args:
+      cpms (arr): a list or numpy array of numbers
+    Returns:
+      a numpy int64 array if numpy is installed, otherwise a list of integers
+    """
+    if numpy is not None:
+        cpms = numpy.asarray(cpms, dtype=numpy.float64)
+        return numpy.rint(cpms * 10 ** 6).astype(numpy.int64)
+    return [int(round(float(cpm) * 10 ** 6)) for cpm in cpms]
+
+
+def iter_csv_chunks(path, chunk_size, bidder=None):
+    """
+    Yields lists of CPMs from a CSV bid log, parsed with the csv module.
+    """
+    with io.open(path, 'r', newline='') as bid_log:
+        chunk = []
+        for row in csv.DictReader(bid_log):
+            if bidder is not None and row[BIDDER_COLUMN] != bidder:
+                continue
+            chunk.append(float(row[CPM_COLUMN]))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def iter_arrow_chunks(batches, bidder=None):
+    """
+    Yields numpy arrays of CPMs from pyarrow record batches.
+    """
+    for batch in batches:
+        cpms = batch.column(batch.schema.get_field_index(CPM_COLUMN))
+        if bidder is not None:
+            bidders = batch.column(batch.schema.get_field_index(BIDDER_COLUMN))
+            cpms = cpms.filter(pyarrow.compute.equal(bidders, bidder))
+        if len(cpms):
+            yield cpms.to_numpy(zero_copy_only=False)
+
+
+def iter_bid_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, bidder=None):
+    """
+    Lazily reads the bids of a CSV or Parquet bid log, in chunks, so logs of
+    any size can be replayed in bounded memory.
+
+    Args:
+      path (str): the path of a log with `bidder` and `cpm` columns; files
+        ending in .parquet are read as Parquet, others as CSV
+      chunk_size (int): the most bids per chunk
+      bidder (str): if set, only this bidder's bids
+    Returns:
+      a generator of chunks of bids in micro-amounts
+    """
+    if path.endswith('.parquet'):
+        if pyarrow is None:
+            raise BadSettingException(
+                'Reading Parquet bid logs requires pyarrow.')
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        chunks = iter_arrow_chunks(parquet_file.iter_batches(
+            batch_size=chunk_size, columns=[BIDDER_COLUMN, CPM_COLUMN]), bidder)
+    elif pyarrow is not None and numpy is not None:
+        # Roughly chunk_size rows per block, at ~16 bytes per row.
+        reader = pyarrow.csv.open_csv(path,
+            read_options=pyarrow.csv.ReadOptions(block_size=chunk_size * 16),
+            convert_options=pyarrow.csv.ConvertOptions(
+                include_columns=[BIDDER_COLUMN, CPM_COLUMN],
+                column_types={BIDDER_COLUMN: pyarrow.string(),
+                              CPM_COLUMN: pyarrow.float64()}))
+        chunks = iter_arrow_chunks(reader, bidder)
+    else:
+        chunks = iter_csv_chunks(path, chunk_size, bidder)
+
+    for chunk in chunks:
+        yield to_micro_amounts(chunk)
+
+
+class LadderReplay(object):
+    """
+    Tallies the revenue a price ladder keeps and loses on replayed bids.
+
+    Prebid rounds each bid down to its price bucket (capped at the top one),
+    and the line item for that bucket serves at the bucket's CPM, so the
+    difference between the bid and the ladder price at or below it is lost.
+    Bids below the lowest price match no line item and are lost entirely.
+    """
+
+    def __init__(self, name, prices):
+        """
+        Args:
+          name (str): a label for the ladder in reports
+          prices (arr): the ladder's prices in micro-amounts
+        """
+        self.name = name
+        self.prices = sorted(prices)
+        self.num_bids = 0
+        self.bid_micro_amount = 0
+        self.lost_micro_amount = 0
+        if numpy is not None:
+            self.price_index = numpy.asarray(self.prices, dtype=numpy.int64)
+
+    @property
+    def num_line_items(self):
+        return len(self.prices)
+
+    @property
+    def lost_ratio(self):
+        if not self.bid_micro_amount:
+            return 0.0
+        return float(self.lost_micro_amount) / self.bid_micro_amount
+
+    def add(self, bids):
+        """
+        Replays a chunk of bids.
+
+        Args:
+          bids (arr): bids in micro-amounts, as from iter_bid_chunks
+        """
+        if numpy is not None:
+            bids = numpy.asarray(bids, dtype=numpy.int64)
+            positions = numpy.searchsorted(self.price_index, bids,
+                                           side='right') - 1
+            kept = numpy.where(positions >= 0,
+                               self.price_index[numpy.maximum(positions, 0)], 0)
+            self.num_bids += len(bids)
+            self.bid_micro_amount += int(bids.sum())
+            self.lost_micro_amount += int((bids - kept).sum())
+            return
+
+        prices = self.prices
+        for bid in bids:
+            position = bisect.bisect_right(prices, bid) - 1
+            kept = prices[position] if position >= 0 else 0
+            self.num_bids += 1
+            self.bid_micro_amount += bid
+            self.lost_micro_amount += bid - kept
+
+
+def replay_bids(chunks, ladders):
+    """
+    Replays every chunk of bids against every ladder, reading the log once.
+
+    Args:
+      chunks (iterable): chunks of bids in micro-amounts
+      ladders (arr): an array of LadderReplay objects
+    Returns:
+      the ladders
+    """
+    for chunk in chunks:
+        for ladder in ladders:
+            ladder.add(chunk)
+    return ladders
+
+
+def pick_ladder(ladders, tolerance):
+    """
+    Returns the ladder with the fewest line items whose lost revenue share is
+    at most `tolerance`, or None if none is.
+    """
+    for ladder in sorted(ladders, key=lambda ladder: ladder.num_line_items):
+        if ladder.lost_ratio <= tolerance:
+            return ladder
+    return None
+
+
+def build_uniform_ladders(increments, min_cpm, max_cpm, precision):
+    """
+    Builds a LadderReplay per increment with tasks.price_utils.get_prices_array.
+    """
+    return [
+        LadderReplay(
+            '${0} increments'.format(micro_amount_to_str(
+                num_to_micro_amount(increment, precision), precision)),
+            get_prices_array({
+                'precision': precision,
+                'min': min_cpm,
+                'max': max_cpm,
+                'increment': increment,
+            }))
+        for increment in increments
+    ]
+
+
+def main(argv=None):
+    """
+    Replay a bid log against candidate price ladders and report line item count
+    against revenue lost to bucket rounding.
+    """
+    parser = argparse.ArgumentParser(
+        description='Measure the revenue each price granularity loses to '
+                    'bucket rounding on a bid log.')
+    parser.add_argument('bid_log',
+                        help='a CSV or Parquet file with bidder and cpm columns')
+    parser.add_argument('--bidder', help='only replay this bidder\'s bids')
+    parser.add_argument('--increments', type=float, nargs='+',
+                        default=[0.01, 0.05, 0.10],
+                        help='the ladder increments to compare')
+    parser.add_argument('--min', type=float, default=0.0, dest='min_cpm')
+    parser.add_argument('--max', type=float, default=20.0, dest='max_cpm')
+    parser.add_argument('--precision', type=int, default=2)
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='the largest acceptable share of revenue lost')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    ladders = build_uniform_ladders(args.increments, args.min_cpm, args.max_cpm,
+                                    args.precision)
+    replay_bids(iter_bid_chunks(args.bid_log, args.chunk_size, args.bidder),
+                ladders)
+
+    logger.info(u'Replayed {0} bids.'.format(ladders[0].num_bids))
+    for ladder in ladders:
+        lost, = micro_amounts_to_strs([ladder.lost_micro_amount])
+        logger.info(u'{name}: {count} line items, {lost} lost ({ratio:.3%})'
+                    .format(name=ladder.name, count=ladder.num_line_items,
+                            lost=lost, ratio=ladder.lost_ratio))
+
+    best = pick_ladder(ladders, args.tolerance)
+    if best is None:
+        logger.info(u'No ladder loses at most {0:.3%} of revenue.'.format(
+            args.tolerance))
+    else:
+        logger.info(u'Smallest ladder within tolerance: {0}.'.format(best.name))
+    return best
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import logging
+import os
+import sys
+from builtins import input
+from datetime import datetime, timedelta
+
+import dfp.archive_orders
+import dfp.delete_custom_targeting
+import dfp.get_advertisers
+import dfp.get_custom_targeting
+import dfp.get_line_items
+import dfp.get_orders
+from dfp.exceptions import BadSettingException, DFPObjectNotFound
+
+# Configure logging.
+if 'DISABLE_LOGGING' in os.environ and os.environ['DISABLE_LOGGING'] == 'true':
+    logging.disable(logging.CRITICAL)
+    logging.getLogger('googleads').setLevel(logging.CRITICAL)
+else:
+    FORMAT = '%(message)s'
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format=FORMAT)
+    logging.getLogger('googleads').setLevel(logging.ERROR)
+
+logger = logging.getLogger(__name__)
+
+# The targeting keys this tool creates values for.
+PREBID_TARGETING_KEYS = ['hb_pb', 'hb_bidder']
+
+
+def build_date_time_value(date_time):
+    """
+    Returns a DFP DateTimeValue for a naive UTC datetime.
+    """
+    return {
+        'xsi_type': 'DateTimeValue',
+        'value': {
+            'date': {
+                'year': date_time.year,
+                'month': date_time.month,
+                'day': date_time.day,
+            },
+            'hour': date_time.hour,
+            'minute': date_time.minute,
+            'second': date_time.second,
+            'timeZoneId': 'UTC',
+        }
+    }
+
+
+def find_orders(name_like=None, advertiser_id=None, older_than_days=None):
+    """
+    Finds unarchived orders matching every given filter.
+
+    Args:
+      name_like (str): a PQL LIKE pattern for the order name, e.g.
+        'Test Order:%'
+      advertiser_id (int): only orders of this advertiser
+      older_than_days (int): only orders not modified for this many days
+    Returns:
+      an array of dicts with the 'id' and 'name' of each order
+    """
+    conditions = []
+    values = []
+    if name_like is not None:
+        conditions.append('name LIKE :name')
+        values.append({
+            'key': 'name',
+            'value': {
+                'xsi_type': 'TextValue',
+                'value': name_like
+            }
+        })
+    if advertiser_id is not None:
+        conditions.append('advertiserId = :advertiserId')
+        values.append({
+            'key': 'advertiserId',
+            'value': {
+                'xsi_type': 'NumberValue',
+                'value': advertiser_id
+            }
+        })
+    if older_than_days is not None:
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        conditions.append('lastModifiedDateTime < :cutoff')
+        values.append({
+            'key': 'cutoff',
+            'value': build_date_time_value(cutoff)
+        })
+
+    if not conditions:
+        raise BadSettingException(
+            'Refusing to select every order; give at least one filter.')
+
+    orders = dfp.get_orders.iter_orders(' AND '.join(conditions), values,
+                                        fields=['id', 'name', 'isArchived'])
+    return [{'id': order['id'], 'name': order['name']}
+            for order in orders if not order['isArchived']]
+
+
+def find_unreferenced_values(key_names=PREBID_TARGETING_KEYS,
+                             value_names=None):
+    """
+    Finds the values of targeting keys that no unarchived line item targets.
+
+    Args:
+      key_names (arr): the names of the targeting keys
+      value_names (dict): if set, maps a key name to the names of the only
+        values of that key to consider
+    Returns:
+      a dict mapping each key name to a tuple: the key ID (or None if the key
+        does not exist) and an array of unreferenced value objects
+    """
+    candidates = {}
+    for key_name in key_names:
+        key_id = dfp.get_custom_targeting.get_key_id_by_name(key_name)
+        if key_id is None:
+            candidates[key_name] = (None, [])
+            continue
+        values = (
+            dfp.get_custom_targeting.get_targeting_by_key_name(key_name) or [])
+        if value_names is not None:
+            names = value_names.get(key_name) or set()
+            values = [value for value in values if value['name'] in names]
+        candidates[key_name] = (key_id, values)
+
+    key_ids = set(key_id for key_id, values in candidates.values() if values)
+    if not key_ids:
+        return candidates
+
+    # One streamed scan over every live line item for all keys, keeping only
+    # targeting.
+    referenced_value_ids = set()
+    for line_item in dfp.get_line_items.iter_line_items(
+            query='isArchived = false', fields=['targeting']):
+        value_ids = dfp.get_line_items.get_criteria_value_ids(line_item)
+        for key_id in key_ids:
+            referenced_value_ids.update(value_ids.get(key_id, []))
+
+    return dict(
+        (key_name, (key_id, [value for value in values
+                             if value['id'] not in referenced_value_ids]))
+        for key_name, (key_id, values) in candidates.items())
+
+
+def delete_unreferenced_values(key_names=PREBID_TARGETING_KEYS,
+                               value_names=None):
+    """
+    Deletes every value of the given targeting keys that no unarchived line
+    item targets.
+
+    Args:
+      key_names (arr): the names of the targeting keys to clean up
+      value_names (dict): if set, maps a key name to the names of the only
+        values of that key to delete
+    Returns:
+      an integer: the number of values deleted
+    """
+    unreferenced = find_unreferenced_values(key_names, value_names)
+    num_deleted = 0
+    for key_name in key_names:
+        key_id, values = unreferenced[key_name]
+        if values:
+            num_deleted += dfp.delete_custom_targeting.delete_targeting_values(
+                key_id, [value['id'] for value in values])
+    return num_deleted
+
+
+def main(argv=None):
+    """
+    Find stale orders and unused Prebid targeting values, ask for
+    confirmation, and then archive and delete them.
+    """
+    parser = argparse.ArgumentParser(
+        description='Archive orders and delete unused Prebid targeting values.')
+    parser.add_argument('--name-like',
+                        help='archive orders whose name matches this PQL '
+                             'LIKE pattern, e.g. "Test Order:%%"')
+    parser.add_argument('--advertiser',
+                        help='archive orders of the advertiser with this name')
+    parser.add_argument('--older-than-days', type=int,
+                        help='archive orders not modified for this many days')
+    parser.add_argument('--targeting-values', action='store_true',
+                        help='delete hb_pb and hb_bidder values that no '
+                             'unarchived line item targets')
+    args = parser.parse_args(argv)
+
+    archive = (args.name_like is not None or args.advertiser is not None or
+               args.older_than_days is not None)
+    if not archive and not args.targeting_values:
+        parser.error('nothing to clean up; give an order filter and/or '
+                     '--targeting-values')
+
+    orders = []
+    if archive:
+        advertiser_id = None
+        if args.advertiser is not None:
+            advertisers = dfp.get_advertisers.get_advertisers_by_name(
+                args.advertiser)
+            if len(advertisers) != 1:
+                raise DFPObjectNotFound(
+                    'Expected one advertiser named {0}, found {1}.'.format(
+                        args.advertiser, len(advertisers)))
+            advertiser_id = advertisers[0]['id']
+
+        orders = find_orders(args.name_like, advertiser_id,
+                             args.older_than_days)
+        logger.info(u'Going to archive {0} orders:'.format(len(orders)))
+        for order in orders:
+            logger.info(u'  {0}'.format(order['name']))
+
+    if args.targeting_values:
+        logger.info(u'Going to delete hb_pb and hb_bidder values that no '
+                    u'unarchived line item targets.')
+
+    ok = input('Is this correct? (y/n)\n')
+
+    if ok != 'y':
+        logger.info('Exiting.')
+        return
+
+    if orders:
+        dfp.archive_orders.archive_orders([order['id'] for order in orders])
+
+    # Archive first, so the values only those orders used are now unused.
+    if args.targeting_values:
+        delete_unreferenced_values()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import bisect
+import logging
+import math
+import os
+import random
+import sys
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+
+import settings
+from dfp.exceptions import BadSettingException, MissingSettingException
+from tasks.add_new_prebid_partner import check_price_buckets_validity
+from tasks.bid_replay import iter_bid_chunks
+from tasks.price_utils import (
+    DEFAULT_PRECISION,
+    get_prices_array,
+    micro_amounts_to_strs,
+)
+
+# Configure logging.
+if 'DISABLE_LOGGING' in os.environ and os.environ['DISABLE_LOGGING'] == 'true':
+    logging.disable(logging.CRITICAL)
+else:
+    FORMAT = '%(message)s'
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format=FORMAT)
+
+logger = logging.getLogger(__name__)
+
+# Prebid's built-in price granularities. See:
+# https://github.com/prebid/Prebid.js/blob/8fed3d7aaa814e67ca3efc103d7d306cab8c692c/src/cpmBucketManager.js
+PREBID_GRANULARITIES = {
+    'low': {'buckets': [{'max': 5, 'increment': 0.5}]},
+    'medium': {'buckets': [{'max': 20, 'increment': 0.1}]},
+    'high': {'buckets': [{'max': 20, 'increment': 0.01}]},
+    'auto': {'buckets': [
+        {'max': 5, 'increment': 0.05},
+        {'max': 10, 'increment': 0.1},
+        {'max': 20, 'increment': 0.5},
+    ]},
+    'dense': {'buckets': [
+        {'max': 3, 'increment': 0.01},
+        {'max': 8, 'increment': 0.05},
+        {'max': 20, 'increment': 0.5},
+    ]},
+}
+
+# How many unmatched hb_pb values to list in the report.
+MAX_REPORTED_VALUES = 20
+
+
+def js_to_fixed(value, digits):
+    """
+    Formats a float like JavaScript's Number.prototype.toFixed: the exact
+    binary value, rounded to `digits` places with ties away from zero.
+    """
+    value = float(value)
+    # Python's formatting is also exact but breaks ties to even. A tie needs
+    # value * 2 ** (digits + 1) to be an integer, which is cheap to check.
+    if (value * (1 << (digits + 1))).is_integer():
+        step = Decimal(1).scaleb(-digits)
+        return str(Decimal(value).quantize(step, rounding=ROUND_HALF_UP))
+    return '%.*f' % (digits, value)
+
+
+def to_prebid_config(price_buckets):
+    """
+    Returns the Prebid custom price granularity matching a
+    PREBID_PRICE_BUCKETS setting.
+    """
+    if 'buckets' in price_buckets:
+        return price_buckets
+    return {'buckets': [{
+        'precision': price_buckets['precision'],
+        'min': price_buckets['min'],
+        'max': price_buckets['max'],
+        'increment': price_buckets['increment'],
+    }]}
+
+
+class CpmBucketIndex(object):
+    """
+    Maps CPMs to the hb_pb strings Prebid's cpmBucketManager emits for a price
+    granularity, finding each CPM's bucket by bisection.
+
+    This follows Prebid's rules rather than our settings: a bucket starts
+    where the previous one ends (the first at 0) whatever its `min`, CPMs
+    above the cap get the last bucket's max, and every price is scaled by the
+    granularity multiplier (used for currency conversion).
+    """
+
+    def __init__(self, config, granularity_multiplier=1):
+        """
+        Args:
+          config (dict): a Prebid price granularity, {'buckets': [...]}
+          granularity_multiplier (number)
+        """
+        buckets = config.get('buckets')
+        if not isinstance(buckets, list) or not buckets or not all(
+                bucket.get('max') and bucket.get('increment')
+                for bucket in buckets):
+            raise BadSettingException(
+                'Prebid ignores price granularities whose buckets do not all '
+                'have a max and an increment.')
+
+        maxes = [bucket['max'] for bucket in buckets]
+        if maxes != sorted(maxes):
+            raise BadSettingException(
+                'Price granularity buckets must be in ascending order.')
+
+        self.multiplier = granularity_multiplier
+        self.buckets = []
+        bucket_min = 0
+        for bucket in buckets:
+            self.buckets.append((
+                bucket_min,
+                bucket['increment'],
+                bucket.get('precision', DEFAULT_PRECISION),
+            ))
+            bucket_min = bucket['max']
+        self.maxes = [bucket_max * granularity_multiplier for bucket_max in maxes]
+
+        last = buckets[-1]
+        self.cap = self.maxes[-1]
+        self.cap_string = js_to_fixed(last['max'] * granularity_multiplier,
+                                      last.get('precision', DEFAULT_PRECISION))
+
+    def get_hb_pb(self, cpm):
+        """
+        Returns the hb_pb string Prebid sets for a CPM, or '' if it sets none.
+
+        Args:
+          cpm (float)
+        Returns:
+          a string
+        """
+        if cpm > self.cap:
+            return self.cap_string
+
+        index = bisect.bisect_left(self.maxes, cpm)
+        bucket_min, increment, precision = self.buckets[index]
+        bucket_min *= self.multiplier
+        if cpm < bucket_min:
+            return ''
+        increment *= self.multiplier
+
+        # Prebid scales by 10 ** (precision + 2) before flooring, to avoid
+        # results like 4.01 / 0.01 = 400.99999999999994.
+        power = math.pow(10, precision + 2)
+        cpm_to_floor = ((cpm * power) - (bucket_min * power)) / (increment * power)
+        cpm_target = math.floor(cpm_to_floor) * increment + bucket_min
+        cpm_target = float(js_to_fixed(cpm_target, 10))
+        return js_to_fixed(cpm_target, precision)
+
+
+def find_unmatched_cpms(index, cpms, hb_pb_values):
+    """
+    Finds the CPMs whose hb_pb string has no line item.
+
+    Args:
+      index (CpmBucketIndex)
+      cpms (iterable): CPMs in currency units
+      hb_pb_values (set): the hb_pb values our line items target
+    Returns:
+      a tuple: the number of CPMs checked and a Counter of unmatched hb_pb
+        strings
+    """
+    num_checked = 0
+    unmatched = Counter()
+    get_hb_pb = index.get_hb_pb
+    for cpm in cpms:
+        num_checked += 1
+        hb_pb = get_hb_pb(cpm)
+        if hb_pb and hb_pb not in hb_pb_values:
+            unmatched[hb_pb] += 1
+    return num_checked, unmatched
+
+
+def iter_sample_cpms(prices, num_samples, seed=None):
+    """
+    Yields CPMs to check: every ladder price, one micro-amount either side of
+    it, and `num_samples` random CPMs up to 20% above the top price.
+    """
+    for price in prices:
+        for micro_amount in (price - 1, price, price + 1):
+            if micro_amount >= 0:
+                yield micro_amount / 1e6
+
+    generator = random.Random(seed)
+    top = prices[-1] * 1.2 / 1e6 if prices else 1.0
+    for _ in range(num_samples):
+        yield round(generator.uniform(0, top), 6)
+
+
+def main(argv=None):
+    """
+    Check that every hb_pb value Prebid can emit for a price granularity has
+    a line item in the ladder from PREBID_PRICE_BUCKETS.
+    """
+    parser = argparse.ArgumentParser(
+        description='Check Prebid hb_pb values against the line item ladder.')
+    parser.add_argument('--granularity', choices=sorted(PREBID_GRANULARITIES),
+                        help='a built-in Prebid granularity; by default, the '
+                             'custom granularity matching PREBID_PRICE_BUCKETS')
+    parser.add_argument('--multiplier', type=float, default=1,
+                        help='the granularity multiplier, for currency '
+                             'conversion')
+    parser.add_argument('--samples', type=int, default=1000000,
+                        help='the number of random CPMs to check')
+    parser.add_argument('--bid-log',
+                        help='check the CPMs of this CSV or Parquet bid log '
+                             'instead of random ones')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    price_buckets = getattr(settings, 'PREBID_PRICE_BUCKETS', None)
+    if price_buckets is None:
+        raise MissingSettingException('PREBID_PRICE_BUCKETS')
+    check_price_buckets_validity(price_buckets)
+
+    prices = get_prices_array(price_buckets)
+    # The same strings create_line_item_configs gives the line items.
+    hb_pb_values = set(micro_amounts_to_strs(prices))
+
+    if args.granularity is not None:
+        config = PREBID_GRANULARITIES[args.granularity]
+    else:
+        config = to_prebid_config(price_buckets)
+    index = CpmBucketIndex(config, args.multiplier)
+
+    if args.bid_log is not None:
+        cpms = (micro_amount / 1e6 for chunk in iter_bid_chunks(args.bid_log)
+                for micro_amount in chunk)
+    else:
+        cpms = iter_sample_cpms(prices, args.samples, args.seed)
+
+    num_checked, unmatched = find_unmatched_cpms(index, cpms, hb_pb_values)
+
+    logger.info(u'Checked {0} CPMs against {1} line items.'.format(
+        num_checked, len(prices)))
+    if not unmatched:
+        logger.info(u'Every hb_pb value has a line item.')
+        return 0
+
+    logger.info(u'{0} CPMs map to {1} hb_pb values with no line item:'.format(
+        sum(unmatched.values()), len(unmatched)))
+    for hb_pb, count in unmatched.most_common(MAX_REPORTED_VALUES):
+        logger.info(u'  hb_pb={0}: {1} CPMs'.format(hb_pb, count))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
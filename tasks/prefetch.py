@@ -0,0 +1,111 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# Lookups run on threads named with this prefix, so their log messages can be
+# told apart.
+THREAD_NAME_PREFIX = 'prefetch'
+
+# How many lookups to run at once.
+DEFAULT_MAX_WORKERS = 4
+
+
+class DeferredLogFilter(logging.Filter):
+    """
+    Holds back the log records of prefetch threads, so they do not interrupt
+    a prompt, until they are replayed.
+    """
+
+    def __init__(self):
+        super(DeferredLogFilter, self).__init__()
+        self.records = []
+        self.record_ids = set()
+
+    def filter(self, record):
+        if record.threadName.startswith(THREAD_NAME_PREFIX):
+            # Every handler sees the record, but it is replayed once.
+            if id(record) not in self.record_ids:
+                self.record_ids.add(id(record))
+                self.records.append(record)
+            return False
+        return True
+
+
+class Prefetch(object):
+    """
+    Runs read-only lookups in background threads while the main thread does
+    something else, such as waiting for confirmation.
+
+    Results are fetched with `get`, which falls back to calling the function
+    directly when nothing was prefetched under that name, so code taking a
+    Prefetch works the same with an empty one.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.executor = None
+        self.futures = {}
+        self.log_filter = None
+        self.lock = Lock()
+
+    def submit(self, name, function, *args, **kwargs):
+        """
+        Starts `function(*args, **kwargs)` in the background.
+
+        Args:
+          name (hashable): what to `get` the result by
+          function (function)
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=THREAD_NAME_PREFIX)
+            self.log_filter = DeferredLogFilter()
+            for handler in logging.getLogger().handlers:
+                handler.addFilter(self.log_filter)
+        self.futures[name] = self.executor.submit(function, *args, **kwargs)
+
+    def __contains__(self, name):
+        return name in self.futures
+
+    def get(self, name, function, *args, **kwargs):
+        """
+        Returns the prefetched result for `name`, waiting for it if needed, or
+        `function(*args, **kwargs)` if nothing was prefetched under `name`.
+        Errors from the lookup are raised here.
+        """
+        self.flush_logs()
+        future = self.futures.get(name)
+        if future is None:
+            return function(*args, **kwargs)
+        return future.result()
+
+    def flush_logs(self):
+        """
+        Stops holding back log records, and logs the ones held so far.
+        """
+        with self.lock:
+            log_filter, self.log_filter = self.log_filter, None
+        if log_filter is None:
+            return
+        for handler in logging.getLogger().handlers:
+            handler.removeFilter(log_filter)
+        for record in log_filter.records:
+            logging.getLogger(record.name).handle(record)
+
+    def close(self):
+        """
+        Cancels the lookups that have not started. Lookups already running are
+        left to finish, and their results are dropped.
+        """
+        if self.log_filter is not None:
+            for handler in logging.getLogger().handlers:
+                handler.removeFilter(self.log_filter)
+            self.log_filter = None
+        for future in self.futures.values():
+            future.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
@@ -0,0 +1,171 @@
+import logging
+import math
+from collections import namedtuple
+
+from dfp.batch import get_batch_size_bounds
+from dfp.pagination import get_page_size
+
+logger = logging.getLogger(__name__)
+
+
+class PlannedCalls(namedtuple('PlannedCalls',
+                              ['method', 'num_calls', 'num_items'])):
+    """
+    A run of identical API calls a setup will make: `num_calls` calls to
+    `method`, each sending `num_items` objects.
+    """
+    __slots__ = ()
+
+
+class SetupEstimate(namedtuple('SetupEstimate',
+                               ['calls', 'seconds', 'unknown_keys'])):
+    """
+    The calls a setup will make, how long they should take, and the targeting
+    keys whose existing values we do not know (so all their values were
+    counted as new).
+    """
+    __slots__ = ()
+
+    @property
+    def num_calls(self):
+        return sum(planned.num_calls for planned in self.calls)
+
+    @property
+    def num_created(self):
+        """
+        The number of objects the setup will create.
+        """
+        return sum(planned.num_calls * planned.num_items
+                   for planned in self.calls if '.create' in planned.method)
+
+
+def plan_batches(method, num_items, batch_size):
+    """
+    Plans the calls that create `num_items` objects `batch_size` at a time.
+    """
+    num_full_batches, remainder = divmod(num_items, batch_size)
+    return [
+        PlannedCalls(method, num_full_batches, batch_size),
+        PlannedCalls(method, 1 if remainder else 0, remainder),
+    ]
+
+
+def plan_setup_calls(history, num_placements, num_ad_units, criteria_values,
+                     num_line_items, num_creatives, is_native):
+    """
+    Lists the API calls tasks.add_new_prebid_partner.setup_partner will make,
+    in order, without making any.
+
+    Args:
+      history (CallHistory): for the targeting values seen in earlier runs
+      num_placements (int)
+      num_ad_units (int)
+      criteria_values (dict): targeting key names mapped to the value names
+        the line items will target, e.g. {'hb_pb': ['0.00', ...]}
+      num_line_items (int)
+      num_creatives (int)
+      is_native (bool)
+    Returns:
+      a tuple: an array of PlannedCalls and an array of the targeting key names
+        whose existing values are unknown
+    """
+    page_size = get_page_size()
+    # Batches start at their initial size, then grow while GAM keeps up and
+    # shrink when it does not, so this only estimates the create calls.
+    _, _, batch_size = get_batch_size_bounds()
+    num_keys = len(criteria_values)
+    num_value_pages = 0
+    value_calls = []
+    unknown_keys = []
+    for key_name in sorted(criteria_values):
+        value_names = set(criteria_values[key_name])
+        existing = history.get_values(key_name)
+        if existing is None:
+            num_new_values = len(value_names)
+            num_value_pages += 1
+            unknown_keys.append(key_name)
+        else:
+            num_new_values = len(value_names - existing)
+            num_value_pages += max(
+                int(math.ceil(len(existing) / float(page_size))), 1)
+        # Each key's missing values are created together.
+        value_calls.extend(plan_batches(
+            'CustomTargetingService.createCustomTargetingValues',
+            num_new_values, batch_size))
+
+    calls = [
+        PlannedCalls('UserService.getUsersByStatement', 1, 1),
+        PlannedCalls('PlacementService.getPlacementsByStatement',
+                     num_placements, 1),
+        PlannedCalls('InventoryService.getAdUnitsByStatement', num_ad_units, 1),
+        PlannedCalls('CompanyService.getCompaniesByStatement', 1, 1),
+        PlannedCalls('OrderService.getOrdersByStatement', 1, 1),
+        PlannedCalls('OrderService.createOrders', 1, 1),
+        # Each key is looked up to get or create it, then twice more while
+        # fetching its values.
+        PlannedCalls('CustomTargetingService.getCustomTargetingKeysByStatement',
+                     3 * num_keys, 1),
+        PlannedCalls(
+            'CustomTargetingService.getCustomTargetingValuesByStatement',
+            num_value_pages, 1),
+    ]
+    calls.extend(value_calls)
+    calls.extend(plan_batches('LineItemService.createLineItems',
+                              num_line_items, batch_size))
+    if not is_native:
+        calls.append(PlannedCalls('CreativeService.getCreativesByStatement',
+                                  1, 1))
+    calls.extend(plan_batches('CreativeService.createCreatives',
+                              num_creatives, batch_size))
+    calls.extend(plan_batches(
+        'LineItemCreativeAssociationService.'
+        'createLineItemCreativeAssociations',
+        num_line_items * num_creatives, batch_size))
+    return [planned for planned in calls if planned.num_calls], unknown_keys
+
+
+def estimate_setup(history, *args, **kwargs):
+    """
+    Plans a setup's API calls (see plan_setup_calls) and estimates their wall
+    time from the latencies in the history.
+
+    Returns:
+      a SetupEstimate
+    """
+    calls, unknown_keys = plan_setup_calls(history, *args, **kwargs)
+    seconds = sum(planned.num_calls *
+                  history.estimate(planned.method, planned.num_items)
+                  for planned in calls)
+    return SetupEstimate(calls, seconds, unknown_keys)
+
+
+def format_duration(seconds):
+    """
+    Returns a rough, human-readable duration, e.g. '4 min 10 s'.
+    """
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return u'{0} s'.format(seconds)
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return u'{0} min {1} s'.format(minutes, seconds)
+    hours, minutes = divmod(minutes, 60)
+    return u'{0} h {1} min'.format(hours, minutes)
+
+
+def log_estimate(estimate):
+    """
+    Logs a pre-flight report of a SetupEstimate.
+    """
+    logger.info(u'Expecting {calls} API calls creating {created} objects, '
+                u'taking about {duration}:'.format(
+                    calls=estimate.num_calls, created=estimate.num_created,
+                    duration=format_duration(estimate.seconds)))
+    for planned in estimate.calls:
+        logger.info(u'  {method}: {num_calls} x {num_items} item(s)'.format(
+            method=planned.method, num_calls=planned.num_calls,
+            num_items=planned.num_items))
+    if estimate.unknown_keys:
+        logger.info(u'No values are recorded yet for {0}, so all of their '
+                    u'values were counted as new.'.format(
+                        u', '.join(estimate.unknown_keys)))
@@ -0,0 +1,227 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+from dfp.exceptions import BadSettingException
+from tasks.bid_replay import iter_bid_chunks, numpy
+from tasks.price_utils import (
+    DEFAULT_PRECISION,
+    get_prices_summary_string,
+    micro_amount_to_num,
+    micro_amounts_to_strs,
+    num_to_micro_amount,
+)
+
+# Configure logging.
+if 'DISABLE_LOGGING' in os.environ and os.environ['DISABLE_LOGGING'] == 'true':
+    logging.disable(logging.CRITICAL)
+else:
+    FORMAT = '%(message)s'
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format=FORMAT)
+
+logger = logging.getLogger(__name__)
+
+
+class BidHistogram(object):
+    """
+    Bid counts and bid totals per price step, from 0 up to a maximum price.
+    The last step also holds every bid above the maximum, since Prebid caps
+    those at the top bucket.
+    """
+
+    def __init__(self, step_micro_amount, max_micro_amount):
+        """
+        Args:
+          step_micro_amount (int): the width of a step, e.g. 10000 for $0.01
+          max_micro_amount (int): the highest price a bucket may start at
+        """
+        self.step = step_micro_amount
+        self.prices = list(range(0, max_micro_amount + 1, step_micro_amount))
+        self.counts = [0] * len(self.prices)
+        self.totals = [0] * len(self.prices)
+
+    def add(self, bids):
+        """
+        Adds a chunk of bids in micro-amounts.
+        """
+        last = len(self.prices) - 1
+        if numpy is not None:
+            bids = numpy.asarray(bids, dtype=numpy.int64)
+            steps = numpy.minimum(bids // self.step, last)
+            counts = numpy.bincount(steps, minlength=last + 1)
+            totals = numpy.bincount(steps, weights=bids, minlength=last + 1)
+            for index in numpy.flatnonzero(counts):
+                self.counts[index] += int(counts[index])
+                self.totals[index] += int(totals[index])
+            return
+
+        for bid in bids:
+            index = min(bid // self.step, last)
+            self.counts[index] += 1
+            self.totals[index] += bid
+
+
+def optimize_prices(histogram, num_line_items):
+    """
+    Chooses the bucket prices that minimize the revenue lost to rounding bids
+    down to a bucket, for at most `num_line_items` buckets.
+
+    Every bid between two chosen prices is rounded down to the lower one.
+    Prebid's first custom bucket always starts at 0, so 0 is always the
+    lowest price. This is solved exactly with
+    dynamic programming over the histogram's steps; because the rounding loss
+    of a run of steps satisfies the quadrangle inequality, each layer of the
+    table is filled by divide and conquer in O(steps * log(steps)).
+
+    Args:
+      histogram (BidHistogram)
+      num_line_items (int): the most bucket prices to choose
+    Returns:
+      a tuple: an array of prices in micro-amounts and the expected loss in
+        micro-amounts
+    """
+    if num_line_items < 1:
+        raise BadSettingException('The line item budget must be at least 1.')
+
+    prices = histogram.prices
+    num_steps = len(prices)
+
+    # Prefix sums, so the loss of any run of steps is O(1).
+    count_sums = [0] * (num_steps + 1)
+    total_sums = [0] * (num_steps + 1)
+    for index in range(num_steps):
+        count_sums[index + 1] = count_sums[index] + histogram.counts[index]
+        total_sums[index + 1] = total_sums[index] + histogram.totals[index]
+
+    def rounding_loss(start, end):
+        # Bids in steps [start, end) all round down to prices[start].
+        if start == end:
+            return 0
+        return ((total_sums[end] - total_sums[start]) -
+                prices[start] * (count_sums[end] - count_sums[start]))
+
+    # The first price must be the lowest step, so with no prices only the
+    # empty prefix is possible.
+    losses = [0] + [None] * num_steps
+    choices = []
+
+    for _ in range(min(num_line_items, num_steps)):
+        next_losses = [0] * (num_steps + 1)
+        starts = [0] * (num_steps + 1)
+
+        def fill(low, high, start_low, start_high):
+            if low > high:
+                return
+            middle = (low + high) // 2
+            best_loss = None
+            best_start = start_low
+            for start in range(start_low, min(middle, start_high) + 1):
+                if losses[start] is None:
+                    continue
+                loss = losses[start] + rounding_loss(start, middle)
+                if best_loss is None or loss < best_loss:
+                    best_loss = loss
+                    best_start = start
+            next_losses[middle] = best_loss
+            starts[middle] = best_start
+            fill(low, middle - 1, start_low, best_start)
+            fill(middle + 1, high, best_start, start_high)
+
+        fill(0, num_steps, 0, num_steps)
+        losses = next_losses
+        choices.append(starts)
+
+    # Walk the choices back from the last step.
+    chosen = []
+    end = num_steps
+    for starts in reversed(choices):
+        start = starts[end]
+        if start < end:
+            chosen.append(prices[start])
+        end = start
+
+    return sorted(chosen), losses[num_steps]
+
+
+def to_custom_price_buckets(prices, precision=DEFAULT_PRECISION):
+    """
+    Builds a Prebid custom price granularity whose hb_pb values are exactly
+    the given prices: one bucket per gap, merged where gaps are equal.
+
+    Args:
+      prices (arr): sorted bucket prices in micro-amounts, at least two
+      precision (int)
+    Returns:
+      a dict: {'buckets': [...]} for Prebid's customPriceBucket and for
+        PREBID_PRICE_BUCKETS
+    """
+    if len(prices) < 2:
+        raise BadSettingException(
+            'A custom price granularity needs at least two prices.')
+
+    ranges = []
+    for low, high in zip(prices, prices[1:]):
+        increment = high - low
+        if ranges and ranges[-1][2] == increment:
+            ranges[-1][1] = high
+        else:
+            ranges.append([low, high, increment])
+
+    return {
+        'buckets': [
+            {
+                'precision': precision,
+                'min': micro_amount_to_num(low),
+                'max': micro_amount_to_num(high),
+                'increment': micro_amount_to_num(increment),
+            }
+            for low, high, increment in ranges
+        ]
+    }
+
+
+def main(argv=None):
+    """
+    Build a histogram from a bid log and print the custom price granularity
+    that loses the least revenue within a line item budget.
+    """
+    parser = argparse.ArgumentParser(
+        description='Find the price buckets that lose the least revenue to '
+                    'rounding for a line item budget.')
+    parser.add_argument('bid_log',
+                        help='a CSV or Parquet file with bidder and cpm columns')
+    parser.add_argument('--line-items', type=int, required=True,
+                        help='the most line items (price buckets) to use')
+    parser.add_argument('--bidder', help='only use this bidder\'s bids')
+    parser.add_argument('--step', type=float, default=0.01,
+                        help='the finest price difference between buckets')
+    parser.add_argument('--max', type=float, default=20.0, dest='max_cpm',
+                        help='the highest bucket price')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION)
+    args = parser.parse_args(argv)
+
+    histogram = BidHistogram(num_to_micro_amount(args.step, args.precision),
+                             num_to_micro_amount(args.max_cpm, args.precision))
+    for chunk in iter_bid_chunks(args.bid_log, bidder=args.bidder):
+        histogram.add(chunk)
+
+    prices, loss = optimize_prices(histogram, args.line_items)
+    price_buckets = to_custom_price_buckets(prices, args.precision)
+    total = sum(histogram.totals)
+
+    lost, = micro_amounts_to_strs([loss])
+    logger.info(u'{count} line items: {summary}'.format(
+        count=len(prices),
+        summary=get_prices_summary_string(prices, args.precision)))
+    logger.info(u'Expected revenue lost to rounding: {lost} ({ratio:.3%})'
+                .format(lost=lost, ratio=float(loss) / total if total else 0.0))
+    logger.info(u'Use this as Prebid\'s customPriceBucket and as '
+                u'PREBID_PRICE_BUCKETS:')
+    logger.info(json.dumps(price_buckets, indent=2))
+    return price_buckets
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,32 @@
+import numbers
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_EVEN
+
+# Micro-amounts per currency unit.
+MICROS = 10 ** 6
+
+# The price precision Prebid uses when a custom bucket does not set one.
+DEFAULT_PRECISION = 2
+
+
+def num_to_decimal(num):
+  """
+  Converts a number into the Decimal it was written as.
+
+  Args:
+    num (int, float, Decimal, Fraction, or a numpy number)
+  Returns:
+    a Decimal
+  """
+  if isinstance(num, Decimal):
+    return num
+  if isinstance(num, numbers.Integral):
+    return Decimal(int(num))
+  if isinstance(num, numbers.Rational):
+    return Decimal(num.numerator) / Decimal(num.denominator)
+  # str gives the shortest decimal that round-trips, e.g. '0.285' rather than
+  # the binary float approximation 0.28499999..., for numpy floats too.
+  return Decimal(str(num))
 
 def num_to_micro_amount(num, precision=2):
   """
@@ -6,14 +35,17 @@ def num_to_micro_amount(num, precision=2):
   and also for communicating with DFP API.
 
   Args:
-    num (float or int)
+    num (int, float, Decimal, Fraction, or a numpy number)
     precision (int)
   Returns:
     an integer: int(num * 1,000,000), rounded to the nearest
       10^(6-`precision`)
   """
-  rounding = -6 + precision
-  return int(round(num * (10 ** 6), rounding))
+  # Round the decimal the setting was written as (e.g. 0.285), not its
+  # binary float approximation (0.28499999...).
+  step = Decimal(1).scaleb(-precision)
+  amount = num_to_decimal(num).quantize(step, rounding=ROUND_HALF_EVEN)
+  return int(amount.scaleb(6))
 
 def micro_amount_to_num(micro_amount):
   """
@@ -39,18 +71,72 @@ def num_to_str(num, precision=2):
   """
   return '%.{0}f'.format(str(precision)) % num 
 
+def micro_amounts_to_strs(micro_amounts, precision=2):
+  """
+  Formats micro-amounts with `precision` decimal places using only integer
+  arithmetic, so every string is exact. Amounts halfway between two steps
+  round up.
+
+  Args:
+    micro_amounts (arr): an array of integers
+    precision (int)
+  Returns:
+    an array of strings, e.g. ['1.50'] for [1500000]
+  """
+  if precision > 6:
+    micro_amounts = [micro_amount * 10 ** (precision - 6)
+      for micro_amount in micro_amounts]
+    step = 1
+  else:
+    step = 10 ** (6 - precision)
+  half = step // 2
+
+  if precision == 0:
+    return ['%d' % ((micro_amount + half) // step)
+      for micro_amount in micro_amounts]
+
+  # divmod splits the rounded amount into its whole and fractional digits.
+  price_format = '%d.%0{0}d'.format(precision)
+  scale = 10 ** precision
+  return [price_format % divmod((micro_amount + half) // step, scale)
+    for micro_amount in micro_amounts]
+
+def micro_amount_to_str(micro_amount, precision=2):
+  """
+  Formats a micro-amount like micro_amounts_to_strs.
+
+  Args:
+    micro_amount (int)
+    precision (int)
+  Returns:
+    a string, e.g. '1.50' for 1500000
+  """
+  return micro_amounts_to_strs([micro_amount], precision)[0]
+
 def get_prices_array(price_bucket):
   """
   Creates an array of price bucket cutoffs in micro-amounts
   from a price_bucket configuration.
 
   Args:
-    price_bucket (object): the price bucket configuration
+    price_bucket (object): the price bucket configuration, or a Prebid
+      custom price granularity: {'buckets': [price_bucket, ...]}
   Returns:
     an array of integers: every price bucket cutoff from:
       int(round(price_bucket['min'] * 10**6, precision)) to 
       int(round(price_bucket['max'] * 10**6, precision))
   """
+  if 'buckets' in price_bucket:
+    # As in Prebid, each bucket starts where the previous one ends (the first
+    # at 0), whatever its min.
+    prices = set()
+    bucket_min = 0
+    for bucket in price_bucket['buckets']:
+      prices.update(get_prices_array(dict({'precision': DEFAULT_PRECISION},
+        **dict(bucket, min=bucket_min))))
+      bucket_min = bucket['max']
+    return sorted(prices)
+
   start_cpm = price_bucket['min'] if price_bucket['min'] >=0 else 0.00
   end_cpm =  price_bucket['max']
   increment = price_bucket['increment']
@@ -60,13 +146,18 @@ def get_prices_array(price_bucket):
   end_cpm_micro_amount = num_to_micro_amount(end_cpm, precision)
   increment_micro_amount = num_to_micro_amount(increment, precision)
 
-  current_cpm_micro_amount = start_cpm_micro_amount
-  prices = []
-  while current_cpm_micro_amount <= end_cpm_micro_amount:
-    prices.append(current_cpm_micro_amount)
-    current_cpm_micro_amount += increment_micro_amount
-    
-  return prices
+  return list(range(start_cpm_micro_amount, end_cpm_micro_amount + 1,
+    increment_micro_amount))
+
+def get_price_precision(price_bucket):
+  """
+  Returns the number of decimal places of a price bucket configuration's
+  prices; for custom buckets, the largest of their precisions.
+  """
+  if 'buckets' in price_bucket:
+    return max(bucket.get('precision', DEFAULT_PRECISION)
+      for bucket in price_bucket['buckets'])
+  return price_bucket['precision']
 
 def get_prices_summary_string(prices_array, precision=2):
   """
@@ -80,17 +171,26 @@ def get_prices_summary_string(prices_array, precision=2):
       micro-amounts).
   """
   if (len(prices_array) < 6):
-    summary = ', '.join(
-      [num_to_str(micro_amount_to_num(price), precision)
-        for price in prices_array])
+    summary = ', '.join(micro_amounts_to_strs(prices_array, precision))
   else:
     summary = '{0}, {1}, {2}, ... {3}, {4}, {5}'.format(
-        num_to_str(micro_amount_to_num(prices_array[0]), precision),
-        num_to_str(micro_amount_to_num(prices_array[1]), precision),
-        num_to_str(micro_amount_to_num(prices_array[2]), precision),
-        num_to_str(micro_amount_to_num(prices_array[-3]), precision),
-        num_to_str(micro_amount_to_num(prices_array[-2]), precision),
-        num_to_str(micro_amount_to_num(prices_array[-1]), precision),
+        micro_amount_to_str(prices_array[0], precision),
+        micro_amount_to_str(prices_array[1], precision),
+        micro_amount_to_str(prices_array[2], precision),
+        micro_amount_to_str(prices_array[-3], precision),
+        micro_amount_to_str(prices_array[-2], precision),
+        micro_amount_to_str(prices_array[-1], precision),
       )
 
   return summary
+
+class PriceBucket(namedtuple('PriceBucket', ['micro_amount', 'value_name'])):
+  """
+  A price bucket: its CPM in micro-amounts and its hb_pb value name,
+  e.g. PriceBucket(1500000, '1.50').
+  """
+  __slots__ = ()
+
+  @classmethod
+  def from_micro_amount(cls, micro_amount, precision=2):
+    return cls(micro_amount, micro_amount_to_str(micro_amount, precision))
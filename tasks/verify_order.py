@@ -0,0 +1,431 @@
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+import dfp.get_ad_units
+import dfp.get_custom_targeting
+import dfp.get_licas
+import dfp.get_line_items
+import dfp.get_orders
+import dfp.get_placements
+from dfp.exceptions import DFPObjectNotFound, MissingSettingException
+from tasks.add_new_prebid_partner import check_price_buckets_validity
+from tasks.price_utils import (
+    get_prices_array,
+    micro_amount_to_str,
+)
+
+# Configure logging.
+if 'DISABLE_LOGGING' in os.environ and os.environ['DISABLE_LOGGING'] == 'true':
+    logging.disable(logging.CRITICAL)
+    logging.getLogger('googleads').setLevel(logging.CRITICAL)
+else:
+    FORMAT = '%(message)s'
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format=FORMAT)
+    logging.getLogger('googleads').setLevel(logging.ERROR)
+
+logger = logging.getLogger(__name__)
+
+# Kinds of problems we report.
+MISSING_BUCKET = 'Missing hb_pb bucket'
+DUPLICATE_BUCKET = 'Duplicate hb_pb bucket'
+UNEXPECTED_BUCKET = 'Unexpected hb_pb bucket'
+WRONG_NAME = 'Wrong line item name'
+WRONG_CPM = 'Wrong CPM'
+WRONG_STATUS = 'Wrong status'
+WRONG_TARGETING = 'Wrong targeting'
+NEEDS_CREATIVES = 'Needs creatives'
+SIZE_MISMATCH = 'Size mismatch'
+
+# The line item fields we need for verification.
+LINE_ITEM_FIELDS = ['id', 'name', 'status', 'isArchived', 'costPerUnit',
+                    'targeting', 'creativePlaceholders']
+
+# The status of the line items we create.
+EXPECTED_STATUS = 'DRAFT'
+
+
+def normalize_sizes(sizes):
+    """
+    Returns a set of (width, height) integer tuples, whether the sizes came
+    from settings (strings) or from DFP (integers).
+    """
+    return set((int(size['width']), int(size['height'])) for size in sizes)
+
+
+def get_and_criteria_set(custom_targeting):
+    """
+    Returns the AND criteria set of a line item's key-value targeting, or None
+    if it is not a single AND set. DFP reads targeting back as an OR of AND
+    sets, so one AND set inside an OR counts too.
+    """
+    if not custom_targeting:
+        return None
+    if custom_targeting['logicalOperator'] == 'AND':
+        return custom_targeting
+    children = custom_targeting['children'] or []
+    if len(children) == 1 and 'logicalOperator' in children[0] and (
+            children[0]['logicalOperator'] == 'AND'):
+        return children[0]
+    return None
+
+
+def find_problems(line_items, licas, expected_prices, bidder_code,
+                  hb_pb_key_id, hb_pb_value_names, currency_code, sizes,
+                  placement_ids, ad_unit_ids, num_creatives,
+                  hb_bidder_key_id=None, hb_bidder_value_id=None,
+                  criteria=None):
+    """
+    Compares an order's line items and creative associations against the
+    setup we expect.
+
+    Args:
+      line_items (arr): line items (or projections with LINE_ITEM_FIELDS)
+      licas (arr): line item creative associations of those line items
+      expected_prices (arr): the expected price buckets in micro-amounts
+      bidder_code (str)
+      hb_pb_key_id (int)
+      hb_pb_value_names (dict): hb_pb value ID to value name
+      currency_code (str)
+      sizes (arr): expected creative sizes, or None for native line items
+      placement_ids (arr)
+      ad_unit_ids (arr)
+      num_creatives (int): the number of creatives each line item needs
+      hb_bidder_key_id (int): if set, the hb_bidder key every line item
+        should target
+      hb_bidder_value_id (int): the expected hb_bidder value
+      criteria (arr): the other key-values every line item should target
+        (settings.PREBID_CRITERIA), as (key name, value name, key ID, value
+        ID) tuples; the IDs are None if the key or value does not exist
+    Returns:
+      an array of (kind, message) tuples, empty if everything is correct
+    """
+    problems = []
+
+    expected_micro_amounts = {}
+    for price in expected_prices:
+        expected_micro_amounts[micro_amount_to_str(price)] = price
+
+    creatives_per_line_item = defaultdict(int)
+    for lica in licas:
+        if 'status' not in lica or lica['status'] in (None, 'ACTIVE'):
+            creatives_per_line_item[lica['lineItemId']] += 1
+
+    expected_sizes = normalize_sizes(sizes) if sizes is not None else None
+    expected_criteria = criteria or []
+    expected_key_ids = set([hb_pb_key_id, hb_bidder_key_id] +
+                           [key_id for _, _, key_id, _ in expected_criteria])
+    expected_placement_ids = set(placement_ids or [])
+    expected_ad_unit_ids = set(ad_unit_ids or [])
+
+    # Index line items by their hb_pb value.
+    line_items_by_price = defaultdict(list)
+    for line_item in line_items:
+        name = line_item['name']
+        value_ids = dfp.get_line_items.get_criteria_value_ids(line_item)
+
+        hb_pb_value_ids = value_ids.get(hb_pb_key_id, [])
+        if len(hb_pb_value_ids) != 1:
+            problems.append((WRONG_TARGETING,
+                u'"{0}" targets {1} hb_pb values instead of 1.'.format(
+                    name, len(hb_pb_value_ids))))
+        else:
+            price_str = hb_pb_value_names.get(hb_pb_value_ids[0])
+            line_items_by_price[price_str].append(line_item)
+
+            expected_micro_amount = expected_micro_amounts.get(price_str)
+            cost = line_item['costPerUnit']
+            if expected_micro_amount is None:
+                problems.append((UNEXPECTED_BUCKET,
+                    u'"{0}" targets hb_pb = {1}.'.format(name, price_str)))
+            else:
+                if (cost['microAmount'] != expected_micro_amount or
+                        cost['currencyCode'] != currency_code):
+                    problems.append((WRONG_CPM,
+                        u'"{0}" costs {1} {2} instead of {3} {4}.'.format(
+                            name, cost['microAmount'], cost['currencyCode'],
+                            expected_micro_amount, currency_code)))
+
+                expected_name = u'{bidder_code}: HB ${price}'.format(
+                    bidder_code=bidder_code, price=price_str)
+                if name != expected_name:
+                    problems.append((WRONG_NAME,
+                        u'"{0}" should be named "{1}".'.format(
+                            name, expected_name)))
+
+        if (hb_bidder_key_id is not None and
+                value_ids.get(hb_bidder_key_id) != [hb_bidder_value_id]):
+            problems.append((WRONG_TARGETING,
+                u'"{0}" does not target hb_bidder = {1}.'.format(
+                    name, bidder_code)))
+
+        for key_name, value_name, key_id, value_id in expected_criteria:
+            if key_id is None or value_ids.get(key_id) != [value_id]:
+                problems.append((WRONG_TARGETING,
+                    u'"{0}" does not target {1} = {2}.'.format(
+                        name, key_name, value_name)))
+        unexpected_key_ids = sorted(set(value_ids) - expected_key_ids)
+        if unexpected_key_ids:
+            problems.append((WRONG_TARGETING,
+                u'"{0}" targets unexpected keys {1}.'.format(
+                    name, unexpected_key_ids)))
+
+        if line_item['status'] != EXPECTED_STATUS:
+            problems.append((WRONG_STATUS,
+                u'"{0}" is {1} instead of {2}.'.format(
+                    name, line_item['status'], EXPECTED_STATUS)))
+        if line_item['isArchived']:
+            problems.append((WRONG_STATUS,
+                u'"{0}" is archived.'.format(name)))
+
+        targeting = line_item['targeting']
+        and_criteria_set = get_and_criteria_set(targeting['customTargeting'])
+        if and_criteria_set is None:
+            problems.append((WRONG_TARGETING,
+                u'"{0}" does not AND its key-value targeting.'.format(name)))
+        else:
+            for criteria in dfp.get_line_items.iter_custom_criteria(
+                    and_criteria_set):
+                if (criteria['keyId'] in (hb_pb_key_id, hb_bidder_key_id) and
+                        criteria['operator'] != 'IS'):
+                    problems.append((WRONG_TARGETING,
+                        u'"{0}" targets key {1} with operator {2} '
+                        u'instead of IS.'.format(
+                            name, criteria['keyId'], criteria['operator'])))
+
+        if targeting['geoTargeting'] is not None:
+            problems.append((WRONG_TARGETING,
+                u'"{0}" has geo targeting.'.format(name)))
+
+        inventory = targeting['inventoryTargeting']
+        targeted_placement_ids = set(inventory['targetedPlacementIds'] or [])
+        if targeted_placement_ids != expected_placement_ids:
+            problems.append((WRONG_TARGETING,
+                u'"{0}" targets placements {1} instead of {2}.'.format(
+                    name, sorted(targeted_placement_ids),
+                    sorted(expected_placement_ids))))
+
+        targeted_ad_unit_ids = set(ad_unit['adUnitId'] for ad_unit in
+                                   inventory['targetedAdUnits'] or [])
+        if targeted_ad_unit_ids != expected_ad_unit_ids:
+            problems.append((WRONG_TARGETING,
+                u'"{0}" targets ad units {1} instead of {2}.'.format(
+                    name, sorted(targeted_ad_unit_ids),
+                    sorted(expected_ad_unit_ids))))
+        if inventory['excludedAdUnits']:
+            problems.append((WRONG_TARGETING,
+                u'"{0}" excludes ad units.'.format(name)))
+
+        # DFP's own "Needs creatives" flag can lag for a while after setup, so
+        # we count the associations ourselves.
+        num_associated = creatives_per_line_item[line_item['id']]
+        if num_associated < num_creatives:
+            problems.append((NEEDS_CREATIVES,
+                u'"{0}" has {1} of {2} creatives.'.format(
+                    name, num_associated, num_creatives)))
+
+        if expected_sizes is not None:
+            placeholder_sizes = normalize_sizes(
+                [placeholder['size'] for placeholder in
+                 line_item['creativePlaceholders'] or []])
+            if placeholder_sizes != expected_sizes:
+                problems.append((SIZE_MISMATCH,
+                    u'"{0}" has sizes {1} instead of {2}.'.format(
+                        name, sorted(placeholder_sizes),
+                        sorted(expected_sizes))))
+
+    for price_str in expected_micro_amounts:
+        num_line_items = len(line_items_by_price.get(price_str, []))
+        if num_line_items == 0:
+            problems.append((MISSING_BUCKET,
+                u'No line item targets hb_pb = {0}.'.format(price_str)))
+        elif num_line_items > 1:
+            problems.append((DUPLICATE_BUCKET,
+                u'{0} line items target hb_pb = {1}.'.format(
+                    num_line_items, price_str)))
+
+    return problems
+
+
+def get_value_names_by_id(key_name):
+    """
+    Returns a dict of value ID to value name for a targeting key.
+    """
+    values = dfp.get_custom_targeting.get_targeting_by_key_name(key_name)
+    return dict((value['id'], value['name']) for value in values or [])
+
+
+def verify_order(order_name, placements, ad_units, sizes, bidder_code, prices,
+                 num_creatives, currency_code, hb_bidder=True,
+                 creative_template_id=None, criteria=None):
+    """
+    Loads an order and everything it should target from DFP, then checks
+    the line items against the expected setup.
+
+    Args:
+      criteria (dict): the other key-values every line item should target,
+        as in settings.PREBID_CRITERIA
+
+    Independent lookups run concurrently, and line items and creative
+    associations are streamed with concurrent paging.
+
+    Returns:
+      an array of (kind, message) tuples, empty if everything is correct
+    """
+    order = dfp.get_orders.get_order_by_name(order_name)
+    if order is None:
+        raise DFPObjectNotFound(
+            'No DFP order found with name {0}'.format(order_name))
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        line_items_future = executor.submit(
+            lambda: list(dfp.get_line_items.iter_line_items(
+                order_id=order['id'], fields=LINE_ITEM_FIELDS)))
+        hb_pb_key_future = executor.submit(
+            dfp.get_custom_targeting.get_key_id_by_name, 'hb_pb')
+        hb_pb_values_future = executor.submit(get_value_names_by_id, 'hb_pb')
+        placements_future = executor.submit(
+            dfp.get_placements.get_placement_ids_by_name, placements or [])
+        ad_units_future = executor.submit(
+            dfp.get_ad_units.get_ad_unit_ids_by_name, ad_units or [])
+
+        hb_bidder_key_id = None
+        hb_bidder_value_id = None
+        if hb_bidder:
+            hb_bidder_key_future = executor.submit(
+                dfp.get_custom_targeting.get_key_id_by_name, 'hb_bidder')
+            hb_bidder_values_future = executor.submit(
+                get_value_names_by_id, 'hb_bidder')
+            hb_bidder_key_id = hb_bidder_key_future.result()
+            for value_id, value_name in (
+                    hb_bidder_values_future.result().items()):
+                if value_name == bidder_code:
+                    hb_bidder_value_id = value_id
+
+        criteria_futures = [
+            (key_name, value_name,
+             executor.submit(dfp.get_custom_targeting.get_key_id_by_name,
+                             key_name),
+             executor.submit(get_value_names_by_id, key_name))
+            for key_name, value_name in sorted((criteria or {}).items())]
+        expected_criteria = []
+        for key_name, value_name, key_future, values_future in (
+                criteria_futures):
+            value_id = None
+            for criteria_value_id, criteria_value_name in (
+                    values_future.result().items()):
+                if criteria_value_name == value_name:
+                    value_id = criteria_value_id
+            expected_criteria.append(
+                (key_name, value_name, key_future.result(), value_id))
+
+        line_items = line_items_future.result()
+        licas = list(dfp.get_licas.iter_licas(
+            [line_item['id'] for line_item in line_items],
+            fields=['lineItemId', 'creativeId', 'status']))
+
+        return find_problems(
+            line_items=line_items,
+            licas=licas,
+            expected_prices=prices,
+            bidder_code=bidder_code,
+            hb_pb_key_id=hb_pb_key_future.result(),
+            hb_pb_value_names=hb_pb_values_future.result(),
+            currency_code=currency_code,
+            sizes=sizes if creative_template_id is None else None,
+            placement_ids=placements_future.result(),
+            ad_unit_ids=ad_units_future.result(),
+            num_creatives=num_creatives,
+            hb_bidder_key_id=hb_bidder_key_id,
+            hb_bidder_value_id=hb_bidder_value_id,
+            criteria=expected_criteria)
+
+
+def main():
+    """
+    Verify the order described by settings against what is in DFP.
+
+    Returns:
+      an array of (kind, message) tuples, empty if everything is correct
+    """
+
+    order_name = getattr(settings, 'DFP_ORDER_NAME', None)
+    if order_name is None:
+        raise MissingSettingException('DFP_ORDER_NAME')
+
+    placements = getattr(settings, 'DFP_TARGETED_PLACEMENT_NAMES', None)
+    if placements is None:
+        raise MissingSettingException('DFP_TARGETED_PLACEMENT_NAMES')
+
+    ad_units = getattr(settings, 'DFP_TARGETED_AD_UNIT_NAMES', None)
+
+    sizes = getattr(settings, 'DFP_PLACEMENT_SIZES', None)
+    if sizes is None:
+        raise MissingSettingException('DFP_PLACEMENT_SIZES')
+
+    currency_code = getattr(settings, 'DFP_CURRENCY_CODE', 'USD')
+
+    num_creatives = (
+            getattr(settings, 'DFP_NUM_CREATIVES_PER_LINE_ITEM', None) or
+            len(placements)
+    )
+
+    bidder_code = getattr(settings, 'PREBID_BIDDER_CODE', None)
+    if bidder_code is None:
+        hb_bidder = False
+        bidder_code = 'Prebid'
+    else:
+        hb_bidder = True
+
+    price_buckets = getattr(settings, 'PREBID_PRICE_BUCKETS', None)
+    if price_buckets is None:
+        raise MissingSettingException('PREBID_PRICE_BUCKETS')
+    check_price_buckets_validity(price_buckets)
+
+    creative_template_id = (settings.PREBID_NATIVE_FORMAT_ID
+                            if settings.PREBID_NATIVE else None)
+
+    # The setup adds these key-values to every line item.
+    criteria = getattr(settings, 'PREBID_CRITERIA', None) or {}
+
+    logger.info(u'Verifying order "{0}"...'.format(order_name))
+    start_time = time.time()
+    problems = verify_order(
+        order_name,
+        placements,
+        ad_units,
+        sizes,
+        bidder_code,
+        get_prices_array(price_buckets),
+        num_creatives,
+        currency_code,
+        hb_bidder,
+        creative_template_id=creative_template_id,
+        criteria=criteria)
+    elapsed = time.time() - start_time
+
+    if not problems:
+        logger.info(u'Order "{0}" looks correct ({1:.1f}s).'.format(
+            order_name, elapsed))
+        return problems
+
+    problems_by_kind = defaultdict(list)
+    for kind, message in problems:
+        problems_by_kind[kind].append(message)
+    for kind, messages in problems_by_kind.items():
+        logger.info(u'{0} ({1}):'.format(kind, len(messages)))
+        for message in messages:
+            logger.info(u'  ' + message)
+    logger.info(u'Found {0} problems in order "{1}" ({2:.1f}s).'.format(
+        len(problems), order_name, elapsed))
+
+    return problems
+
+
+if __name__ == '__main__':
+    if main():
+        sys.exit(1)
@@ -4,7 +4,9 @@ from unittest import TestCase
 from mock import MagicMock, patch
 
 import settings
+import dfp.aio
 import tasks.add_new_prebid_partner
+from benchmarks.fake_gam import FakeGAM, create_network, installed
 from dfp.exceptions import BadSettingException, MissingSettingException
 from tasks.add_new_prebid_partner import DFPValueIdGetter
 from tasks.price_utils import (
@@ -155,6 +157,37 @@ class AddNewPrebidPartnerTests(TestCase):
     with self.assertRaises(BadSettingException):
       tasks.add_new_prebid_partner.main()
 
+  def test_price_bucket_validity_custom_buckets(self, mock_dfp_client):
+    """
+    It accepts a custom price granularity and checks each bucket.
+    """
+    check_price_buckets_validity = (
+      tasks.add_new_prebid_partner.check_price_buckets_validity)
+    check_price_buckets_validity({
+      'buckets': [
+        {'min': 0, 'max': 5, 'increment': 0.05},
+        {'precision': 2, 'min': 5, 'max': 20, 'increment': 0.50},
+      ]
+    })
+    with self.assertRaises(BadSettingException):
+      check_price_buckets_validity({'buckets': []})
+    with self.assertRaises(BadSettingException):
+      check_price_buckets_validity({
+        'buckets': [{'min': 0, 'max': 5, 'increment': 0}]
+      })
+    # Prebid would start these buckets at 0 and 5.
+    with self.assertRaises(BadSettingException):
+      check_price_buckets_validity({
+        'buckets': [{'min': 1, 'max': 5, 'increment': 0.05}]
+      })
+    with self.assertRaises(BadSettingException):
+      check_price_buckets_validity({
+        'buckets': [
+          {'min': 0, 'max': 5, 'increment': 0.05},
+          {'min': 6, 'max': 20, 'increment': 0.50},
+        ]
+      })
+
   @patch('tasks.add_new_prebid_partner.setup_partner')
   @patch('tasks.add_new_prebid_partner.input', return_value='n')
   def test_user_confirmation_rejected(self, mock_input, 
@@ -165,6 +198,24 @@ class AddNewPrebidPartnerTests(TestCase):
     tasks.add_new_prebid_partner.main()
     mock_setup_partners.assert_not_called()
 
+  @patch('tasks.add_new_prebid_partner.setup_partner')
+  @patch('tasks.add_new_prebid_partner.input', return_value='n')
+  def test_summary_existing_order(self, mock_input, mock_setup_partners,
+    mock_dfp_client):
+    """
+    When adding to an existing order, the summary says that line items it
+    already has are skipped.
+    """
+    with patch('settings.DFP_USE_EXISTING_ORDER_IF_EXISTS', True,
+        create=True):
+      with patch('tasks.add_new_prebid_partner.logger') as mock_logger:
+        tasks.add_new_prebid_partner.main()
+    summary = '\n'.join(args[0] for args, kwargs in
+      mock_logger.info.call_args_list)
+    self.assertIn('new line items. If the order exists, line items it '
+      'already has will be skipped.', summary)
+    self.assertIn('up to ', summary)
+
   @patch('tasks.add_new_prebid_partner.setup_partner')
   @patch('tasks.add_new_prebid_partner.input', return_value='asdf')
   def test_user_confirmation_not_accepted(self, mock_input, 
@@ -253,7 +304,7 @@ class AddNewPrebidPartnerTests(TestCase):
       14523)
     (mock_create_creatives.create_duplicate_creative_configs
       .assert_called_once_with(bidder_code, order, 246810, 2))
-    mock_create_creatives.create_creatives.assert_called_once()
+    mock_create_creatives.get_or_create_creatives.assert_called_once()
     mock_create_line_items.create_line_items.assert_called_once()
     mock_licas.make_licas.assert_called_once()
 
@@ -330,6 +381,26 @@ class AddNewPrebidPartnerTests(TestCase):
     mock_create_targeting.create_targeting_value.assert_called_once_with(
       '15.00', 987654)
 
+  @patch('dfp.create_custom_targeting')
+  @patch('dfp.get_custom_targeting')
+  def test_value_id_getter_create_missing_values(self, mock_get_targeting,
+    mock_create_targeting, mock_dfp_client):
+    """
+    It creates every missing value in one batch.
+    """
+    mock_get_targeting.get_targeting_by_key_name = MagicMock(
+      return_value=[{'id': 1324354657, 'name': '12.50'}])
+    mock_create_targeting.create_targeting_values = MagicMock(
+      return_value={'15.00': 44445555, '20.00': 55556666})
+
+    getter = DFPValueIdGetter('some-key-name', key_id=987654)
+    getter.create_missing_values(['20.00', '12.50', '15.00', '20.00'])
+
+    mock_create_targeting.create_targeting_values.assert_called_once_with(
+      ['15.00', '20.00'], 987654)
+    self.assertEqual(getter.get_value_id('20.00'), 55556666)
+    mock_create_targeting.create_targeting_value.assert_not_called()
+
   @patch('dfp.create_custom_targeting')
   @patch('dfp.get_custom_targeting')
   def test_get_or_create_dfp_targeting_key_does_not_exist(self,
@@ -384,3 +455,70 @@ class AddNewPrebidPartnerTests(TestCase):
     tasks.add_new_prebid_partner.logger.info(u'\xe4')
     tasks.add_new_prebid_partner.logger.info(
       u"""A with umlaut: {my_character}""".format(my_character=u'\xe4'))
+
+
+class AppendToExistingOrderTests(TestCase):
+
+  def setUp(self):
+    self.gam = FakeGAM()
+    create_network(self.gam, email, advertiser, placements, ad_units)
+
+  def tearDown(self):
+    if dfp.aio._limiter is not None:
+      dfp.aio.get_limiter().close()
+      dfp.aio._limiter = None
+
+  def setup_partner(self, prices, concurrent=False):
+    args = (email, advertiser, order, placements, ad_units, sizes,
+      'mypartner', prices, 1, 'USD', {})
+    with installed(self.gam, DFP_USE_EXISTING_ORDER_IF_EXISTS=True):
+      if concurrent:
+        dfp.aio.set_max_concurrent_requests(2)
+        dfp.aio.run_until_complete(
+          tasks.add_new_prebid_partner.setup_partner_async(*args))
+      else:
+        tasks.add_new_prebid_partner.setup_partner(*args)
+
+  def assert_appends(self, concurrent):
+    self.setup_partner([100000, 200000], concurrent)
+    self.setup_partner([100000, 200000, 300000, 400000], concurrent)
+
+    line_items = self.gam.objects['LineItem']
+    self.assertEqual(sorted(line_item['name'] for line_item in line_items), [
+      'mypartner: HB $0.10', 'mypartner: HB $0.20', 'mypartner: HB $0.30',
+      'mypartner: HB $0.40'])
+    self.assertEqual(len(self.gam.objects['Order']), 1)
+    self.assertEqual(
+      len(self.gam.objects['LineItemCreativeAssociation']), 4)
+
+  def test_setup_partner_appends(self):
+    """
+    Extending the ladder of an existing order only creates the new line
+    items.
+    """
+    self.assert_appends(concurrent=False)
+
+  def test_setup_partner_async_appends(self):
+    """
+    The concurrent setup also skips the line items the order has.
+    """
+    self.assert_appends(concurrent=True)
+
+  def test_skip_existing_line_items(self):
+    """
+    Line items whose name or hb_pb value the order has are dropped.
+    """
+    from dfp.get_line_items import LineItemIndex
+    from dfp.specs import LineItemSpec
+    # hb_pb is not necessarily the last criterion.
+    configs = [
+      LineItemSpec(None, 'mypartner: HB $0.10', 100000, ((88, 1010), (77, 5))),
+      LineItemSpec(None, 'renamed', 200000, ((88, 1020), (77, 5))),
+      LineItemSpec(None, 'mypartner: HB $0.30', 300000, ((88, 1030), (77, 5))),
+    ]
+    index = LineItemIndex(frozenset(['mypartner: HB $0.10']),
+      frozenset([1020]))
+    self.assertEqual(tasks.add_new_prebid_partner.skip_existing_line_items(
+      configs, index, 88), configs[2:])
+    self.assertEqual(tasks.add_new_prebid_partner.skip_existing_line_items(
+      configs, None, 88), configs)
@@ -0,0 +1,95 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipIf
+
+from mock import patch
+
+import tasks.bid_replay
+from tasks.bid_replay import LadderReplay, pick_ladder, replay_bids
+
+
+BIDS = [
+  ('appnexus', '0.12'),
+  ('appnexus', '1.07'),
+  ('rubicon', '0.05'),
+  ('rubicon', '25.00'),
+  ('appnexus', '3.33'),
+]
+
+
+class BidReplayTests(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.csv_path = os.path.join(self.tmp_dir, 'bids.csv')
+    with open(self.csv_path, 'w') as bid_log:
+      bid_log.write('bidder,cpm\n')
+      for bidder, cpm in BIDS:
+        bid_log.write('{0},{1}\n'.format(bidder, cpm))
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def replay(self, path, **kwargs):
+    ladders = [
+      LadderReplay('dime', [100000, 1000000, 2000000, 20000000]),
+      LadderReplay('cent', list(range(0, 20000001, 10000))),
+    ]
+    return replay_bids(tasks.bid_replay.iter_bid_chunks(path, **kwargs),
+      ladders)
+
+  def assert_replayed(self, ladders):
+    dime, cent = ladders
+    self.assertEqual(dime.num_bids, 5)
+    self.assertEqual(dime.bid_micro_amount, 29570000)
+    # 0.02 + 0.07 + 0.05 (below the ladder) + 5.00 (capped) + 1.33
+    self.assertEqual(dime.lost_micro_amount, 6470000)
+    # Only the bid above the $20 cap loses anything.
+    self.assertEqual(cent.lost_micro_amount, 5000000)
+
+  def test_replay_csv(self):
+    """
+    It maps every bid onto each ladder in chunks.
+    """
+    self.assert_replayed(self.replay(self.csv_path, chunk_size=2))
+
+  @patch('tasks.bid_replay.pyarrow', None)
+  @patch('tasks.bid_replay.numpy', None)
+  def test_replay_csv_without_numpy(self):
+    """
+    It gives the same results with the pure Python fallback.
+    """
+    self.assert_replayed(self.replay(self.csv_path, chunk_size=2))
+
+  @skipIf(tasks.bid_replay.pyarrow is None, 'pyarrow is not installed')
+  def test_replay_parquet(self):
+    """
+    It reads Parquet bid logs.
+    """
+    import pyarrow
+    import pyarrow.parquet
+    parquet_path = os.path.join(self.tmp_dir, 'bids.parquet')
+    pyarrow.parquet.write_table(pyarrow.table({
+      'bidder': [bidder for bidder, cpm in BIDS],
+      'cpm': [float(cpm) for bidder, cpm in BIDS],
+    }), parquet_path)
+    self.assert_replayed(self.replay(parquet_path, chunk_size=2))
+
+  def test_replay_bidder(self):
+    """
+    It only replays the requested bidder's bids.
+    """
+    dime, cent = self.replay(self.csv_path, bidder='rubicon')
+    self.assertEqual(dime.num_bids, 2)
+    self.assertEqual(dime.bid_micro_amount, 25050000)
+
+  def test_pick_ladder(self):
+    """
+    It picks the smallest ladder within the tolerance.
+    """
+    ladders = self.replay(self.csv_path)
+    self.assertEqual(pick_ladder(ladders, 0.2).name, 'cent')
+    self.assertEqual(pick_ladder(ladders, 0.25).name, 'dime')
+    self.assertIsNone(pick_ladder(ladders, 0.1))
@@ -0,0 +1,148 @@
+
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import tasks.cleanup
+from dfp.exceptions import BadSettingException
+
+
+def make_line_item(key_id, value_id):
+  return {
+    'targeting': {
+      'customTargeting': {
+        'logicalOperator': 'AND',
+        'children': [{'keyId': key_id, 'valueIds': [value_id]}],
+      }
+    }
+  }
+
+
+class CleanupTests(TestCase):
+
+  @patch('dfp.get_orders.iter_orders')
+  def test_find_orders(self, mock_iter_orders):
+    """
+    It filters orders by name and advertiser and skips archived ones.
+    """
+    mock_iter_orders.return_value = iter([
+      {'id': 1, 'name': 'Test Order: 1', 'isArchived': False},
+      {'id': 2, 'name': 'Test Order: 2', 'isArchived': True},
+    ])
+
+    orders = tasks.cleanup.find_orders(name_like='Test Order:%',
+      advertiser_id=246810)
+
+    self.assertEqual(orders, [{'id': 1, 'name': 'Test Order: 1'}])
+    args, kwargs = mock_iter_orders.call_args
+    self.assertEqual(args[0], 'name LIKE :name AND advertiserId = :advertiserId')
+
+  def test_find_orders_requires_filter(self):
+    """
+    It refuses to select every order.
+    """
+    with self.assertRaises(BadSettingException):
+      tasks.cleanup.find_orders()
+
+  @patch('dfp.get_line_items.iter_line_items')
+  @patch('dfp.get_custom_targeting.get_targeting_by_key_name')
+  @patch('dfp.get_custom_targeting.get_key_id_by_name')
+  def test_find_unreferenced_values(self, mock_get_key_id, mock_get_targeting,
+    mock_iter_line_items):
+    """
+    It returns the values no live line item targets, optionally only those
+    with given names, scanning line items once for all keys.
+    """
+    key_ids = {'hb_pb': 987654, 'hb_bidder': 123123, 'hb_missing': None}
+    mock_get_key_id.side_effect = lambda name: key_ids[name]
+    mock_get_targeting.side_effect = lambda name: {
+      'hb_pb': [
+        {'id': 111, 'name': '0.10'},
+        {'id': 222, 'name': '0.20'},
+        {'id': 333, 'name': '0.30'},
+      ],
+      'hb_bidder': [
+        {'id': 444, 'name': 'rubicon'},
+        {'id': 555, 'name': 'appnexus'},
+      ],
+    }[name]
+    mock_iter_line_items.side_effect = lambda **kwargs: iter([
+      make_line_item(987654, 111),
+      make_line_item(123123, 555),
+      make_line_item(555555, 222),
+    ])
+
+    unreferenced = tasks.cleanup.find_unreferenced_values(
+      ['hb_pb', 'hb_bidder', 'hb_missing'])
+
+    mock_iter_line_items.assert_called_once()
+    self.assertEqual(unreferenced['hb_pb'][0], 987654)
+    self.assertEqual([value['id'] for value in unreferenced['hb_pb'][1]],
+      [222, 333])
+    self.assertEqual([value['id'] for value in unreferenced['hb_bidder'][1]],
+      [444])
+    self.assertEqual(unreferenced['hb_missing'], (None, []))
+
+    unreferenced = tasks.cleanup.find_unreferenced_values(['hb_pb'],
+      value_names={'hb_pb': {'0.10', '0.30'}})
+    self.assertEqual([value['id'] for value in unreferenced['hb_pb'][1]],
+      [333])
+
+  @patch('dfp.get_line_items.iter_line_items')
+  @patch('dfp.get_custom_targeting.get_targeting_by_key_name')
+  @patch('dfp.get_custom_targeting.get_key_id_by_name')
+  def test_find_unreferenced_values_skips_scan(self, mock_get_key_id,
+    mock_get_targeting, mock_iter_line_items):
+    """
+    It does not scan line items when there are no values to check.
+    """
+    mock_get_key_id.return_value = 987654
+    mock_get_targeting.return_value = [{'id': 111, 'name': '0.10'}]
+
+    unreferenced = tasks.cleanup.find_unreferenced_values(['hb_pb'],
+      value_names={'hb_pb': set()})
+
+    self.assertEqual(unreferenced, {'hb_pb': (987654, [])})
+    mock_iter_line_items.assert_not_called()
+
+  @patch('dfp.delete_custom_targeting.delete_targeting_values')
+  @patch('tasks.cleanup.find_unreferenced_values')
+  def test_delete_unreferenced_values(self, mock_find_unreferenced_values,
+    mock_delete_targeting_values):
+    """
+    It deletes unreferenced values of every Prebid key.
+    """
+    mock_find_unreferenced_values.return_value = {
+      'hb_pb': (987654, [{'id': 222}, {'id': 333}]),
+      'hb_bidder': (123123, []),
+    }
+    mock_delete_targeting_values.return_value = 2
+
+    self.assertEqual(tasks.cleanup.delete_unreferenced_values(), 2)
+    mock_find_unreferenced_values.assert_called_once_with(
+      tasks.cleanup.PREBID_TARGETING_KEYS, None)
+    mock_delete_targeting_values.assert_called_once_with(987654, [222, 333])
+
+  @patch('dfp.archive_orders.archive_orders')
+  @patch('tasks.cleanup.find_orders')
+  @patch('tasks.cleanup.input', return_value='n')
+  def test_user_confirmation_rejected(self, mock_input, mock_find_orders,
+    mock_archive_orders):
+    """
+    Make sure we exit when the user rejects the confirmation.
+    """
+    mock_find_orders.return_value = [{'id': 1, 'name': 'Test Order: 1'}]
+    tasks.cleanup.main(['--name-like', 'Test Order:%'])
+    mock_archive_orders.assert_not_called()
+
+  @patch('dfp.archive_orders.archive_orders')
+  @patch('tasks.cleanup.find_orders')
+  @patch('tasks.cleanup.input', return_value='y')
+  def test_user_confirmation_accepted(self, mock_input, mock_find_orders,
+    mock_archive_orders):
+    """
+    Make sure we archive the orders when the user confirms.
+    """
+    mock_find_orders.return_value = [{'id': 1, 'name': 'Test Order: 1'}]
+    tasks.cleanup.main(['--name-like', 'Test Order:%'])
+    mock_archive_orders.assert_called_once_with([1])
@@ -0,0 +1,169 @@
+
+from threading import Lock
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.aio
+import tasks.add_new_prebid_partner
+from dfp.exceptions import BadSettingException
+
+
+class DFPAioTests(TestCase):
+
+  def setUp(self):
+    dfp.aio.set_max_concurrent_requests(4)
+
+  def tearDown(self):
+    dfp.aio.get_limiter().close()
+    dfp.aio._limiter = None
+
+  def test_max_concurrent_requests(self):
+    """
+    It uses the setting, and rejects limits below one.
+    """
+    with patch('settings.DFP_MAX_CONCURRENT_REQUESTS', 3, create=True):
+      self.assertEqual(dfp.aio.get_max_concurrent_requests(), 3)
+    with patch('settings.DFP_MAX_CONCURRENT_REQUESTS', None, create=True):
+      self.assertEqual(dfp.aio.get_max_concurrent_requests(),
+        dfp.aio.DEFAULT_MAX_CONCURRENT_REQUESTS)
+    with self.assertRaises(BadSettingException):
+      dfp.aio.get_max_concurrent_requests(0)
+
+  @patch('dfp.get_placements.get_placement_by_name')
+  def test_get_placement_ids_by_name(self, mock_get_placement_by_name):
+    """
+    It looks up each placement and keeps their order.
+    """
+    mock_get_placement_by_name.side_effect = lambda name: {
+      'id': {'Leaderboard': 1, 'Sidebar': 2}[name]}
+    self.assertEqual(dfp.aio.run_until_complete(
+      dfp.aio.get_placement_ids_by_name(['Sidebar', 'Leaderboard'])), [2, 1])
+
+  @patch('dfp.create_line_items.create_line_items')
+  def test_create_line_items_batches(self, mock_create_line_items):
+    """
+    It creates line items in batches and returns IDs in the original order.
+    """
+    lock = Lock()
+    batches = []
+
+    def create_line_items(line_items):
+      with lock:
+        batches.append(line_items)
+      return [line_item['id'] for line_item in line_items]
+
+    mock_create_line_items.side_effect = create_line_items
+    line_items = [{'id': i} for i in range(7)]
+    line_item_ids = dfp.aio.run_until_complete(
+      dfp.aio.create_line_items(line_items, batch_size=3))
+
+    self.assertEqual(line_item_ids, list(range(7)))
+    self.assertEqual(sorted(len(batch) for batch in batches), [1, 3, 3])
+
+  @patch('dfp.associate_line_items_and_creatives.make_licas')
+  def test_make_licas_batches(self, mock_make_licas):
+    """
+    It sends about `batch_size` associations per call.
+    """
+    dfp.aio.run_until_complete(dfp.aio.make_licas(list(range(10)),
+      ['a', 'b', 'c'], None, batch_size=6))
+
+    self.assertEqual(mock_make_licas.call_count, 5)
+    line_item_ids = sorted(line_item_id
+      for args, kwargs in mock_make_licas.call_args_list
+      for line_item_id in args[0])
+    self.assertEqual(line_item_ids, list(range(10)))
+    args, kwargs = mock_make_licas.call_args
+    self.assertEqual(args[1:], (['a', 'b', 'c'], None))
+
+  @patch('tasks.add_new_prebid_partner.create_line_item_configs')
+  @patch('tasks.add_new_prebid_partner.DFPValueIdGetter')
+  @patch('tasks.add_new_prebid_partner.get_or_create_dfp_targeting_key')
+  @patch('dfp.associate_line_items_and_creatives')
+  @patch('dfp.create_creatives')
+  @patch('dfp.create_line_items')
+  @patch('dfp.create_orders')
+  @patch('dfp.get_advertisers')
+  @patch('dfp.get_ad_units')
+  @patch('dfp.get_placements')
+  @patch('dfp.get_users')
+  def test_setup_partner_async(self, mock_get_users, mock_get_placements,
+    mock_get_ad_units, mock_get_advertisers, mock_create_orders,
+    mock_create_line_items, mock_create_creatives, mock_licas,
+    mock_get_or_create_dfp_targeting_key, mock_dfp_value_id_getter,
+    mock_create_line_item_configs):
+    """
+    The concurrent setup calls all expected DFP functions.
+    """
+    mock_get_users.get_user_id_by_email.return_value = 14523
+    mock_get_placements.get_placement_by_name.return_value = {'id': 1234567}
+    mock_get_advertisers.get_advertiser_id_by_name.return_value = 246810
+    mock_create_orders.create_order.return_value = 1357913
+    mock_dfp_value_id_getter.return_value.get_missing_values.side_effect = (
+      lambda value_names: sorted(set(value_names)))
+    mock_dfp_value_id_getter.return_value._create_values_and_return_ids \
+      .return_value = {}
+    mock_create_line_item_configs.return_value = [{}, {}]
+    mock_create_line_items.create_line_items.return_value = [1, 2]
+
+    dfp.aio.run_until_complete(
+      tasks.add_new_prebid_partner.setup_partner_async(
+        'fakeuser@example.com', 'My Advertiser', 'My Cool Order',
+        ['My Site Leaderboard'], [], [{'width': '300', 'height': '250'}],
+        'mypartner', [100000, 200000], 2, 'USD', {}))
+
+    mock_get_users.get_user_id_by_email.assert_called_once_with(
+      'fakeuser@example.com')
+    mock_create_orders.create_order.assert_called_once_with('My Cool Order',
+      246810, 14523)
+    self.assertEqual(sorted(args[0] for args, kwargs
+      in mock_get_or_create_dfp_targeting_key.call_args_list),
+      ['hb_bidder', 'hb_pb'])
+    # The hb_bidder value and the two hb_pb values were missing, and each
+    # key's values were created in one batch.
+    self.assertEqual(sorted(args[0] for args, kwargs in
+      mock_dfp_value_id_getter.return_value._create_values_and_return_ids
+      .call_args_list), [['0.10', '0.20'], ['mypartner']])
+    args, kwargs = (mock_create_creatives.create_duplicate_creative_configs
+      .call_args)
+    self.assertEqual(kwargs['advertiser_id'], 246810)
+    self.assertEqual(kwargs['num_creatives'], 2)
+    mock_create_line_items.create_line_items.assert_called_once_with([{}, {}])
+    args, kwargs = mock_licas.make_licas.call_args
+    self.assertEqual(args[0], [1, 2])
+
+  @patch.multiple('settings',
+    DFP_USER_EMAIL_ADDRESS='fakeuser@example.com',
+    DFP_ADVERTISER_NAME='My Advertiser',
+    DFP_ORDER_NAME='My Cool Order',
+    DFP_TARGETED_PLACEMENT_NAMES=['My Site Leaderboard'],
+    DFP_TARGETED_AD_UNIT_NAMES=[],
+    DFP_PLACEMENT_SIZES=[{'width': '300', 'height': '250'}],
+    PREBID_BIDDER_CODE='mypartner',
+    PREBID_PRICE_BUCKETS={'precision': 2, 'min': 0, 'max': 1,
+      'increment': 0.10},
+    create=True)
+  @patch('tasks.add_new_prebid_partner.setup_partner_async')
+  @patch('tasks.add_new_prebid_partner.setup_partner')
+  @patch('tasks.add_new_prebid_partner.start_prefetch')
+  @patch('tasks.add_new_prebid_partner.input', return_value='y')
+  def test_main_concurrent(self, mock_input, mock_start_prefetch,
+    mock_setup_partner, mock_setup_partner_async):
+    """
+    main uses the concurrent setup when more than one request may be in
+    flight.
+    """
+    async def setup_partner_async(*args, **kwargs):
+      pass
+    mock_setup_partner_async.side_effect = setup_partner_async
+
+    with patch('settings.DFP_MAX_CONCURRENT_REQUESTS', 6, create=True):
+      tasks.add_new_prebid_partner.main()
+    mock_setup_partner.assert_not_called()
+    mock_setup_partner_async.assert_called_once()
+    self.assertEqual(dfp.aio.get_limiter().max_requests, 6)
+
+    with patch('settings.DFP_MAX_CONCURRENT_REQUESTS', 0, create=True):
+      with self.assertRaises(BadSettingException):
+        tasks.add_new_prebid_partner.main()
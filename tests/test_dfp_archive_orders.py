@@ -0,0 +1,36 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.archive_orders
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPArchiveOrdersTests(TestCase):
+
+  @patch('dfp.archive_orders.ORDERS_PER_ACTION', 2)
+  def test_archive_orders(self, mock_dfp_client):
+    """
+    Ensure it archives orders with one action per batch.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .performOrderAction) = MagicMock(side_effect=[
+        {'numChanges': 2},
+        {'numChanges': 1},
+      ])
+
+    num_archived = dfp.archive_orders.archive_orders([11, 22, 33])
+
+    self.assertEqual(num_archived, 3)
+    calls = (mock_dfp_client.return_value
+      .GetService.return_value
+      .performOrderAction.call_args_list)
+    self.assertEqual([call[0] for call in calls], [
+      ({'xsi_type': 'ArchiveOrders'},
+        {'query': 'WHERE id IN (11, 22) LIMIT 500 OFFSET 0', 'values': None}),
+      ({'xsi_type': 'ArchiveOrders'},
+        {'query': 'WHERE id IN (33) LIMIT 500 OFFSET 0', 'values': None}),
+    ])
@@ -0,0 +1,389 @@
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from googleads.errors import GoogleAdsServerFault
+from mock import MagicMock, patch
+from requests.exceptions import ReadTimeout
+
+import dfp.associate_line_items_and_creatives
+import dfp.batch
+import dfp.create_creatives
+import dfp.create_custom_targeting
+import dfp.create_line_items
+from benchmarks.fake_gam import FakeGAM, installed
+from dfp.batch import (
+  BatchSizer,
+  get_batch_size_bounds,
+  get_item_errors,
+  submit,
+  submit_in_batches,
+)
+from dfp.exceptions import BadSettingException
+
+
+class ApiError(object):
+
+  def __init__(self, fieldPath, errorString='UniqueError.NOT_UNIQUE',
+      trigger=None):
+    self.fieldPath = fieldPath
+    self.errorString = errorString
+    self.trigger = trigger
+
+def fake_create(bad_names):
+  """
+  Returns a fake create* method that, like GAM, fails the whole call if any
+  item in it is bad, and otherwise returns the items with IDs.
+  """
+  def create(items):
+    bad = [ApiError('lineItem[{0}].name'.format(index), trigger=item['name'])
+      for index, item in enumerate(items) if item['name'] in bad_names]
+    if bad:
+      raise GoogleAdsServerFault(None, errors=bad, message='[UniqueError]')
+    return [dict(item, id=index) for index, item in enumerate(items)]
+  return MagicMock(side_effect=create)
+
+class InterruptingGAM(FakeGAM):
+  """
+  A FakeGAM whose first create call of each kind creates its objects, then
+  times out.
+  """
+
+  def __init__(self):
+    super(InterruptingGAM, self).__init__()
+    self.interrupted = set()
+
+  def create(self, kind, objs):
+    created = super(InterruptingGAM, self).create(kind, objs)
+    if kind not in self.interrupted:
+      self.interrupted.add(kind)
+      raise ReadTimeout()
+    return created
+
+class DFPBatchTests(TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, 'rejects.jsonl')
+    patcher = patch('settings.DFP_REJECTS_FILE', self.path, create=True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+    dfp.batch._rejects = None
+    dfp.batch._batch_sizers.clear()
+
+  def read_rejects(self):
+    with open(self.path) as rejects_file:
+      return [json.loads(line) for line in rejects_file]
+
+  def test_submit(self):
+    """
+    A batch GAM accepts is sent in one call.
+    """
+    create = fake_create(set())
+    items = [{'name': str(i)} for i in range(8)]
+    self.assertEqual([item['name'] for item in submit(create, items,
+      'LineItem')], [str(i) for i in range(8)])
+    create.assert_called_once_with(items)
+    self.assertFalse(os.path.exists(self.path))
+
+  def test_submit_isolates_rejects(self):
+    """
+    The items GAM's errors point at are written to the rejects file, and the
+    others are sent again once and created, in order.
+    """
+    create = fake_create({'5', '9'})
+    items = [{'name': str(i)} for i in range(16)]
+    created = submit(create, items, 'LineItem')
+
+    self.assertEqual([item['name'] for item in created],
+      [str(i) for i in range(16) if i not in (5, 9)])
+    self.assertEqual(create.call_count, 2)
+
+    rejects = self.read_rejects()
+    self.assertEqual([reject['item'] for reject in rejects],
+      [{'name': '5'}, {'name': '9'}])
+    self.assertEqual(rejects[0]['kind'], 'LineItem')
+    self.assertEqual(rejects[0]['reasons'],
+      ['UniqueError.NOT_UNIQUE at lineItem[5].name (trigger: 5)'])
+
+  def test_submit_bisects_unaccounted_failures(self):
+    """
+    When the errors do not point at the invalid items, the batch is retried
+    in halves.
+    """
+    def create(items):
+      if any(item['name'] == '5' for item in items):
+        # An index past the end of the request.
+        raise GoogleAdsServerFault(None,
+          errors=[ApiError('lineItem[99].name')])
+      return items
+    create = MagicMock(side_effect=create)
+    items = [{'name': str(i)} for i in range(16)]
+
+    self.assertEqual([item['name'] for item in submit(create, items,
+      'LineItem')], [str(i) for i in range(16) if i != 5])
+    # The whole batch, then two calls per halving: 1 + 2 * log2(16).
+    self.assertEqual(create.call_count, 9)
+    self.assertEqual([reject['item'] for reject in self.read_rejects()],
+      [{'name': '5'}])
+
+  def test_submit_resend_fails(self):
+    """
+    When the resent items fail too, they are retried in halves.
+    """
+    def create(items):
+      # Like a call that reports only its first invalid item.
+      for index, item in enumerate(items):
+        if item['name'] in ('3', '6'):
+          raise GoogleAdsServerFault(None,
+            errors=[ApiError('lineItem[{0}].name'.format(index))])
+      return items
+    create = MagicMock(side_effect=create)
+    items = [{'name': str(i)} for i in range(8)]
+
+    self.assertEqual([item['name'] for item in submit(create, items,
+      'LineItem')], ['0', '1', '2', '4', '5', '7'])
+    self.assertEqual([reject['item'] for reject in self.read_rejects()],
+      [{'name': '3'}, {'name': '6'}])
+
+  def test_submit_all_rejected(self):
+    """
+    Every invalid item is recorded.
+    """
+    create = fake_create({'0', '1', '2'})
+    items = [{'name': str(i)} for i in range(3)]
+    self.assertEqual(submit(create, items, 'LineItem'), [])
+    self.assertEqual(len(self.read_rejects()), 3)
+
+  def test_submit_request_error(self):
+    """
+    Errors about the request as a whole are raised, not retried.
+    """
+    create = MagicMock(side_effect=GoogleAdsServerFault(None,
+      errors=[ApiError('', 'QuotaError.EXCEEDED_QUOTA')]))
+    with self.assertRaises(GoogleAdsServerFault):
+      submit(create, [{'name': '1'}, {'name': '2'}], 'LineItem')
+    create.assert_called_once()
+    self.assertFalse(os.path.exists(self.path))
+
+  def test_get_item_errors(self):
+    """
+    Only errors that point at an item are item errors.
+    """
+    fault = GoogleAdsServerFault(None, errors=[
+      ApiError('lineItem[12].targeting', 'RequiredError.REQUIRED'),
+      ApiError(None, 'AuthenticationError.NOT_WHITELISTED_FOR_API_ACCESS'),
+    ])
+    self.assertEqual(get_item_errors(fault),
+      [(12, 'RequiredError.REQUIRED at lineItem[12].targeting')])
+
+  def test_interrupted_creates(self):
+    """
+    The create functions find what an interrupted call created, so nothing
+    is created twice and every created ID is returned.
+    """
+    gam = InterruptingGAM()
+    with installed(gam, DFP_MIN_BATCH_SIZE=1, DFP_INITIAL_BATCH_SIZE=4):
+      line_item_ids = dfp.create_line_items.create_line_items(
+        [{'orderId': 1, 'name': 'li {0}'.format(i)} for i in range(6)])
+      creative_ids = dfp.create_creatives.create_creatives(
+        [{'advertiserId': 2, 'name': 'creative {0}'.format(i)}
+          for i in range(6)])
+      value_ids = dfp.create_custom_targeting.create_targeting_values(
+        ['0.{0}0'.format(i) for i in range(6)], 3)
+      dfp.associate_line_items_and_creatives.make_licas(line_item_ids[:2],
+        creative_ids[:3], None)
+
+    self.assertEqual(sorted(line_item_ids),
+      sorted(line_item['id'] for line_item in gam.objects['LineItem']))
+    self.assertEqual(len(line_item_ids), 6)
+    self.assertEqual(sorted(creative_ids),
+      sorted(creative['id'] for creative in gam.objects['Creative']))
+    self.assertEqual(len(creative_ids), 6)
+    self.assertEqual(value_ids, {value['name']: value['id']
+      for value in gam.objects['CustomTargetingValue']})
+    self.assertEqual(len(value_ids), 6)
+    self.assertEqual(len(gam.objects['LineItemCreativeAssociation']), 6)
+
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+  def test_make_licas_rejects(self, mock_dfp_client):
+    """
+    make_licas creates the associations GAM accepts.
+    """
+    import dfp.associate_line_items_and_creatives
+    lica_service = mock_dfp_client.return_value.GetService.return_value
+
+    def create(licas):
+      bad = [ApiError('licas[{0}].creativeId'.format(index))
+        for index, lica in enumerate(licas) if lica['creativeId'] == 2
+        and lica['lineItemId'] == 20]
+      if bad:
+        raise GoogleAdsServerFault(None, errors=bad)
+      return licas
+    lica_service.createLineItemCreativeAssociations.side_effect = create
+
+    dfp.associate_line_items_and_creatives.make_licas([10, 20], [1, 2], None)
+    rejects = self.read_rejects()
+    self.assertEqual([(reject['item']['lineItemId'],
+      reject['item']['creativeId']) for reject in rejects], [(20, 2)])
+
+  def test_batch_sizer(self):
+    """
+    It grows while the latency per object improves, holds when it does not,
+    and halves on overload errors down to the minimum.
+    """
+    sizer = BatchSizer('LineItem', min_size=5, max_size=40, initial_size=20)
+    sizer.record(20, 2.0)
+    self.assertEqual(sizer.size, 30)
+    sizer.record(30, 2.4)
+    self.assertEqual(sizer.size, 40)
+    sizer.record(40, 4.0)
+    self.assertEqual(sizer.size, 40)
+    # A short batch is ignored.
+    sizer.record(3, 0.01)
+    self.assertEqual(sizer.seconds_per_item, 0.1)
+
+    self.assertTrue(sizer.shrink(40, 'timeout'))
+    self.assertEqual(sizer.size, 20)
+    self.assertTrue(sizer.shrink(20, 'timeout'))
+    self.assertTrue(sizer.shrink(10, 'timeout'))
+    self.assertEqual(sizer.size, 5)
+    self.assertFalse(sizer.shrink(5, 'timeout'))
+
+  def test_batch_size_bounds(self):
+    """
+    The bounds come from settings, and the initial size is kept within them.
+    """
+    with patch.multiple('settings', DFP_MIN_BATCH_SIZE=10,
+        DFP_MAX_BATCH_SIZE=20, DFP_INITIAL_BATCH_SIZE=100, create=True):
+      self.assertEqual(get_batch_size_bounds(), (10, 20, 20))
+    with patch.multiple('settings', DFP_MIN_BATCH_SIZE=30,
+        DFP_MAX_BATCH_SIZE=20, create=True):
+      with self.assertRaises(BadSettingException):
+        get_batch_size_bounds()
+
+  def test_submit_in_batches_too_large(self):
+    """
+    A batch that is too large is sent again in smaller batches.
+    """
+    calls = []
+
+    def create(items):
+      calls.append(len(items))
+      if len(items) > 4:
+        raise GoogleAdsServerFault(None,
+          errors=[ApiError('lineItems', 'CollectionSizeError.TOO_LARGE')])
+      return items
+
+    items = [{'name': str(i)} for i in range(10)]
+    with patch.multiple('settings', DFP_MIN_BATCH_SIZE=2,
+        DFP_INITIAL_BATCH_SIZE=8, create=True):
+      self.assertEqual(submit_in_batches(create, items, 'LineItem'), items)
+    # Halved after each error, and grown again after each success.
+    self.assertEqual(calls, [8, 4, 6, 3, 3])
+
+  def test_submit_in_batches_interrupted(self):
+    """
+    After a timeout, only the objects GAM did not create are sent again.
+    """
+    created = []
+    calls = []
+
+    def create(items):
+      calls.append(len(items))
+      # GAM creates the first half of a large batch before the client gives
+      # up on it.
+      if len(items) > 4:
+        created.extend(items[:len(items) // 2])
+        raise ReadTimeout()
+      created.extend(items)
+      return items
+
+    def find_existing(items):
+      return [item for item in created if item in items]
+
+    items = [{'name': str(i)} for i in range(8)]
+    with patch.multiple('settings', DFP_MIN_BATCH_SIZE=2,
+        DFP_INITIAL_BATCH_SIZE=8, create=True):
+      self.assertEqual(submit_in_batches(create, items, 'LineItem',
+        find_existing=find_existing, get_key=lambda item: item['name']),
+        items)
+    self.assertEqual(calls, [8, 4])
+    self.assertEqual(created, items)
+
+  def test_submit_in_batches_records_first_tries(self):
+    """
+    Only calls that succeed the first time grow the batch size.
+    """
+    create = fake_create({'3'})
+    items = [{'name': str(i)} for i in range(8)]
+    with patch.multiple('settings', DFP_INITIAL_BATCH_SIZE=8, create=True):
+      self.assertEqual(len(submit_in_batches(create, items, 'LineItem')), 7)
+      self.assertEqual(dfp.batch.get_batch_sizer('LineItem').size, 8)
+      submit_in_batches(create, [{'name': str(i)} for i in range(10, 18)],
+        'LineItem')
+      self.assertEqual(dfp.batch.get_batch_sizer('LineItem').size, 18)
+
+  def test_submit_in_batches_converts_specs_per_batch(self):
+    """
+    Specs are turned into SOAP dicts one batch at a time, as it is sent, and
+    lookups after a timeout get the batch as sent.
+    """
+    converted = []
+    calls = []
+
+    class Spec(object):
+      def __init__(self, name):
+        self.name = name
+      def to_soap(self):
+        converted.append(self.name)
+        return {'name': self.name}
+
+    def create(items):
+      calls.append(([item['name'] for item in items], list(converted)))
+      if len(items) > 2:
+        raise ReadTimeout()
+      return items
+
+    find_existing = MagicMock(return_value=[])
+    specs = [Spec(str(i)) for i in range(4)]
+    with patch.multiple('settings', DFP_MIN_BATCH_SIZE=1,
+        DFP_INITIAL_BATCH_SIZE=2, create=True):
+      self.assertEqual(submit_in_batches(create, specs, 'LineItem'),
+        [{'name': str(i)} for i in range(4)])
+      self.assertEqual(calls, [(['0', '1'], ['0', '1']),
+        (['2', '3'], ['0', '1', '2', '3'])])
+
+      del calls[:]
+      dfp.batch.get_batch_sizer('Creative').size = 4
+      self.assertEqual(submit_in_batches(create, specs[:3], 'Creative',
+        find_existing=find_existing, get_key=lambda item: item['name']),
+        [{'name': str(i)} for i in range(3)])
+    find_existing.assert_called_once_with(
+      [{'name': '0'}, {'name': '1'}, {'name': '2'}])
+
+  def test_submit_in_batches_other_errors(self):
+    """
+    Other errors, interrupted calls that cannot be checked, and overload
+    errors at the smallest batch size are raised.
+    """
+    with patch.multiple('settings', DFP_MIN_BATCH_SIZE=2,
+        DFP_INITIAL_BATCH_SIZE=2, create=True):
+      with self.assertRaises(ReadTimeout):
+        submit_in_batches(MagicMock(side_effect=ReadTimeout()),
+          [{'name': '1'}, {'name': '2'}, {'name': '3'}], 'Creative')
+      find_existing = MagicMock(return_value=[])
+      with self.assertRaises(ReadTimeout):
+        submit_in_batches(MagicMock(side_effect=ReadTimeout()),
+          [{'name': '1'}, {'name': '2'}], 'LineItem',
+          find_existing=find_existing, get_key=lambda item: item['name'])
+      find_existing.assert_not_called()
+      with self.assertRaises(ValueError):
+        submit_in_batches(MagicMock(side_effect=ValueError()),
+          [{'name': '1'}], 'LineItem')
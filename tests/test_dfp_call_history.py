@@ -0,0 +1,92 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.call_history
+import dfp.client
+from dfp.call_history import (
+  DEFAULT_SECONDS_PER_CALL,
+  DEFAULT_SECONDS_PER_ITEM,
+  CallHistory,
+  TimedClient,
+)
+
+
+class DFPCallHistoryTests(TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, 'history.json')
+
+  def tearDown(self):
+    dfp.call_history.start_recording(None)
+    shutil.rmtree(self.directory)
+
+  def test_estimate_defaults(self):
+    """
+    It uses default latencies for methods with no recorded calls.
+    """
+    history = CallHistory()
+    self.assertAlmostEqual(history.estimate('LineItemService.createLineItems', 10),
+      DEFAULT_SECONDS_PER_CALL + 10 * DEFAULT_SECONDS_PER_ITEM)
+
+  def test_estimate_fits_items(self):
+    """
+    It fits recorded latencies to the number of items per call.
+    """
+    history = CallHistory()
+    history.record('LineItemService.createLineItems', 3.0, 10)
+    history.record('LineItemService.createLineItems', 5.0, 20)
+    self.assertAlmostEqual(
+      history.estimate('LineItemService.createLineItems', 40), 9.0)
+
+    history.record('UserService.getUsersByStatement', 0.5)
+    history.record('UserService.getUsersByStatement', 1.5)
+    self.assertAlmostEqual(
+      history.estimate('UserService.getUsersByStatement'), 1.0)
+
+  def test_save_and_load(self):
+    """
+    It keeps latencies and value names between runs.
+    """
+    history = CallHistory(self.path)
+    self.assertIsNone(history.get_values('hb_pb'))
+    history.record('UserService.getUsersByStatement', 0.5)
+    history.record_values('hb_pb', ['0.10', '0.20'])
+    history.save()
+
+    history = CallHistory(self.path)
+    self.assertAlmostEqual(
+      history.estimate('UserService.getUsersByStatement'), 0.5)
+    self.assertEqual(history.get_values('hb_pb'), {'0.10', '0.20'})
+
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+  def test_recording(self, mock_dfp_client):
+    """
+    It times calls made through the client while recording, and saves the
+    history when recording stops.
+    """
+    mock_service = mock_dfp_client.return_value.GetService.return_value
+    mock_service.createLineItems.return_value = [{'id': 1}, {'id': 2}]
+
+    history = CallHistory(self.path)
+    dfp.call_history.start_recording(history)
+    client = dfp.client.get_client()
+    self.assertIsInstance(client, TimedClient)
+    result = client.GetService('LineItemService', version='v201908') \
+      .createLineItems([{}, {}])
+    dfp.call_history.stop_recording()
+
+    self.assertEqual(result, [{'id': 1}, {'id': 2}])
+    mock_service.createLineItems.assert_called_once_with([{}, {}])
+    self.assertEqual(len(history.samples['LineItemService.createLineItems']), 1)
+    self.assertEqual(
+      history.samples['LineItemService.createLineItems'][0][1], 2)
+    self.assertTrue(os.path.exists(self.path))
+
+    # Not recording, so the client is not timed.
+    self.assertNotIsInstance(dfp.client.get_client(), TimedClient)
@@ -0,0 +1,130 @@
+
+import os
+import shutil
+import tempfile
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+from unittest import TestCase
+
+from mock import patch
+
+import dfp.cassette
+import dfp.client
+import dfp.transport
+from dfp.cassette import (
+  RECORD,
+  REPLAY,
+  Cassette,
+  CassetteDocumentCache,
+  CassetteException,
+  ReplayOAuth2Client,
+)
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+  """
+  Answers each POST with its body, reversed.
+  """
+
+  def do_POST(self):
+    body = self.rfile.read(int(self.headers['Content-Length']))[::-1]
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/xml; charset=utf-8')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+class DFPCassetteTests(TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, 'cassette.json.gz')
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+    dfp.cassette._cassette = None
+    dfp.transport.close_session()
+
+  def record(self, bodies):
+    server = HTTPServer(('127.0.0.1', 0), EchoHandler)
+    Thread(target=server.serve_forever, args=(0.01,)).start()
+    url = 'http://127.0.0.1:{0}/apis/ads/publisher/v201908/OrderService' \
+      .format(server.server_address[1])
+    try:
+      cassette = Cassette(self.path, RECORD)
+      session = dfp.transport.create_session(1)
+      dfp.cassette.use_cassette(session, cassette)
+      for body in bodies:
+        session.post(url, data=body)
+      session.close()
+      CassetteDocumentCache(cassette).add('https://example.com/wsdl', b'<wsdl/>')
+      cassette.save()
+    finally:
+      server.shutdown()
+      server.server_close()
+    return url
+
+  def test_record_replay(self):
+    """
+    It replays recorded responses offline, matching request bodies.
+    """
+    url = self.record([b'<first/>', b'<second/>'])
+
+    cassette = Cassette(self.path, REPLAY)
+    session = dfp.transport.create_session(1)
+    dfp.cassette.use_cassette(session, cassette)
+    self.assertEqual(session.post(url, data=b'<second/>').content,
+      b'>/dnoces<')
+    response = session.post(url, data=b'<first/>')
+    self.assertEqual(response.content, b'>/tsrif<')
+    self.assertEqual(response.headers['Content-Type'],
+      'text/xml; charset=utf-8')
+    self.assertEqual(CassetteDocumentCache(cassette).get(
+      'https://example.com/wsdl'), b'<wsdl/>')
+
+    with self.assertRaises(CassetteException):
+      session.post(url, data=b'<third/>')
+
+  def test_replay_unmatched_body(self):
+    """
+    A request whose body differs gets the next response for its URL.
+    """
+    url = self.record([b'<first/>'])
+    cassette = Cassette(self.path, REPLAY)
+    session = dfp.transport.create_session(1)
+    dfp.cassette.use_cassette(session, cassette)
+    self.assertEqual(session.post(url, data=b'<other/>').content,
+      b'>/tsrif<')
+
+  def test_replay_latency(self):
+    """
+    It waits for the recorded latency, scaled.
+    """
+    url = self.record([b'<first/>'])
+    cassette = Cassette(self.path, REPLAY, latency_scale=2)
+    cassette.interactions[0]['seconds'] = 0.25
+    session = dfp.transport.create_session(1)
+    dfp.cassette.use_cassette(session, cassette)
+    with patch('time.sleep') as mock_sleep:
+      session.post(url, data=b'<first/>')
+    mock_sleep.assert_called_once_with(0.5)
+
+  @patch('googleads.ad_manager.AdManagerClient')
+  def test_get_client_replay(self, mock_ad_manager_client):
+    """
+    In replay mode, clients need no credentials and load WSDLs from the
+    cassette.
+    """
+    self.record([b'<first/>'])
+    with patch.multiple('settings', DFP_CASSETTE_FILE=self.path,
+      DFP_CASSETTE_MODE=REPLAY, create=True):
+      dfp.client.get_client()
+
+    args, kwargs = mock_ad_manager_client.call_args
+    self.assertIsInstance(args[0], ReplayOAuth2Client)
+    self.assertIsInstance(mock_ad_manager_client.return_value.cache,
+      CassetteDocumentCache)
+    mock_ad_manager_client.LoadFromString.assert_not_called()
@@ -0,0 +1,45 @@
+
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+from googleads import ad_manager as googleads_ad_manager
+
+import dfp.client
+from dfp.client import LazyModule
+
+
+# Commands that should not import the SDK until they call the API.
+NO_API_IMPORTS = """
+import sys
+import tasks.add_new_prebid_partner
+from tasks.price_utils import get_prices_array, get_prices_summary_string
+prices = get_prices_array({'precision': 2, 'min': 0, 'max': 20,
+  'increment': 0.1})
+get_prices_summary_string(prices)
+tasks.add_new_prebid_partner.check_price_buckets_validity(
+  {'precision': 2, 'min': 0, 'max': 20, 'increment': 0.1})
+print(','.join(sorted(name for name in sys.modules
+  if name.split('.')[0] in ('googleads', 'zeep', 'lxml'))))
+"""
+
+class DFPClientTests(TestCase):
+
+  def test_lazy_module(self):
+    """
+    It imports the module on first use and forwards attributes to it.
+    """
+    lazy = LazyModule('googleads.ad_manager')
+    self.assertIs(lazy.FilterStatement, googleads_ad_manager.FilterStatement)
+    self.assertIs(dfp.client.ad_manager.AdManagerClient,
+      googleads_ad_manager.AdManagerClient)
+
+  def test_no_sdk_import(self):
+    """
+    Settings validation and price ladders do not import googleads.
+    """
+    output = subprocess.check_output([sys.executable, '-c', NO_API_IMPORTS],
+      cwd=os.path.join(os.path.dirname(__file__), '..'),
+      env=dict(os.environ, DISABLE_LOGGING='true'))
+    self.assertEqual(output.decode('utf-8').strip(), '')
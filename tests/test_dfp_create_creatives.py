@@ -159,3 +159,147 @@ class DFPCreateCreativesTests(TestCase):
       ]
     )
 
+
+
+def make_snippet_creative(creative_id=None, snippet='<script></script>',
+  width='1', height='1', safe_frame=True):
+  creative = {
+    'xsi_type': 'ThirdPartyCreative',
+    'name': 'A creative',
+    'advertiserId': 12345,
+    'size': {'width': width, 'height': height},
+    'snippet': snippet,
+    'isSafeFrameCompatible': safe_frame,
+  }
+  if creative_id is not None:
+    creative['id'] = creative_id
+  return creative
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPReuseCreativesTests(TestCase):
+
+  def test_get_creative_hash(self, mock_dfp_client):
+    """
+    Ensure the hash ignores names but not what the creative renders.
+    """
+    creative = make_snippet_creative()
+    renamed = make_snippet_creative()
+    renamed['name'] = 'Another name'
+    existing = make_snippet_creative(creative_id=1, width=1, height=1)
+
+    get_creative_hash = dfp.create_creatives.get_creative_hash
+    self.assertEqual(get_creative_hash(creative), get_creative_hash(renamed))
+    self.assertEqual(get_creative_hash(creative), get_creative_hash(existing))
+    self.assertNotEqual(get_creative_hash(creative),
+      get_creative_hash(make_snippet_creative(snippet='<div></div>')))
+    self.assertNotEqual(get_creative_hash(creative),
+      get_creative_hash(make_snippet_creative(width='300', height='250')))
+    self.assertNotEqual(get_creative_hash(creative),
+      get_creative_hash(make_snippet_creative(safe_frame=False)))
+
+  def test_get_or_create_creatives_creates_shortfall(self, mock_dfp_client):
+    """
+    Ensure matching creatives are reused and only the rest are created.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    creative_service = mock_dfp_client.return_value.GetService.return_value
+
+    creative_service.getCreativesByStatement = MagicMock(return_value={
+      'totalResultSetSize': 3,
+      'results': [
+        make_snippet_creative(creative_id=111),
+        make_snippet_creative(creative_id=222, snippet='<div></div>'),
+        {'id': 333, 'name': 'A template creative', 'size': {}},
+      ]
+    })
+    creative_service.createCreatives = MagicMock(
+      return_value=[make_snippet_creative(creative_id=444)])
+
+    creative_ids = dfp.create_creatives.get_or_create_creatives(
+      [make_snippet_creative(), make_snippet_creative()])
+
+    self.assertEqual(creative_ids, [111, 444])
+    creative_service.getCreativesByStatement.assert_called_once()
+    creative_service.createCreatives.assert_called_once_with(
+      [make_snippet_creative()])
+
+  def test_get_or_create_creatives_all_reused(self, mock_dfp_client):
+    """
+    Ensure nothing is created when enough matching creatives exist.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    creative_service = mock_dfp_client.return_value.GetService.return_value
+
+    creative_service.getCreativesByStatement = MagicMock(return_value={
+      'totalResultSetSize': 2,
+      'results': [
+        make_snippet_creative(creative_id=111),
+        make_snippet_creative(creative_id=222),
+      ]
+    })
+
+    self.assertEqual(dfp.create_creatives.get_or_create_creatives(
+      [make_snippet_creative(), make_snippet_creative()]), [111, 222])
+    creative_service.createCreatives.assert_not_called()
+
+  def test_get_or_create_creatives_native(self, mock_dfp_client):
+    """
+    Ensure non-snippet creatives are always created without a lookup.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    creative_service = mock_dfp_client.return_value.GetService.return_value
+    configs = dfp.create_creatives.create_native_creative_config(
+      'somebidder', 'An order', 12345, creative_template_id=999)
+    creative_service.createCreatives = MagicMock(
+      return_value=[dict(configs[0], id=555)])
+
+    self.assertEqual(dfp.create_creatives.get_or_create_creatives(configs),
+      [555])
+    creative_service.getCreativesByStatement.assert_not_called()
+
+  def test_get_or_create_creatives_keeps_config_order(self, mock_dfp_client):
+    """
+    Ensure created and reused IDs come back in the order of the configs.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    creative_service = mock_dfp_client.return_value.GetService.return_value
+
+    creative_service.getCreativesByStatement = MagicMock(return_value={
+      'totalResultSetSize': 1,
+      'results': [make_snippet_creative(creative_id=111)]
+    })
+    configs = [
+      dict(make_snippet_creative(snippet='<div></div>'), name='First'),
+      dict(make_snippet_creative(), name='Second'),
+      dict(make_snippet_creative(snippet='<p></p>'), name='Third'),
+    ]
+    creative_service.createCreatives = MagicMock(return_value=[
+      dict(configs[2], id=333),
+      dict(configs[0], id=222),
+    ])
+
+    self.assertEqual(dfp.create_creatives.get_or_create_creatives(configs),
+      [222, 111, 333])
+
+  def test_get_or_create_creatives_skips_rejected(self, mock_dfp_client):
+    """
+    Ensure configs DFP rejected are left out without shifting the others.
+    """
+    mock_dfp_client.return_value = MagicMock()
+    creative_service = mock_dfp_client.return_value.GetService.return_value
+
+    creative_service.getCreativesByStatement = MagicMock(return_value={
+      'totalResultSetSize': 1,
+      'results': [make_snippet_creative(creative_id=111)]
+    })
+    configs = [
+      dict(make_snippet_creative(snippet='<div></div>'), name='First'),
+      dict(make_snippet_creative(snippet='<p></p>'), name='Second'),
+      dict(make_snippet_creative(), name='Third'),
+    ]
+    creative_service.createCreatives = MagicMock(
+      return_value=[dict(configs[1], id=222)])
+
+    self.assertEqual(dfp.create_creatives.get_or_create_creatives(configs),
+      [222, 111])
@@ -111,3 +111,43 @@ class DFPCreateCustomTargetingTests(TestCase):
       )
     
     self.assertEqual(response, 555666777)
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPCreateTargetingValuesTests(TestCase):
+
+  def test_create_targeting_values(self, mock_dfp_client):
+    """
+    Ensure it creates several values in one call and returns their IDs.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingValues) = MagicMock(
+        side_effect=lambda values: [dict(value, id=100 + index)
+          for index, value in enumerate(values)]
+      )
+
+    response = dfp.create_custom_targeting.create_targeting_values(
+      ['0.10', '0.20'], 2468)
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .createCustomTargetingValues.assert_called_once_with([
+        {
+          'customTargetingKeyId': 2468,
+          'displayName': '0.10',
+          'name': '0.10',
+          'matchType': 'EXACT'
+        },
+        {
+          'customTargetingKeyId': 2468,
+          'displayName': '0.20',
+          'name': '0.20',
+          'matchType': 'EXACT'
+        },
+      ])
+      )
+
+    self.assertEqual(response, {'0.10': 100, '0.20': 101})
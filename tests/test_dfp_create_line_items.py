@@ -241,3 +241,49 @@ class DFPCreateLineItemsTests(TestCase):
       [16273849, 444555666, 999888777]
     )
 
+
+
+class DFPLineItemTemplateTests(TestCase):
+
+  def setUp(self):
+    self.template = dfp.create_line_items.LineItemTemplate(order_id=1234567,
+      placement_ids=['one-placement'], ad_unit_ids=['ad-unit'],
+      sizes=[{'width': '728', 'height': '90'}], hb_criteria={999999: 222222},
+      currency_code='USD', creative_template_id=None)
+
+  def test_create_config_matches_create_line_item_config(self):
+    """
+    Ensure a template config is the same as a config built from scratch.
+    """
+    self.assertEqual(
+      self.template.create_config('A Fake Line Item', 24000000,
+        price_criteria={888888: 111111}),
+      dfp.create_line_items.create_line_item_config(name='A Fake Line Item',
+        order_id=1234567, placement_ids=['one-placement'],
+        ad_unit_ids=['ad-unit'], cpm_micro_amount=24000000,
+        sizes=[{'width': '728', 'height': '90'}],
+        hb_criteria={999999: 222222, 888888: 111111}, currency_code='USD',
+        creative_template_id=None))
+
+  def test_create_config_per_price(self):
+    """
+    Ensure configs only share what does not vary by price.
+    """
+    first = self.template.create_config('First', 100000,
+      price_criteria={888888: 111111})
+    second = self.template.create_config('Second', 200000,
+      price_criteria={888888: 333333})
+
+    self.assertEqual(first['name'], 'First')
+    self.assertEqual(first['costPerUnit']['microAmount'], 100000)
+    self.assertEqual(
+      first['targeting']['customTargeting']['children'][1]['valueIds'],
+      [111111])
+    self.assertEqual(
+      second['targeting']['customTargeting']['children'][1]['valueIds'],
+      [333333])
+    self.assertEqual(
+      len(self.template.criteria), 1)
+    self.assertIs(first['targeting']['inventoryTargeting'],
+      second['targeting']['inventoryTargeting'])
+    self.assertIsNot(first['costPerUnit'], second['costPerUnit'])
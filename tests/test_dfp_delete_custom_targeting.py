@@ -0,0 +1,52 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.delete_custom_targeting
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPDeleteCustomTargetingTests(TestCase):
+
+  def test_delete_targeting_values(self, mock_dfp_client):
+    """
+    Ensure it deletes the values of a key with a single action.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .performCustomTargetingValueAction) = MagicMock(
+        return_value={'numChanges': 2})
+
+    num_deleted = dfp.delete_custom_targeting.delete_targeting_values(
+      987654, [111, 222])
+
+    self.assertEqual(num_deleted, 2)
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .performCustomTargetingValueAction.assert_called_once_with(
+        {'xsi_type': 'DeleteCustomTargetingValues'},
+        {
+          'query': ('WHERE customTargetingKeyId = :keyId AND id IN (111, 222) '
+            'LIMIT 500 OFFSET 0'),
+          'values': [{
+            'key': 'keyId',
+            'value': {
+              'xsi_type': 'NumberValue',
+              'value': 987654
+            }
+          }]
+        }))
+
+  def test_delete_no_targeting_values(self, mock_dfp_client):
+    """
+    Ensure it does not call DFP when there is nothing to delete.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    self.assertEqual(
+      dfp.delete_custom_targeting.delete_targeting_values(987654, []), 0)
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .performCustomTargetingValueAction.assert_not_called())
@@ -98,12 +98,12 @@ class DFPGetCustomTargetingTests(TestCase):
       .getCustomTargetingKeysByStatement.assert_called_once()
       )
 
-    # It should not fetch values because the key does not exist.
+    # The first page reports every value, so no further pages are fetched.
     self.assertEqual(
       mock_dfp_client.return_value
         .GetService.return_value
         .getCustomTargetingValuesByStatement.call_count,
-      2
+      1
     )
 
     self.assertEqual(response,
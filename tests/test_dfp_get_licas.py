@@ -0,0 +1,58 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.get_licas
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPGetLICAsTests(TestCase):
+
+  def test_iter_licas(self, mock_dfp_client):
+    """
+    Ensure it filters by line item IDs and yields every association.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemCreativeAssociationsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 2,
+          'startIndex': 0,
+          'results': [
+            {'lineItemId': 111, 'creativeId': 999, 'status': 'ACTIVE'},
+            {'lineItemId': 222, 'creativeId': 999, 'status': 'ACTIVE'},
+          ]
+      })
+
+    licas = list(dfp.get_licas.iter_licas([111, 222],
+      fields=['lineItemId', 'creativeId']))
+
+    self.assertEqual(licas, [
+      {'lineItemId': 111, 'creativeId': 999},
+      {'lineItemId': 222, 'creativeId': 999},
+    ])
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemCreativeAssociationsByStatement.assert_called_once_with({
+        'query': 'WHERE lineItemId IN (111, 222) LIMIT 500 OFFSET 0',
+        'values': None
+      }))
+
+  @patch('dfp.get_licas.LINE_ITEM_IDS_PER_QUERY', 2)
+  def test_iter_licas_chunks_ids(self, mock_dfp_client):
+    """
+    Ensure it splits long lists of line item IDs across statements.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    list(dfp.get_licas.iter_licas([1, 2, 3]))
+
+    calls = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemCreativeAssociationsByStatement.call_args_list)
+    self.assertEqual([call[0][0]['query'] for call in calls], [
+      'WHERE lineItemId IN (1, 2) LIMIT 500 OFFSET 0',
+      'WHERE lineItemId IN (3) LIMIT 500 OFFSET 0',
+    ])
@@ -0,0 +1,126 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.get_line_items
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPGetLineItemsTests(TestCase):
+
+  def test_iter_line_items_by_order(self, mock_dfp_client):
+    """
+    Ensure it filters by order ID and yields every line item.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 2,
+          'startIndex': 0,
+          'results': [
+            {'id': 111, 'name': 'bidder: HB $0.10', 'orderId': 1234},
+            {'id': 222, 'name': 'bidder: HB $0.20', 'orderId': 1234},
+          ]
+      })
+
+    line_items = list(dfp.get_line_items.iter_line_items(order_id=1234))
+
+    self.assertEqual([li['id'] for li in line_items], [111, 222])
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemsByStatement.assert_called_once_with({
+        'query': 'WHERE orderId = :orderId LIMIT 500 OFFSET 0',
+        'values': [{
+          'key': 'orderId',
+          'value': {
+            'xsi_type': 'NumberValue',
+            'value': 1234
+          }
+        }]
+      }))
+
+  def test_iter_line_items_with_query(self, mock_dfp_client):
+    """
+    Ensure it combines the order filter with an extra condition.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    list(dfp.get_line_items.iter_line_items(order_id=1234,
+      query="status = 'DRAFT'"))
+
+    args, kwargs = (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemsByStatement.call_args)
+    self.assertEqual(args[0]['query'],
+      "WHERE orderId = :orderId AND (status = 'DRAFT') LIMIT 500 OFFSET 0")
+
+  def test_iter_line_items_fields(self, mock_dfp_client):
+    """
+    Ensure it only keeps the requested fields.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 1,
+          'startIndex': 0,
+          'results': [{
+            'id': 111,
+            'name': 'bidder: HB $0.10',
+            'targeting': {'inventoryTargeting': {}},
+          }]
+      })
+
+    line_items = list(dfp.get_line_items.iter_line_items(
+      fields=['id', 'name']))
+
+    self.assertEqual(line_items, [{'id': 111, 'name': 'bidder: HB $0.10'}])
+
+  def test_get_line_item_index(self, mock_dfp_client):
+    """
+    Ensure it indexes every name, and the values of line items with the
+    given criteria.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    def line_item(name, bidder_value_id, price_value_id):
+      return {
+        'id': 1,
+        'name': name,
+        'targeting': {
+          'customTargeting': {
+            'logicalOperator': 'AND',
+            'children': [
+              {'keyId': 77, 'valueIds': [bidder_value_id]},
+              {'keyId': 88, 'valueIds': [price_value_id]},
+            ]
+          }
+        }
+      }
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getLineItemsByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 2,
+          'startIndex': 0,
+          'results': [
+            line_item('bidder: HB $0.10', 1, 1010),
+            line_item('other: HB $0.20', 2, 1020),
+          ]
+      })
+
+    index = dfp.get_line_items.get_line_item_index(1234, 88,
+      criteria={77: 1})
+
+    self.assertEqual(index.names,
+      frozenset(['bidder: HB $0.10', 'other: HB $0.20']))
+    self.assertEqual(index.value_ids, frozenset([1010]))
+    self.assertTrue(index.contains('other: HB $0.20', 1030))
+    self.assertTrue(index.contains('bidder: HB $0.30', 1010))
+    self.assertFalse(index.contains('bidder: HB $0.20', 1020))
@@ -171,3 +171,37 @@ class DFPServiceTests(TestCase):
 
     order = dfp.get_orders.get_order_by_name('A new order')
     self.assertIsNone(order)
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPIterOrdersTests(TestCase):
+
+  def test_iter_orders_fields(self, mock_dfp_client):
+    """
+    Ensure `iter_orders` filters and projects orders.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getOrdersByStatement) = MagicMock(
+        return_value={
+          'totalResultSetSize': 1,
+          'startIndex': 0,
+          'results': [{
+            'id': 152637489,
+            'name': 'My Fake Order',
+            'status': 'DRAFT',
+          }]
+      }
+    )
+
+    orders = list(dfp.get_orders.iter_orders("status = 'DRAFT'",
+      fields=['id']))
+    self.assertEqual(orders, [{'id': 152637489}])
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .getOrdersByStatement.assert_called_once_with({
+        'query': "WHERE status = 'DRAFT' LIMIT 500 OFFSET 0",
+        'values': None
+      }))
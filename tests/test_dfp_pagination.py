@@ -0,0 +1,113 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+from googleads import ad_manager
+
+import dfp.pagination
+from dfp.exceptions import BadSettingException
+
+
+def make_fetch_page(num_results, include_total=True):
+  """
+  Returns a fake *ByStatement method serving `num_results` integers.
+  """
+  def fetch_page(statement):
+    limit, offset = [int(part) for part in
+      statement['query'].split('LIMIT ')[1].split(' OFFSET ')]
+    page = list(range(offset, min(offset + limit, num_results)))
+    response = {'startIndex': offset}
+    if include_total:
+      response['totalResultSetSize'] = num_results
+    if page:
+      response['results'] = page
+    return response
+  return MagicMock(side_effect=fetch_page)
+
+
+class DFPPaginationTests(TestCase):
+
+  def test_single_page(self):
+    """
+    Ensure it makes one call when the first page holds every result.
+    """
+    fetch_page = make_fetch_page(3)
+    results = list(dfp.pagination.iter_results(fetch_page,
+      ad_manager.FilterStatement()))
+
+    self.assertEqual(results, [0, 1, 2])
+    fetch_page.assert_called_once_with(
+      {'query': ' LIMIT 500 OFFSET 0', 'values': None})
+
+  def test_no_results(self):
+    """
+    Ensure it yields nothing when there are no results.
+    """
+    fetch_page = make_fetch_page(0)
+    results = list(dfp.pagination.iter_results(fetch_page,
+      ad_manager.FilterStatement()))
+
+    self.assertEqual(results, [])
+    fetch_page.assert_called_once()
+
+  def test_fan_out_by_total(self):
+    """
+    Ensure it fetches every remaining offset exactly once, in order.
+    """
+    fetch_page = make_fetch_page(23)
+    results = list(dfp.pagination.iter_results(fetch_page,
+      ad_manager.FilterStatement('WHERE id > 0'), page_size=5, max_workers=2))
+
+    self.assertEqual(results, list(range(23)))
+    queries = sorted(call[0][0]['query'] for call in fetch_page.call_args_list)
+    self.assertEqual(queries, [
+      'WHERE id > 0 LIMIT 5 OFFSET 0',
+      'WHERE id > 0 LIMIT 5 OFFSET 10',
+      'WHERE id > 0 LIMIT 5 OFFSET 15',
+      'WHERE id > 0 LIMIT 5 OFFSET 20',
+      'WHERE id > 0 LIMIT 5 OFFSET 5',
+    ])
+
+  def test_sequential_without_total(self):
+    """
+    Ensure it pages until a short page when the total is unknown.
+    """
+    fetch_page = make_fetch_page(10, include_total=False)
+    results = list(dfp.pagination.iter_results(fetch_page,
+      ad_manager.FilterStatement(), page_size=4))
+
+    self.assertEqual(results, list(range(10)))
+    self.assertEqual(fetch_page.call_count, 3)
+
+  def test_stops_when_closed_early(self):
+    """
+    Ensure it does not fetch pages past what the pool has in flight when
+    the caller stops iterating.
+    """
+    fetch_page = make_fetch_page(1000)
+    results = dfp.pagination.iter_results(fetch_page,
+      ad_manager.FilterStatement(), page_size=10, max_workers=2)
+    self.assertEqual(next(results), 0)
+    results.close()
+
+    self.assertLessEqual(fetch_page.call_count, 3)
+
+  @patch('settings.DFP_PAGE_SIZE', 50, create=True)
+  def test_page_size_from_settings(self):
+    """
+    Ensure we use the page size setting if it exists.
+    """
+    fetch_page = make_fetch_page(0)
+    list(dfp.pagination.iter_results(fetch_page,
+      ad_manager.FilterStatement()))
+
+    fetch_page.assert_called_once_with(
+      {'query': ' LIMIT 50 OFFSET 0', 'values': None})
+
+  def test_page_size_too_large(self):
+    """
+    It throws an exception when the page size exceeds the API maximum.
+    """
+    with self.assertRaises(BadSettingException):
+      list(dfp.pagination.iter_results(make_fetch_page(0),
+        ad_manager.FilterStatement(), page_size=5000))
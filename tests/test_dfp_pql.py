@@ -0,0 +1,99 @@
+
+from unittest import TestCase
+from mock import MagicMock, patch
+
+import dfp.pql
+
+
+def make_row(*values):
+  return {'values': list(values)}
+
+
+@patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+class DFPPQLTests(TestCase):
+
+  def test_iter_rows_call(self, mock_dfp_client):
+    """
+    Ensure it selects only the requested columns.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    list(dfp.pql.iter_rows(dfp.pql.LINE_ITEM_TABLE, ['Id', 'Name'],
+      'OrderId = 1234'))
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .select.assert_called_once_with({
+        'query': ('SELECT Id, Name FROM Line_Item WHERE OrderId = 1234 '
+          'LIMIT 500 OFFSET 0'),
+        'values': None
+      }))
+
+  def test_iter_rows_returns_tuples(self, mock_dfp_client):
+    """
+    Ensure rows come back as tuples of plain values.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .select) = MagicMock(return_value={
+        'columnTypes': [
+          {'labelName': 'Id'},
+          {'labelName': 'Name'},
+          {'labelName': 'IsMissingCreatives'},
+        ],
+        'rows': [
+          make_row(
+            {'xsi_type': 'NumberValue', 'value': '111'},
+            {'xsi_type': 'TextValue', 'value': 'bidder: HB $0.10'},
+            {'xsi_type': 'BooleanValue', 'value': False}),
+          make_row(
+            {'xsi_type': 'NumberValue', 'value': '222'},
+            {'xsi_type': 'TextValue', 'value': 'bidder: HB $0.20'},
+            {'xsi_type': 'BooleanValue', 'value': 'true'}),
+        ]
+      })
+
+    rows = list(dfp.pql.iter_rows(dfp.pql.LINE_ITEM_TABLE,
+      ['Id', 'Name', 'IsMissingCreatives']))
+
+    self.assertEqual(rows, [
+      (111, 'bidder: HB $0.10', False),
+      (222, 'bidder: HB $0.20', True),
+    ])
+
+  def test_iter_rows_pages_until_short_page(self, mock_dfp_client):
+    """
+    Ensure it keeps paging while pages come back full.
+    """
+    mock_dfp_client.return_value = MagicMock()
+
+    (mock_dfp_client.return_value
+      .GetService.return_value
+      .select) = MagicMock(side_effect=[
+        {'rows': [make_row({'xsi_type': 'NumberValue', 'value': '1'}),
+          make_row({'xsi_type': 'NumberValue', 'value': '2'})]},
+        {'rows': [make_row({'xsi_type': 'NumberValue', 'value': '3'})]},
+      ])
+
+    rows = list(dfp.pql.iter_rows(dfp.pql.ORDER_TABLE, ['Id'], page_size=2))
+
+    self.assertEqual(rows, [(1,), (2,), (3,)])
+    self.assertEqual(
+      mock_dfp_client.return_value.GetService.return_value.select.call_count,
+      2)
+
+  def test_convert_value(self, mock_dfp_client):
+    """
+    It returns the expected conversion.
+    """
+    self.assertEqual(dfp.pql.convert_value(
+      {'xsi_type': 'NumberValue', 'value': '2.5'}), 2.5)
+    self.assertEqual(dfp.pql.convert_value(
+      {'xsi_type': 'SetValue', 'values': [
+        {'xsi_type': 'NumberValue', 'value': '1'},
+        {'xsi_type': 'NumberValue', 'value': '2'},
+      ]}), (1, 2))
+    self.assertIsNone(dfp.pql.convert_value({'xsi_type': 'TextValue'}))
+    self.assertIsNone(dfp.pql.convert_value(None))
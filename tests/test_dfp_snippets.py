@@ -0,0 +1,68 @@
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import patch
+
+import dfp.snippets
+from dfp.exceptions import BadSettingException
+
+
+SNIPPET = ('<script>renderAd("%%PATTERN:hb_adid%%", "%%PATTERN:url%%", '
+  '"%%PATTERN:hb_cache_id%%");</script>')
+
+
+class DFPSnippetsTests(TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.snippet_path = os.path.join(self.tmp_dir, 'snippet.html')
+    self.write_snippet(SNIPPET)
+    dfp.snippets.clear_snippet_templates()
+
+  def tearDown(self):
+    dfp.snippets.clear_snippet_templates()
+    shutil.rmtree(self.tmp_dir)
+
+  def write_snippet(self, text, mtime=None):
+    with open(self.snippet_path, 'w') as snippet_file:
+      snippet_file.write(text)
+    if mtime is not None:
+      os.utime(self.snippet_path, (mtime, mtime))
+
+  def test_render_default(self):
+    """
+    Ensure the default rendering is the file as is.
+    """
+    template = dfp.snippets.get_snippet_template(self.snippet_path)
+    self.assertEqual(template.render(), SNIPPET)
+    self.assertEqual(template.macros, ('hb_adid', 'url', 'hb_cache_id'))
+
+  def test_loads_once(self):
+    """
+    Ensure the file is read only once while it does not change.
+    """
+    template = dfp.snippets.get_snippet_template(self.snippet_path)
+    with patch('dfp.snippets.open', create=True) as mock_open:
+      self.assertIs(dfp.snippets.get_snippet_template(self.snippet_path),
+        template)
+      mock_open.assert_not_called()
+
+  def test_reloads_on_change(self):
+    """
+    Ensure the file is read again when its modification time changes.
+    """
+    self.write_snippet(SNIPPET, mtime=1000000000)
+    dfp.snippets.get_snippet_template(self.snippet_path)
+    self.write_snippet('<div>%%PATTERN:hb_pb%%</div>', mtime=1000000100)
+    template = dfp.snippets.get_snippet_template(self.snippet_path)
+    self.assertEqual(template.render(), '<div>%%PATTERN:hb_pb%%</div>')
+
+  def test_malformed_macro(self):
+    """
+    Ensure an unterminated macro is rejected.
+    """
+    self.write_snippet('<div>%%PATTERN:hb_pb</div>')
+    with self.assertRaises(BadSettingException):
+      dfp.snippets.get_snippet_template(self.snippet_path)
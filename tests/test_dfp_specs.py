@@ -0,0 +1,66 @@
+
+from unittest import TestCase
+
+import dfp.create_line_items
+from dfp.specs import CreativeSpec, LicaSpec, LineItemSpec, to_soap
+
+
+class DFPSpecsTests(TestCase):
+
+  def test_line_item_spec(self):
+    """
+    Ensure a line item spec converts to the template's config.
+    """
+    template = dfp.create_line_items.LineItemTemplate(order_id=1234567,
+      placement_ids=['one-placement'], ad_unit_ids=None,
+      sizes=[{'width': '728', 'height': '90'}], hb_criteria={999999: 222222},
+      currency_code='USD', creative_template_id=None)
+    spec = LineItemSpec(template, 'A Fake Line Item', 24000000,
+      ((888888, 111111),))
+
+    self.assertEqual(to_soap(spec),
+      template.create_config('A Fake Line Item', 24000000, {888888: 111111}))
+
+  def test_creative_spec(self):
+    """
+    Ensure a creative spec converts to a ThirdPartyCreative.
+    """
+    spec = CreativeSpec('My Creative', 1234567, '<script></script>', '1', '1',
+      True)
+    self.assertEqual(spec.to_soap(), {
+      'xsi_type': 'ThirdPartyCreative',
+      'name': 'My Creative',
+      'advertiserId': 1234567,
+      'size': {'width': '1', 'height': '1'},
+      'snippet': '<script></script>',
+      'isSafeFrameCompatible': True,
+    })
+
+  def test_lica_spec(self):
+    """
+    Ensure a LICA spec converts to an association with a list of sizes.
+    """
+    sizes = ({'width': '300', 'height': '250'},)
+    self.assertEqual(LicaSpec(111, 222, sizes).to_soap(), {
+      'creativeId': 222,
+      'lineItemId': 111,
+      'sizes': [{'width': '300', 'height': '250'}],
+    })
+    self.assertIsNone(LicaSpec(111, 222, None).to_soap()['sizes'])
+
+  def test_specs_are_immutable(self):
+    """
+    Ensure specs cannot be changed or given new attributes.
+    """
+    spec = LicaSpec(111, 222, None)
+    with self.assertRaises(AttributeError):
+      spec.creative_id = 333
+    with self.assertRaises(AttributeError):
+      spec.extra = True
+
+  def test_to_soap_passes_dicts_through(self):
+    """
+    Ensure plain config dicts are submitted as they are.
+    """
+    config = {'name': 'A config'}
+    self.assertIs(to_soap(config), config)
@@ -0,0 +1,118 @@
+
+import os
+import shutil
+import stat
+import tempfile
+import time
+from threading import Thread
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.token_cache
+from dfp.token_cache import (
+  REFRESH_MARGIN_SECONDS,
+  CachedServiceAccountClient,
+  TokenCache,
+)
+
+
+class DFPTokenCacheTests(TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, 'tokens.json')
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+    dfp.token_cache._caches.clear()
+
+  def test_get_token_shared(self):
+    """
+    It fetches a token once and shares it with other caches of the file,
+    as in other processes.
+    """
+    fetch_token = MagicMock(return_value=('abc123', time.time() + 3600))
+    self.assertEqual(TokenCache(self.path).get_token('key', fetch_token),
+      'abc123')
+    self.assertEqual(TokenCache(self.path).get_token('key', fetch_token),
+      'abc123')
+    fetch_token.assert_called_once_with()
+    self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+  def test_get_token_expiring(self):
+    """
+    It fetches a new token shortly before the cached one expires.
+    """
+    cache = TokenCache(self.path)
+    cache.get_token('key', MagicMock(
+      return_value=('old', time.time() + REFRESH_MARGIN_SECONDS - 1)))
+    fetch_token = MagicMock(return_value=('new', time.time() + 3600))
+    self.assertEqual(cache.get_token('key', fetch_token), 'new')
+    self.assertEqual(TokenCache(self.path).load()['key']['token'], 'new')
+
+  def test_get_token_concurrent(self):
+    """
+    Concurrent clients wait for one fetch rather than each fetching.
+    """
+    def fetch_token():
+      time.sleep(0.05)
+      return 'abc123', time.time() + 3600
+    fetch_token = MagicMock(side_effect=fetch_token)
+
+    tokens = []
+    threads = [Thread(target=lambda: tokens.append(
+      TokenCache(self.path).get_token('key', fetch_token)))
+      for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(tokens, ['abc123'] * 8)
+    fetch_token.assert_called_once_with()
+
+  def test_refresh(self):
+    """
+    Refreshing the client replaces the cached token.
+    """
+    cache = TokenCache(self.path)
+    client = CachedServiceAccountClient('./key.json',
+      'https://www.googleapis.com/auth/dfp', cache)
+    with patch.object(client, 'fetch_token',
+      side_effect=[('old', time.time() + 3600), ('new', time.time() + 3600)]):
+      self.assertEqual(client.CreateHttpHeader(),
+        {'authorization': 'Bearer old'})
+      client.Refresh()
+      self.assertEqual(client.CreateHttpHeader(),
+        {'authorization': 'Bearer new'})
+
+  @patch('googleads.ad_manager.AdManagerClient')
+  def test_get_client(self, mock_ad_manager_client):
+    """
+    get_client builds clients with the token cache if there is one.
+    """
+    googleads_yaml = {'ad_manager': {'application_name': 'My App',
+      'network_code': '1234', 'path_to_private_key_file': './key.json'}}
+    with patch.multiple('settings', GOOGLEADS_YAML=googleads_yaml,
+      DFP_TOKEN_CACHE_FILE=self.path, create=True):
+      dfp.client.get_client()
+      dfp.client.get_client()
+
+    self.assertEqual(mock_ad_manager_client.call_count, 2)
+    mock_ad_manager_client.LoadFromString.assert_not_called()
+    first_client, second_client = [args[0]
+      for args, kwargs in mock_ad_manager_client.call_args_list]
+    self.assertIsInstance(first_client, CachedServiceAccountClient)
+    self.assertIs(first_client.cache, second_client.cache)
+    args, kwargs = mock_ad_manager_client.call_args
+    self.assertEqual(args[1], 'My App')
+    self.assertEqual(kwargs['network_code'], '1234')
+
+    # googleads handles proxies itself.
+    googleads_yaml = dict(googleads_yaml,
+      proxy_config={'http': 'proxy:3128'})
+    with patch.multiple('settings', GOOGLEADS_YAML=googleads_yaml,
+      DFP_TOKEN_CACHE_FILE=self.path, create=True):
+      dfp.client.get_client()
+    mock_ad_manager_client.LoadFromString.assert_called_once()
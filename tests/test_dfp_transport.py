@@ -0,0 +1,114 @@
+
+from unittest import TestCase
+
+import requests
+import yaml
+from mock import MagicMock, patch
+
+import dfp.client
+import dfp.transport
+from dfp.exceptions import BadSettingException
+from dfp.transport import PooledClient
+
+
+class DFPTransportTests(TestCase):
+
+  def tearDown(self):
+    dfp.transport.close_session()
+
+  def test_pool_size(self):
+    """
+    It defaults to the most requests made at once, and uses the setting.
+    """
+    with patch.multiple('settings', DFP_HTTP_POOL_SIZE=None,
+      DFP_PAGE_WORKERS=None, DFP_MAX_CONCURRENT_REQUESTS=12, create=True):
+      self.assertEqual(dfp.transport.get_pool_size(), 12)
+    with patch.multiple('settings', DFP_HTTP_POOL_SIZE=None,
+      DFP_PAGE_WORKERS=None, DFP_MAX_CONCURRENT_REQUESTS=None, create=True):
+      self.assertEqual(dfp.transport.get_pool_size(),
+        dfp.transport.DEFAULT_POOL_SIZE)
+    with patch('settings.DFP_HTTP_POOL_SIZE', 2, create=True):
+      self.assertEqual(dfp.transport.get_pool_size(), 2)
+    with self.assertRaises(BadSettingException):
+      dfp.transport.get_pool_size(0)
+
+  def test_create_session(self):
+    """
+    It keeps `pool_size` connections alive for API requests.
+    """
+    session = dfp.transport.create_session(6)
+    adapter = session.get_adapter('https://ads.google.com/apis/ads/publisher')
+    self.assertEqual(adapter._pool_maxsize, 6)
+    self.assertEqual(adapter._pool_connections, 6)
+    session.close()
+
+  def test_pooled_client(self):
+    """
+    Services from the client send requests through the shared session, with
+    their proxies.
+    """
+    service = MagicMock()
+    own_session = requests.Session()
+    own_session.proxies = {'https': 'http://proxy:3128'}
+    service.zeep_client.transport.session = own_session
+    client = MagicMock()
+    client.GetService.return_value = service
+
+    session = dfp.transport.get_session()
+    pooled_client = PooledClient(client, session)
+    self.assertIs(pooled_client.GetService('OrderService', version='v201908'),
+      service)
+    client.GetService.assert_called_once_with('OrderService',
+      version='v201908')
+    self.assertIs(service.zeep_client.transport.session, session)
+    self.assertEqual(session.proxies, {'https': 'http://proxy:3128'})
+    self.assertIs(dfp.transport.get_session(), session)
+
+  def test_pooled_client_ssl_settings(self):
+    """
+    The shared session keeps the CA bundle and client certificate googleads
+    configured the service's own session with.
+    """
+    service = MagicMock()
+    own_session = requests.Session()
+    own_session.verify = '/etc/ssl/corporate-ca.pem'
+    own_session.cert = ('/etc/ssl/client.pem', '/etc/ssl/client.key')
+    service.zeep_client.transport.session = own_session
+    client = MagicMock()
+    client.GetService.return_value = service
+
+    session = dfp.transport.get_session()
+    PooledClient(client, session).GetService('OrderService',
+      version='v201908')
+    self.assertIs(service.zeep_client.transport.session, session)
+    self.assertEqual(session.verify, '/etc/ssl/corporate-ca.pem')
+    self.assertEqual(session.cert,
+      ('/etc/ssl/client.pem', '/etc/ssl/client.key'))
+
+  @patch('googleads.ad_manager.AdManagerClient.LoadFromString')
+  def test_get_client_compression(self, mock_load_from_string):
+    """
+    Clients ask for gzip-compressed responses unless told otherwise.
+    """
+    def loaded_yaml():
+      args, kwargs = mock_load_from_string.call_args
+      return yaml.safe_load(args[0])['ad_manager']
+
+    googleads_yaml = {'ad_manager': {'application_name': 'My App'}}
+    with patch('settings.GOOGLEADS_YAML', googleads_yaml, create=True):
+      client = dfp.client.get_client()
+      self.assertIsInstance(client, PooledClient)
+      self.assertTrue(loaded_yaml()['enable_compression'])
+
+      with patch('settings.DFP_ENABLE_COMPRESSION', False, create=True):
+        dfp.client.get_client()
+      self.assertFalse(loaded_yaml()['enable_compression'])
+    # The settings themselves are left alone.
+    self.assertEqual(googleads_yaml,
+      {'ad_manager': {'application_name': 'My App'}})
+
+    googleads_yaml = {'ad_manager': {'application_name': 'My App',
+      'enable_compression': False}}
+    with patch('settings.GOOGLEADS_YAML', googleads_yaml, create=True):
+      dfp.client.get_client()
+    self.assertFalse(loaded_yaml()['enable_compression'])
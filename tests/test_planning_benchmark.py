@@ -0,0 +1,36 @@
+
+from unittest import TestCase
+
+from benchmarks.planning_benchmark import (
+  BENCHMARKS,
+  get_mode,
+  measure,
+  run_benchmark,
+)
+
+
+class PlanningBenchmarkTests(TestCase):
+
+  def test_budgets(self):
+    """
+    Each planning step stays within its memory and time budgets, at the
+    sizes of PLANNING_BENCHMARK_MODE (quick by default).
+    """
+    mode = get_mode()
+    for benchmark in BENCHMARKS:
+      with self.subTest(benchmark.name):
+        result = run_benchmark(benchmark, mode, repeat=1)
+        self.assertLessEqual(result.peak_bytes, result.max_bytes,
+          '{0} used {1:,} bytes at peak for {2:,} {3}s'.format(result.name,
+            result.peak_bytes, result.size, result.item))
+        self.assertLessEqual(result.seconds, result.max_seconds,
+          '{0} took {1:.3f} s for {2:,} {3}s'.format(result.name,
+            result.seconds, result.size, result.item))
+
+  def test_measure(self):
+    """
+    The peak includes what the function allocates.
+    """
+    seconds, peak_bytes = measure(lambda: bytearray(10 ** 6), repeat=1)
+    self.assertGreaterEqual(peak_bytes, 10 ** 6)
+    self.assertGreaterEqual(seconds, 0)
@@ -0,0 +1,99 @@
+
+from unittest import TestCase
+
+from mock import patch
+
+from dfp.exceptions import BadSettingException
+from tasks.prebid_buckets import (
+  PREBID_GRANULARITIES,
+  CpmBucketIndex,
+  find_unmatched_cpms,
+  js_to_fixed,
+  main,
+  to_prebid_config,
+)
+
+
+class PrebidBucketsTests(TestCase):
+
+  def test_js_to_fixed(self):
+    """
+    It rounds exact binary ties away from zero, like JavaScript.
+    """
+    self.assertEqual(js_to_fixed(0.125, 2), '0.13')
+    self.assertEqual(js_to_fixed(2.5, 0), '3')
+    # 1.005 is really 1.00499999999999989..., so it rounds down.
+    self.assertEqual(js_to_fixed(1.005, 2), '1.00')
+    self.assertEqual(js_to_fixed(20, 2), '20.00')
+
+  def test_get_hb_pb(self):
+    """
+    It rounds CPMs down to their bucket and caps them at the top bucket.
+    """
+    index = CpmBucketIndex(PREBID_GRANULARITIES['auto'])
+    self.assertEqual(index.get_hb_pb(0), '0.00')
+    self.assertEqual(index.get_hb_pb(4.01), '4.00')
+    self.assertEqual(index.get_hb_pb(4.99), '4.95')
+    self.assertEqual(index.get_hb_pb(5), '5.00')
+    self.assertEqual(index.get_hb_pb(5.17), '5.10')
+    self.assertEqual(index.get_hb_pb(19.99), '19.50')
+    self.assertEqual(index.get_hb_pb(35), '20.00')
+    self.assertEqual(index.get_hb_pb(-1), '')
+
+  def test_get_hb_pb_bucket_floor(self):
+    """
+    It starts each bucket at the previous bucket's max, ignoring `min`.
+    """
+    index = CpmBucketIndex({'buckets': [
+      {'precision': 2, 'min': 1, 'max': 5, 'increment': 0.5},
+    ]})
+    self.assertEqual(index.get_hb_pb(0.75), '0.50')
+
+  def test_get_hb_pb_multiplier(self):
+    """
+    It scales every bucket by the granularity multiplier.
+    """
+    index = CpmBucketIndex(PREBID_GRANULARITIES['low'], 2)
+    self.assertEqual(index.get_hb_pb(1.9), '1.00')
+    self.assertEqual(index.get_hb_pb(9.9), '9.00')
+    self.assertEqual(index.get_hb_pb(12), '10.00')
+
+  def test_bad_config(self):
+    """
+    It rejects granularities Prebid would ignore or misread.
+    """
+    with self.assertRaises(BadSettingException):
+      CpmBucketIndex({'buckets': [{'max': 5}]})
+    with self.assertRaises(BadSettingException):
+      CpmBucketIndex({'buckets': [
+        {'max': 10, 'increment': 0.1},
+        {'max': 5, 'increment': 0.05},
+      ]})
+
+  def test_to_prebid_config(self):
+    config = to_prebid_config(
+      {'precision': 2, 'min': 0, 'max': 20, 'increment': 0.1})
+    self.assertEqual(config, {'buckets': [
+      {'precision': 2, 'min': 0, 'max': 20, 'increment': 0.1},
+    ]})
+
+  def test_find_unmatched_cpms(self):
+    """
+    It counts the CPMs whose hb_pb value has no line item.
+    """
+    index = CpmBucketIndex(PREBID_GRANULARITIES['low'])
+    num_checked, unmatched = find_unmatched_cpms(index,
+      [0.2, 0.6, 0.7, 1.2, 9], {'0.00', '0.50', '5.00'})
+    self.assertEqual(num_checked, 5)
+    self.assertEqual(dict(unmatched), {'1.00': 1})
+
+  @patch('settings.PREBID_PRICE_BUCKETS',
+    {'precision': 2, 'min': 0, 'max': 20, 'increment': 0.10}, create=True)
+  def test_main(self):
+    """
+    It passes when the granularity matches the ladder and fails when it is
+    finer.
+    """
+    self.assertEqual(main(['--samples', '1000', '--seed', '1']), 0)
+    self.assertEqual(main(['--granularity', 'dense', '--samples', '1000',
+      '--seed', '1']), 1)
@@ -0,0 +1,119 @@
+
+import logging
+from threading import Event
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import settings
+import tasks.add_new_prebid_partner
+from tasks.prefetch import Prefetch
+
+
+logger = logging.getLogger(__name__)
+
+class PrefetchTests(TestCase):
+
+  def test_get_prefetched(self):
+    """
+    It returns prefetched results without calling the function again.
+    """
+    lookup = MagicMock(return_value=14523)
+    prefetch = Prefetch()
+    prefetch.submit('user_id', lookup, 'fakeuser@example.com')
+    self.assertEqual(prefetch.get('user_id', lookup, 'fakeuser@example.com'),
+      14523)
+    lookup.assert_called_once_with('fakeuser@example.com')
+    prefetch.close()
+
+  def test_get_not_prefetched(self):
+    """
+    It calls the function when nothing was prefetched.
+    """
+    lookup = MagicMock(return_value=14523)
+    self.assertEqual(Prefetch().get('user_id', lookup, 'a@example.com'), 14523)
+    lookup.assert_called_once_with('a@example.com')
+
+  def test_get_raises(self):
+    """
+    It raises lookup errors when the result is wanted.
+    """
+    prefetch = Prefetch()
+    prefetch.submit('user_id', MagicMock(side_effect=ValueError('No user')))
+    with self.assertRaises(ValueError):
+      prefetch.get('user_id', MagicMock())
+    prefetch.close()
+
+  def test_close_cancels(self):
+    """
+    It cancels lookups that have not started.
+    """
+    started = Event()
+    release = Event()
+
+    def block():
+      started.set()
+      release.wait(5)
+
+    lookup = MagicMock()
+    prefetch = Prefetch(max_workers=1)
+    prefetch.submit('first', block)
+    prefetch.submit('second', lookup)
+    started.wait(5)
+    prefetch.close()
+    release.set()
+    lookup.assert_not_called()
+
+  def test_defers_logs(self):
+    """
+    It holds back messages logged by lookups until results are used.
+    """
+    handler = logging.Handler()
+    handler.emit = MagicMock()
+    logging.getLogger().addHandler(handler)
+    # The test package disables logging.
+    logging.disable(logging.NOTSET)
+    try:
+      prefetch = Prefetch()
+      prefetch.submit('lookup', logger.warning, 'Found it.')
+      prefetch.futures['lookup'].result()
+      handler.emit.assert_not_called()
+
+      prefetch.get('lookup', MagicMock())
+      handler.emit.assert_called_once()
+      prefetch.close()
+    finally:
+      logging.disable(logging.CRITICAL)
+      logging.getLogger().removeHandler(handler)
+
+  @patch.multiple('settings',
+    DFP_USER_EMAIL_ADDRESS='fakeuser@example.com',
+    DFP_ADVERTISER_NAME='My Advertiser',
+    DFP_ORDER_NAME='My Cool Order',
+    DFP_TARGETED_PLACEMENT_NAMES=['My Site Leaderboard'],
+    DFP_TARGETED_AD_UNIT_NAMES=[],
+    DFP_PLACEMENT_SIZES=[{'width': '300', 'height': '250'}],
+    PREBID_BIDDER_CODE='mypartner',
+    PREBID_PRICE_BUCKETS={'precision': 2, 'min': 0, 'max': 1,
+      'increment': 0.10},
+    create=True)
+  @patch('tasks.add_new_prebid_partner.setup_partner')
+  @patch('tasks.add_new_prebid_partner.start_prefetch')
+  def test_main_prefetch(self, mock_start_prefetch, mock_setup_partner):
+    """
+    The setup uses the lookups started before the prompt, and they are
+    closed whatever the answer.
+    """
+    with patch('tasks.add_new_prebid_partner.input', return_value='n'):
+      tasks.add_new_prebid_partner.main()
+    mock_setup_partner.assert_not_called()
+    mock_start_prefetch.return_value.close.assert_called_once()
+    args, kwargs = mock_start_prefetch.call_args
+    self.assertEqual(sorted(args[4]), ['hb_bidder', 'hb_pb'])
+
+    mock_start_prefetch.reset_mock()
+    with patch('tasks.add_new_prebid_partner.input', return_value='y'):
+      tasks.add_new_prebid_partner.main()
+    args, kwargs = mock_setup_partner.call_args
+    self.assertIs(kwargs['prefetch'], mock_start_prefetch.return_value)
+    mock_start_prefetch.return_value.close.assert_called_once()
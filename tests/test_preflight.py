@@ -0,0 +1,106 @@
+
+from unittest import TestCase
+
+from mock import patch
+
+from dfp.call_history import CallHistory
+from tasks.preflight import (
+  estimate_setup,
+  format_duration,
+  plan_setup_calls,
+)
+
+
+def get_num_calls(calls, method):
+  return sum(planned.num_calls for planned in calls if planned.method == method)
+
+
+class PreflightTests(TestCase):
+
+  def plan(self, history, is_native=False):
+    return plan_setup_calls(history,
+      num_placements=2,
+      num_ad_units=1,
+      criteria_values={
+        'hb_bidder': ['mypartner'],
+        'hb_pb': ['0.00', '0.10', '0.20'],
+      },
+      num_line_items=3,
+      num_creatives=2,
+      is_native=is_native)
+
+  def test_plan_unknown_values(self):
+    """
+    It counts every value as new when a key's values are unknown.
+    """
+    calls, unknown_keys = self.plan(CallHistory())
+    self.assertEqual(unknown_keys, ['hb_bidder', 'hb_pb'])
+    # Each key's new values are created in one batch.
+    self.assertEqual(get_num_calls(calls,
+      'CustomTargetingService.createCustomTargetingValues'), 2)
+    self.assertEqual(get_num_calls(calls,
+      'PlacementService.getPlacementsByStatement'), 2)
+    self.assertEqual(get_num_calls(calls,
+      'CustomTargetingService.getCustomTargetingKeysByStatement'), 6)
+
+    licas, = [planned for planned in calls if planned.method ==
+      'LineItemCreativeAssociationService.createLineItemCreativeAssociations']
+    self.assertEqual(licas.num_items, 6)
+
+  def test_plan_known_values(self):
+    """
+    It only counts values that were not seen before.
+    """
+    history = CallHistory()
+    history.record_values('hb_bidder', ['mypartner'])
+    history.record_values('hb_pb', ['0.00', '0.10'])
+    calls, unknown_keys = self.plan(history)
+    self.assertEqual(unknown_keys, [])
+    self.assertEqual(get_num_calls(calls,
+      'CustomTargetingService.createCustomTargetingValues'), 1)
+
+  def test_plan_batches(self):
+    """
+    It plans the create calls in batches of the initial batch size.
+    """
+    with patch('settings.DFP_INITIAL_BATCH_SIZE', 2, create=True):
+      calls, _ = self.plan(CallHistory())
+    self.assertEqual([(planned.num_calls, planned.num_items)
+      for planned in calls
+      if planned.method == 'LineItemService.createLineItems'],
+      [(1, 2), (1, 1)])
+    self.assertEqual(get_num_calls(calls,
+      'LineItemCreativeAssociationService.createLineItemCreativeAssociations'),
+      3)
+
+  def test_plan_native(self):
+    """
+    It does not look for reusable creatives for native setups.
+    """
+    calls, _ = self.plan(CallHistory(), is_native=True)
+    self.assertEqual(
+      get_num_calls(calls, 'CreativeService.getCreativesByStatement'), 0)
+
+  def test_estimate(self):
+    """
+    It sums the estimated latency of every call.
+    """
+    history = CallHistory()
+    history.record('LineItemService.createLineItems', 30.0, 3)
+    estimate = estimate_setup(history,
+      num_placements=1,
+      num_ad_units=0,
+      criteria_values={'hb_pb': ['0.00']},
+      num_line_items=3,
+      num_creatives=1,
+      is_native=False)
+    calls, _ = plan_setup_calls(history, 1, 0, {'hb_pb': ['0.00']}, 3, 1, False)
+    self.assertEqual(estimate.calls, calls)
+    self.assertEqual(estimate.num_calls, 14)
+    self.assertEqual(estimate.num_created, 9)
+    self.assertGreater(estimate.seconds, 30.0)
+
+  def test_format_duration(self):
+    self.assertEqual(format_duration(42.4), '42 s')
+    self.assertEqual(format_duration(250), '4 min 10 s')
+    self.assertEqual(format_duration(7500), '2 h 5 min')
@@ -0,0 +1,89 @@
+
+from itertools import combinations
+from unittest import TestCase
+
+from mock import patch
+
+from dfp.exceptions import BadSettingException
+from tasks.bid_replay import LadderReplay
+from tasks.price_optimizer import (
+  BidHistogram,
+  optimize_prices,
+  to_custom_price_buckets,
+)
+from tasks.price_utils import get_prices_array
+
+
+BIDS = [0, 15000, 20000, 20000, 35000, 60000, 61000, 64000, 90000, 250000]
+
+
+def get_loss(prices, bids):
+  ladder = LadderReplay('ladder', prices)
+  ladder.add(bids)
+  return ladder.lost_micro_amount
+
+
+class PriceOptimizerTests(TestCase):
+
+  def make_histogram(self):
+    histogram = BidHistogram(10000, 100000)
+    histogram.add(BIDS)
+    return histogram
+
+  def test_histogram(self):
+    """
+    It counts bids per step and caps bids above the maximum.
+    """
+    histogram = self.make_histogram()
+    self.assertEqual(histogram.counts,
+      [1, 1, 2, 1, 0, 0, 3, 0, 0, 1, 1])
+    self.assertEqual(histogram.totals[6], 185000)
+    self.assertEqual(histogram.totals[10], 250000)
+
+  @patch('tasks.price_optimizer.numpy', None)
+  def test_histogram_without_numpy(self):
+    """
+    It builds the same histogram with the pure Python fallback.
+    """
+    histogram = BidHistogram(10000, 100000)
+    histogram.add(BIDS)
+    self.assertEqual(histogram.counts, self.make_histogram().counts)
+    self.assertEqual(histogram.totals, self.make_histogram().totals)
+
+  def test_optimize_prices_is_optimal(self):
+    """
+    It finds the ladder starting at 0 with the least loss, as a brute force
+    search does.
+    """
+    histogram = self.make_histogram()
+    for num_line_items in range(1, 5):
+      prices, loss = optimize_prices(histogram, num_line_items)
+      best_loss = min(
+        get_loss((0,) + ladder, BIDS)
+        for size in range(num_line_items)
+        for ladder in combinations(histogram.prices[1:], size))
+      self.assertLessEqual(len(prices), num_line_items)
+      self.assertEqual(loss, best_loss)
+      self.assertEqual(get_loss(prices, BIDS), loss)
+
+  def test_optimize_prices_budget(self):
+    """
+    It rejects an empty line item budget.
+    """
+    with self.assertRaises(BadSettingException):
+      optimize_prices(self.make_histogram(), 0)
+
+  def test_to_custom_price_buckets(self):
+    """
+    It merges equal gaps and round trips through get_prices_array.
+    """
+    prices = [0, 100000, 200000, 300000, 500000, 700000, 1000000]
+    price_buckets = to_custom_price_buckets(prices)
+    self.assertEqual(price_buckets, {
+      'buckets': [
+        {'precision': 2, 'min': 0.0, 'max': 0.3, 'increment': 0.1},
+        {'precision': 2, 'min': 0.3, 'max': 0.7, 'increment': 0.2},
+        {'precision': 2, 'min': 0.7, 'max': 1.0, 'increment': 0.3},
+      ]
+    })
+    self.assertEqual(get_prices_array(price_buckets), prices)
@@ -1,12 +1,19 @@
 
-from unittest import TestCase
+from decimal import Decimal
+from fractions import Fraction
+from unittest import TestCase, skipIf
 
+from tasks.bid_replay import numpy
 from tasks.price_utils import (
+  PriceBucket,
   num_to_micro_amount,
   num_to_str,
+  get_price_precision,
   get_prices_array,
   get_prices_summary_string,
   micro_amount_to_num,
+  micro_amount_to_str,
+  micro_amounts_to_strs,
 )
 
 
@@ -33,6 +40,56 @@ class UtilsTests(TestCase):
     self.assertEqual(num_to_micro_amount(0.00043, precision=5), 430)
     self.assertEqual(num_to_micro_amount(0), 0)
 
+  def test_num_to_micro_amount_decimal(self):
+    """
+    It rounds the number as written, not its float approximation.
+    """
+    self.assertEqual(num_to_micro_amount(1.015), 1020000)
+    self.assertEqual(num_to_micro_amount(0.285, precision=2), 280000)
+    self.assertEqual(num_to_micro_amount(19.99), 19990000)
+
+  def test_num_to_micro_amount_other_types(self):
+    """
+    It accepts Decimals and Fractions as well as ints and floats.
+    """
+    self.assertEqual(num_to_micro_amount(Decimal('0.285')), 280000)
+    self.assertEqual(num_to_micro_amount(Decimal('1.015')), 1020000)
+    self.assertEqual(num_to_micro_amount(Fraction(57, 200)), 280000)
+    self.assertEqual(num_to_micro_amount(Fraction(1, 3), precision=3), 333000)
+
+  @skipIf(numpy is None, 'numpy is not installed')
+  def test_num_to_micro_amount_numpy(self):
+    """
+    It accepts numpy scalars, whose repr is not a plain number in numpy 2.
+    """
+    self.assertEqual(num_to_micro_amount(numpy.float64(0.285)), 280000)
+    self.assertEqual(num_to_micro_amount(numpy.float32(0.1)), 100000)
+    self.assertEqual(num_to_micro_amount(numpy.int64(5)), 5000000)
+
+  def test_micro_amount_to_str(self):
+    """
+    It returns the expected conversion.
+    """
+    self.assertEqual(micro_amount_to_str(40000000), '40.00')
+    self.assertEqual(micro_amount_to_str(5000000, precision=6), '5.000000')
+    self.assertEqual(micro_amount_to_str(100000), '0.10')
+    self.assertEqual(micro_amount_to_str(55330, precision=4), '0.0553')
+    self.assertEqual(micro_amount_to_str(55330, precision=2), '0.06')
+    self.assertEqual(micro_amount_to_str(5000), '0.01')
+    self.assertEqual(micro_amount_to_str(1000, precision=3), '0.001')
+    self.assertEqual(micro_amount_to_str(430, precision=5), '0.00043')
+    self.assertEqual(micro_amount_to_str(1, precision=8), '0.00000100')
+    self.assertEqual(micro_amount_to_str(2500000, precision=0), '3')
+    self.assertEqual(micro_amount_to_str(0), '0.00')
+
+  def test_micro_amount_to_str_matches_num_to_str(self):
+    """
+    It formats every ladder price like num_to_str does.
+    """
+    prices = list(range(0, 100000000, 10000))
+    self.assertEqual(micro_amounts_to_strs(prices),
+      [num_to_str(micro_amount_to_num(price)) for price in prices])
+
   def test_micro_amount_to_num(self):
     """
     It returns the expected conversion.
@@ -148,6 +205,28 @@ class UtilsTests(TestCase):
     }
     self.assertEqual(len(get_prices_array(config)), 1501)
 
+  def test_get_prices_array_custom_buckets(self):
+    """
+    It returns every price of every custom bucket once.
+    """
+    config = {
+      'buckets': [
+        {'precision': 2, 'min': 0, 'max': 1, 'increment': 0.25},
+        {'min': 1, 'max': 2, 'increment': 0.5},
+      ]
+    }
+    self.assertEqual(
+      get_prices_array(config),
+      [0, 250000, 500000, 750000, 1000000, 1500000, 2000000]
+    )
+    self.assertEqual(get_price_precision(config), 2)
+
+    # Like Prebid, a bucket starts at the previous bucket's max whatever its
+    # min.
+    config['buckets'][1]['min'] = 1.5
+    self.assertEqual(get_prices_array(config),
+      [0, 250000, 500000, 750000, 1000000, 1500000, 2000000])
+
   def test_get_prices_summary_string(self):
     """
     It returns the expected string summary of the array.
@@ -171,3 +250,12 @@ class UtilsTests(TestCase):
         precision=4),
       '8.2200, 8.0600, 8.4271, 8.0000'
     )
+
+  def test_price_bucket(self):
+    """
+    It pairs a micro-amount with its hb_pb value name.
+    """
+    self.assertEqual(PriceBucket.from_micro_amount(1500000),
+      PriceBucket(1500000, '1.50'))
+    self.assertEqual(PriceBucket.from_micro_amount(20000000).value_name,
+      '20.00')
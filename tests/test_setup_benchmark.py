@@ -0,0 +1,54 @@
+
+from unittest import TestCase
+
+from benchmarks.setup_benchmark import (
+  Case,
+  find_baseline,
+  find_regressions,
+  run_case,
+)
+
+
+class SetupBenchmarkTests(TestCase):
+
+  def test_run_case(self):
+    """
+    A whole setup runs against the stand-in for GAM.
+    """
+    metrics = run_case(Case(num_prices=5, num_ad_units=2, num_creatives=2))
+    self.assertEqual(metrics['line_items'], 5)
+    self.assertEqual(metrics['licas'], 10)
+    self.assertGreater(metrics['api_calls'], 5)
+    self.assertGreater(metrics['bytes_sent'], 0)
+
+  def test_run_case_concurrent(self):
+    """
+    The concurrent setup creates the same objects.
+    """
+    metrics = run_case(Case(num_prices=5, num_ad_units=2, num_creatives=2),
+      max_concurrent_requests=4)
+    self.assertEqual(metrics['line_items'], 5)
+    self.assertEqual(metrics['licas'], 10)
+
+  def test_regressions(self):
+    """
+    Metrics are compared with the latest run of each case with the same
+    options.
+    """
+    runs = [
+      {'latency': 0, 'label': 'a',
+        'results': {'small': {'api_calls': 100, 'wall_seconds': 1.0}}},
+      {'latency': 0.1, 'label': 'b',
+        'results': {'small': {'api_calls': 10, 'wall_seconds': 0.1}}},
+      {'latency': 0, 'label': 'c',
+        'results': {'medium': {'api_calls': 1000, 'wall_seconds': 10.0}}},
+    ]
+    baseline = find_baseline(runs, {'latency': 0})
+    self.assertEqual(sorted(baseline), ['medium', 'small'])
+    self.assertEqual(find_baseline(runs, {'latency': 0}, label='c'),
+      {'medium': {'api_calls': 1000, 'wall_seconds': 10.0}})
+
+    results = {'small': {'api_calls': 100, 'wall_seconds': 1.2},
+      'medium': {'api_calls': 1050, 'wall_seconds': 9.0}}
+    self.assertEqual(find_regressions(results, baseline, 0.1),
+      [('small', 'wall_seconds', 1.0, 1.2)])
@@ -0,0 +1,255 @@
+
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+import tasks.verify_order
+from tasks.verify_order import (
+  DUPLICATE_BUCKET,
+  MISSING_BUCKET,
+  NEEDS_CREATIVES,
+  SIZE_MISMATCH,
+  UNEXPECTED_BUCKET,
+  WRONG_CPM,
+  WRONG_NAME,
+  WRONG_STATUS,
+  WRONG_TARGETING,
+  find_problems,
+)
+
+hb_pb_key_id = 888888
+hb_bidder_key_id = 999999
+hb_bidder_value_id = 222222
+hb_pb_value_names = {
+  1001: '0.10',
+  1002: '0.20',
+  1003: '0.30',
+  1004: '9.99',
+}
+placement_ids = [1234567, 9876543]
+sizes = [
+  {
+    'width': '300',
+    'height': '250'
+  },
+  {
+    'width': '728',
+    'height': '90'
+  },
+]
+
+def make_line_item(line_item_id, name, micro_amount, hb_pb_value_id,
+  width=300):
+  """
+  Returns a line item shaped like one read back from DFP.
+  """
+  return {
+    'id': line_item_id,
+    'name': name,
+    'status': 'DRAFT',
+    'isArchived': False,
+    'costPerUnit': {
+      'currencyCode': 'USD',
+      'microAmount': micro_amount,
+    },
+    'targeting': {
+      'inventoryTargeting': {
+        'targetedPlacementIds': placement_ids,
+        'targetedAdUnits': [],
+        'excludedAdUnits': [],
+      },
+      'geoTargeting': None,
+      'customTargeting': {
+        'logicalOperator': 'OR',
+        'children': [{
+          'logicalOperator': 'AND',
+          'children': [
+            {
+              'keyId': hb_bidder_key_id,
+              'valueIds': [hb_bidder_value_id],
+              'operator': 'IS',
+            },
+            {
+              'keyId': hb_pb_key_id,
+              'valueIds': [hb_pb_value_id],
+              'operator': 'IS',
+            },
+          ]
+        }]
+      },
+    },
+    'creativePlaceholders': [
+      {'size': {'width': width, 'height': 250}},
+      {'size': {'width': 728, 'height': 90}},
+    ],
+  }
+
+def make_licas(line_item_ids, creative_ids=(5551, 5552)):
+  return [{'lineItemId': line_item_id, 'creativeId': creative_id,
+    'status': 'ACTIVE'}
+    for line_item_id in line_item_ids for creative_id in creative_ids]
+
+
+class VerifyOrderTests(TestCase):
+
+  def get_problems(self, line_items, licas, criteria=None):
+    return find_problems(
+      line_items=line_items,
+      licas=licas,
+      expected_prices=[100000, 200000, 300000],
+      bidder_code='mybidder',
+      hb_pb_key_id=hb_pb_key_id,
+      hb_pb_value_names=hb_pb_value_names,
+      currency_code='USD',
+      sizes=sizes,
+      placement_ids=placement_ids,
+      ad_unit_ids=[],
+      num_creatives=2,
+      hb_bidder_key_id=hb_bidder_key_id,
+      hb_bidder_value_id=hb_bidder_value_id,
+      criteria=criteria)
+
+  def test_correct_order(self):
+    """
+    It finds no problems when the order matches the expected setup.
+    """
+    line_items = [
+      make_line_item(1, 'mybidder: HB $0.10', 100000, 1001),
+      make_line_item(2, 'mybidder: HB $0.20', 200000, 1002),
+      make_line_item(3, 'mybidder: HB $0.30', 300000, 1003),
+    ]
+    self.assertEqual(self.get_problems(line_items, make_licas([1, 2, 3])), [])
+
+  def test_bucket_problems(self):
+    """
+    It reports missing, duplicate and unexpected buckets.
+    """
+    line_items = [
+      make_line_item(1, 'mybidder: HB $0.10', 100000, 1001),
+      make_line_item(2, 'mybidder: HB $0.10', 100000, 1001),
+      make_line_item(3, 'mybidder: HB $9.99', 9990000, 1004),
+    ]
+    kinds = sorted(kind for kind, message in
+      self.get_problems(line_items, make_licas([1, 2, 3])))
+    self.assertEqual(kinds, sorted([
+      DUPLICATE_BUCKET,
+      MISSING_BUCKET,
+      MISSING_BUCKET,
+      UNEXPECTED_BUCKET,
+    ]))
+
+  def test_line_item_problems(self):
+    """
+    It reports wrong CPMs, names, targeting, sizes and missing creatives.
+    """
+    wrong_targeting = make_line_item(3, 'mybidder: HB $0.30', 300000, 1003)
+    (wrong_targeting['targeting']['customTargeting']['children'][0]
+      ['children'][0]['valueIds']) = [333333]
+    line_items = [
+      make_line_item(1, 'mybidder: HB $0.10', 150000, 1001),
+      make_line_item(2, 'otherbidder: HB $0.20', 200000, 1002, width=320),
+      wrong_targeting,
+    ]
+    problems = self.get_problems(line_items,
+      make_licas([1, 3]) + make_licas([2], creative_ids=[5551]))
+    self.assertEqual(sorted(kind for kind, message in problems), sorted([
+      WRONG_CPM,
+      WRONG_NAME,
+      SIZE_MISMATCH,
+      NEEDS_CREATIVES,
+      WRONG_TARGETING,
+    ]))
+
+  def test_status_and_operator_problems(self):
+    """
+    It reports line items that are not drafts, are archived, have geo
+    targeting, or do not target hb_bidder and hb_pb with IS in one AND set.
+    """
+    active = make_line_item(1, 'mybidder: HB $0.10', 100000, 1001)
+    active['status'] = 'READY'
+    archived = make_line_item(2, 'mybidder: HB $0.20', 200000, 1002)
+    archived['isArchived'] = True
+    archived['targeting']['geoTargeting'] = {'targetedLocations': [{}]}
+    is_not = make_line_item(3, 'mybidder: HB $0.30', 300000, 1003)
+    (is_not['targeting']['customTargeting']['children'][0]['children'][1]
+      ['operator']) = 'IS_NOT'
+    problems = self.get_problems([active, archived, is_not],
+      make_licas([1, 2, 3]))
+    self.assertEqual(sorted(kind for kind, message in problems), sorted([
+      WRONG_STATUS,
+      WRONG_STATUS,
+      WRONG_TARGETING,
+      WRONG_TARGETING,
+    ]))
+    self.assertIn((WRONG_TARGETING, '"mybidder: HB $0.30" targets key '
+      '888888 with operator IS_NOT instead of IS.'), problems)
+
+    or_targeting = make_line_item(1, 'mybidder: HB $0.10', 100000, 1001)
+    criteria_sets = or_targeting['targeting']['customTargeting']['children']
+    criteria_sets.append(criteria_sets[0])
+    self.assertEqual(self.get_problems([or_targeting], make_licas([1]))[0],
+      (WRONG_TARGETING,
+        '"mybidder: HB $0.10" does not AND its key-value targeting.'))
+
+  def test_criteria_problems(self):
+    """
+    It reports line items without the PREBID_CRITERIA key-values, or with
+    keys the setup does not add.
+    """
+    criteria = [('region', 'us', 777777, 7001)]
+    correct = make_line_item(1, 'mybidder: HB $0.10', 100000, 1001)
+    (correct['targeting']['customTargeting']['children'][0]['children']
+      .append({'keyId': 777777, 'valueIds': [7001], 'operator': 'IS'}))
+    wrong_value = make_line_item(2, 'mybidder: HB $0.20', 200000, 1002)
+    (wrong_value['targeting']['customTargeting']['children'][0]['children']
+      .append({'keyId': 777777, 'valueIds': [7002], 'operator': 'IS'}))
+    missing = make_line_item(3, 'mybidder: HB $0.30', 300000, 1003)
+
+    problems = self.get_problems([correct, wrong_value, missing],
+      make_licas([1, 2, 3]), criteria=criteria)
+    self.assertEqual(problems, [
+      (WRONG_TARGETING, '"mybidder: HB $0.20" does not target region = us.'),
+      (WRONG_TARGETING, '"mybidder: HB $0.30" does not target region = us.'),
+    ])
+
+    # Without the criteria expected, the extra key is unexpected.
+    self.assertIn((WRONG_TARGETING,
+      '"mybidder: HB $0.10" targets unexpected keys [777777].'),
+      self.get_problems([correct], make_licas([1])))
+
+  @patch('dfp.get_licas.iter_licas')
+  @patch('dfp.get_ad_units.get_ad_unit_ids_by_name')
+  @patch('dfp.get_placements.get_placement_ids_by_name')
+  @patch('dfp.get_custom_targeting.get_targeting_by_key_name')
+  @patch('dfp.get_custom_targeting.get_key_id_by_name')
+  @patch('dfp.get_line_items.iter_line_items')
+  @patch('dfp.get_orders.get_order_by_name')
+  def test_verify_order(self, mock_get_order, mock_iter_line_items,
+    mock_get_key_id, mock_get_targeting, mock_get_placement_ids,
+    mock_get_ad_unit_ids, mock_iter_licas):
+    """
+    It loads the order from DFP and checks its line items.
+    """
+    mock_get_order.return_value = {'id': 4321, 'name': 'My Order'}
+    mock_iter_line_items.return_value = iter([
+      make_line_item(1, 'mybidder: HB $0.10', 100000, 1001),
+    ])
+    mock_get_key_id.side_effect = lambda name: {
+      'hb_pb': hb_pb_key_id, 'hb_bidder': hb_bidder_key_id}[name]
+    mock_get_targeting.side_effect = lambda name: {
+      'hb_pb': [{'id': 1001, 'name': '0.10'}],
+      'hb_bidder': [{'id': hb_bidder_value_id, 'name': 'mybidder'}],
+    }[name]
+    mock_get_placement_ids.return_value = placement_ids
+    mock_get_ad_unit_ids.return_value = []
+    mock_iter_licas.return_value = iter(make_licas([1]))
+
+    problems = tasks.verify_order.verify_order('My Order',
+      ['Placement 1', 'Placement 2'], [], sizes, 'mybidder', [100000], 2,
+      'USD')
+
+    self.assertEqual(problems, [])
+    mock_iter_line_items.assert_called_once_with(order_id=4321,
+      fields=tasks.verify_order.LINE_ITEM_FIELDS)
+    args, kwargs = mock_iter_licas.call_args
+    self.assertEqual(args[0], [1])
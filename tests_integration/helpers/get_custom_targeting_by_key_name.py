@@ -5,6 +5,7 @@ import logging
 from googleads import ad_manager
 
 from dfp.client import get_client
+from dfp.pagination import iter_results
 
 def get_key_by_name(key_name):
   """
@@ -51,16 +52,5 @@ def get_custom_targeting_by_key_name(key_name):
   statement = (ad_manager.StatementBuilder()
     .Where('customTargetingKeyId = :customTargetingKeyId')
     .WithBindVariable('customTargetingKeyId', key_id))
-  response = custom_targeting_service.getCustomTargetingValuesByStatement(
-    statement.ToStatement())
-
-  vals = []
-  while True:
-    response = custom_targeting_service.getCustomTargetingValuesByStatement(
-        statement.ToStatement())
-    if 'results' in response and len(response['results']) > 0:
-      vals = vals + response['results']
-      statement.offset += statement.limit
-    else:
-      break
-  return vals
+  return list(iter_results(
+    custom_targeting_service.getCustomTargetingValuesByStatement, statement))